@@ -0,0 +1,234 @@
+"""Headless batch compilation over a directory tree.
+
+Files are fanned out across a process pool. Each worker keeps one warm
+CompilerPipeline for its whole lifetime, so PLY table setup is paid once
+per worker rather than once per file.
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compile_cache import CompileCache, DEFAULT_MAX_BYTES, format_cache_stats
+from listing import format_tokens, format_ir
+from optimizer import merge_stats, format_stats
+from peephole import format_hits
+from pipeline import CompilerPipeline
+from profiler import PhaseProfiler, format_profile, merge_profiles
+
+SOURCE_SUFFIX = '.mc'
+# Listing suffix of each code generation target
+TARGET_SUFFIX = {'asm': '.asm', 'python': '.py', 'x86': '.s'}
+
+_worker_pipeline = None
+
+
+def _init_worker(opt_level=0, target='asm', cache_dir=None, cache_size=DEFAULT_MAX_BYTES,
+                 profile=False, trace_memory=False, lexer='ply', parser='ply'):
+    """Build the per-process pipeline (inherited as-is by forked workers)"""
+    global _worker_pipeline
+    if (_worker_pipeline is None or _worker_pipeline.target != target
+            or _worker_pipeline.scanner.engine != lexer
+            or _worker_pipeline.processor.engine != parser):
+        _worker_pipeline = CompilerPipeline(opt_level, target, lexer=lexer, parser=parser)
+        _worker_pipeline.initialize()
+    _worker_pipeline.opt_level = opt_level
+    cache = _worker_pipeline.cache
+    if cache_dir is None:
+        _worker_pipeline.cache = None
+    elif cache is None or cache.root != cache_dir or cache.max_bytes != cache_size:
+        _worker_pipeline.cache = CompileCache(cache_dir, cache_size)
+    _worker_pipeline.profiler = PhaseProfiler(trace_memory) if profile else None
+
+
+def compile_file(job):
+    """
+    Compile one source file and write its listings
+
+    Args:
+        job: (source_path, output_stem, options) tuple, options being the
+             arguments of _init_worker
+
+    Returns:
+        tuple: (source_path, token count, IR count, issues, optimizer stats,
+               code generator stats, peephole stats, cache hit, cache evictions,
+               profile report or None). A file that cannot be read or
+               compiled reports the error as its only issue, so the rest of
+               the batch still compiles.
+    """
+    src_path, out_stem, options = job
+    _init_worker(*options)
+    target = options[1]
+
+    try:
+        with open(src_path, encoding='utf-8') as fh:
+            src = fh.read()
+    except (OSError, UnicodeDecodeError) as err:
+        return _failed(src_path, f"Cannot read source: {err}")
+    cache = _worker_pipeline.cache
+    evicted = cache.stats['evictions'] if cache is not None else 0
+    try:
+        result = _worker_pipeline.compile(src)
+    except Exception as err:
+        return _failed(src_path, f"Internal compiler error: {type(err).__name__}: {err}")
+    if cache is not None:
+        evicted = cache.stats['evictions'] - evicted
+
+    try:
+        write_listings(out_stem, target, format_tokens(result.tokens),
+                       format_ir(result.ir_code), "\n".join(result.asm) + "\n")
+    except OSError as err:
+        return _failed(src_path, f"Cannot write listings: {err}")
+
+    return (src_path, len(result.tokens), len(result.ir_code), result.issues, result.opt_stats,
+            result.codegen_stats, result.peephole_stats, result.cached, evicted, result.profile)
+
+
+def _failed(src_path, msg):
+    """compile_file's result for a file that produced nothing but an error"""
+    return (src_path, 0, 0, [msg], {}, {}, {}, False, 0, None)
+
+
+def write_listings(out_stem, target, tokens, ir, output):
+    """Write the .tokens, .ir and target listings of one compiled source"""
+    os.makedirs(os.path.dirname(out_stem) or '.', exist_ok=True)
+    for suffix, text in (('.tokens', tokens), ('.ir', ir), (TARGET_SUFFIX[target], output)):
+        with open(out_stem + suffix, 'w', encoding='utf-8') as fh:
+            fh.write(text)
+
+
+def collect_sources(paths, suffix=SOURCE_SUFFIX):
+    """
+    Expand files and directories into (root, source path) pairs
+
+    Args:
+        paths: Files or directories given on the command line
+        suffix: Source file extension searched for inside directories
+
+    Returns:
+        list: (root, path) pairs, root being the directory outputs mirror
+    """
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.endswith(suffix):
+                        sources.append((path, os.path.join(dirpath, name)))
+        else:
+            sources.append((os.path.dirname(path), path))
+    return sources
+
+
+def run_batch(paths, out_dir, jobs=None, suffix=SOURCE_SUFFIX, opt_level=0, target='asm',
+              cache_dir=None, cache_size=DEFAULT_MAX_BYTES, profile=None, trace_memory=False,
+              lexer='ply', parser='ply', stream=sys.stdout):
+    """
+    Compile every source under paths, writing .tokens/.ir/.asm (or .py) per file
+
+    Args:
+        paths: Files or directories to compile
+        out_dir: Directory that mirrors the source tree with listings
+        jobs: Worker processes (defaults to the CPU count)
+        suffix: Source file extension
+        opt_level: IR optimization level (0, 1 or 2)
+        target: Code generation target, a key of pipeline.TARGETS
+        cache_dir: CompileCache directory; None compiles every file afresh
+        cache_size: Cache size cap in bytes
+        profile: Path of a JSON per-phase profile (see profiler) to write, '-'
+                 to print it after the summary, or None not to profile
+        trace_memory: Include tracemalloc allocation figures in the profile
+        lexer: TokenScanner engine, 'ply' or 'regex'
+        parser: SyntaxProcessor engine, 'ply' or 'descent'
+        stream: Where the progress report is written
+
+    Returns:
+        int: Number of files that reported issues
+    """
+    options = (opt_level, target, cache_dir, cache_size, profile is not None, trace_memory,
+               lexer, parser)
+    work = []
+    for root, src_path in collect_sources(paths, suffix):
+        rel = os.path.relpath(src_path, root) if root else src_path
+        work.append((src_path, os.path.join(out_dir, os.path.splitext(rel)[0]), options))
+
+    jobs = jobs or os.cpu_count() or 1
+    # Warm the tables here first so forked workers inherit them instead of
+    # racing to write parsetab.py
+    _init_worker(*options)
+
+    start = time.perf_counter()
+    failed = 0
+    total_tokens = 0
+    total_ir = 0
+    opt_stats = {}
+    peephole_stats = {}
+    alloc = {'spilled': 0, 'reloads': 0, 'stores': 0, 'moves_eliminated': 0}
+    lowered = {'structured': 0, 'dispatch': 0}
+    cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    profiles = {}
+    profile_total = {}
+    if jobs == 1:
+        results = map(compile_file, work)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                       initargs=options)
+        chunk = max(1, len(work) // (jobs * 8))
+        results = executor.map(compile_file, work, chunksize=chunk)
+    try:
+        for (src_path, n_tokens, n_ir, issues, stats, codegen, peephole, cached, evicted,
+             report) in results:
+            total_tokens += n_tokens
+            total_ir += n_ir
+            merge_stats(opt_stats, stats)
+            for key in alloc:
+                alloc[key] += codegen.get(key, 0)
+            if 'structured' in codegen:
+                lowered['structured' if codegen['structured'] else 'dispatch'] += 1
+            for rule, hits in peephole.items():
+                peephole_stats[rule] = peephole_stats.get(rule, 0) + hits
+            cache_stats['hits' if cached else 'misses'] += 1
+            cache_stats['evictions'] += evicted
+            if report is not None:
+                profiles[src_path] = report
+                merge_profiles(profile_total, report)
+            if issues:
+                failed += 1
+                for msg in issues:
+                    stream.write(f"{src_path}: {msg}\n")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - start
+
+    rate = len(work) / elapsed if elapsed > 0 else float('inf')
+    stream.write(f"Compiled {len(work)} file(s), {total_tokens} tokens, with {jobs} worker(s) "
+                 f"in {elapsed:.2f}s ({rate:.1f} files/s); {failed} with issues\n")
+    if cache_dir is not None:
+        stream.write(format_cache_stats(cache_stats) + "\n")
+    if target != 'python':
+        stream.write(f"Register allocation: {alloc['spilled']} spilled, {alloc['reloads']} reloads, "
+                     f"{alloc['stores']} spill stores, {alloc['moves_eliminated']} moves eliminated\n")
+    else:
+        stream.write(f"Python target: {lowered['structured']} structured, "
+                     f"{lowered['dispatch']} block dispatch\n")
+    if opt_level:
+        stream.write(f"-O{opt_level}: {total_ir} IR instructions after optimization\n")
+        for line in format_stats(opt_stats):
+            stream.write(line + "\n")
+        if target == 'asm':
+            for line in format_hits(peephole_stats):
+                stream.write(line + "\n")
+    if profile is not None and profile_total:
+        for line in format_profile(profile_total):
+            stream.write(line + "\n")
+        document = json.dumps({'total': profile_total, 'files': profiles}, indent=1)
+        if profile == '-':
+            stream.write(document + "\n")
+        else:
+            with open(profile, 'w', encoding='utf-8') as fh:
+                fh.write(document + "\n")
+    return failed
@@ -0,0 +1 @@
+"""Performance benchmarks for the compiler; run each as python -m benchmarks.<name>"""
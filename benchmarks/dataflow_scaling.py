@@ -0,0 +1,63 @@
+"""CFG construction and dataflow solve time against the number of blocks.
+
+Builds a ControlFlowGraph for branch-heavy programs of growing size and
+solves liveness, reaching definitions and available expressions on it.
+
+    python -m benchmarks.dataflow_scaling [--statements 1000 10000 35000]
+"""
+import argparse
+import time
+
+from benchmarks.parse_scaling import fit_exponent
+from benchmarks.synth import branchy_program
+from cfg import ControlFlowGraph
+from dataflow import Liveness, ReachingDefinitions, AvailableExpressions
+from pipeline import CompilerPipeline
+
+ANALYSES = (('liveness', Liveness), ('reaching', ReachingDefinitions),
+            ('available', AvailableExpressions))
+
+
+def timed(fn):
+    """Run fn once and return (result, seconds)"""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(sizes):
+    """Print CFG and per-analysis times for each program size"""
+    pipeline = CompilerPipeline()
+    pipeline.initialize()
+
+    header = f"{'blocks':>8} {'instrs':>8} {'cfg s':>7}"
+    for name, _ in ANALYSES:
+        header += f" {name + ' s':>12} {'iters':>7}"
+    print(header)
+    blocks = []
+    totals = []
+    for n in sizes:
+        ir_code = pipeline.compile(branchy_program(n)).ir_code
+        cfg, cfg_time = timed(lambda: ControlFlowGraph(ir_code))
+        line = f"{len(cfg.blocks):>8} {len(ir_code):>8} {cfg_time:>7.3f}"
+        total = cfg_time
+        for _, problem in ANALYSES:
+            solved, seconds = timed(lambda: problem(cfg).solve())
+            total += seconds
+            line += f" {seconds:>12.3f} {solved.iterations:>7}"
+        print(line)
+        blocks.append(len(cfg.blocks))
+        totals.append(total)
+    if len(sizes) > 1:
+        print(f"fitted exponent k = {fit_exponent(blocks, totals):.2f} (1.0 = linear)")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--statements', type=int, nargs='+', default=[1000, 10000, 35000])
+    args = cli.parse_args(argv)
+    run(args.statements)
+
+
+if __name__ == "__main__":
+    main()
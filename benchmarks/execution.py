@@ -0,0 +1,74 @@
+"""Execution speed of the IR executor and the Python code generation target.
+
+Runs each workload to completion on every backend and reports the wall time
+and IR instructions executed per second (as counted by the IR executor):
+
+    straight-line  a synthetic program of assignments and prints
+    counted-loop   while (i < N) { total = total + i * i % 7; i = i + 1; }
+
+    python -m benchmarks.execution [--statements 20000] [--iterations 1000000]
+"""
+import argparse
+import time
+
+from benchmarks.synth import straight_line_program
+from executor import IRExecutor
+from pipeline import CompilerPipeline
+from python_generator import PythonTranslator
+
+BACKENDS = (('ir', IRExecutor), ('python', lambda ir_code: PythonTranslator().build(ir_code)))
+
+
+COUNTED_LOOP = """int total;
+int i;
+while (i < {iterations}) {{
+    total = total + i * i % 7;
+    i = i + 1;
+}}
+print(total);
+"""
+
+
+def counted_loop_ir(iterations):
+    """IR of a loop summing i * i % 7 over range(iterations), then printing it"""
+    pipeline = CompilerPipeline()
+    pipeline.initialize()
+    return pipeline.compile(COUNTED_LOOP.format(iterations=iterations)).ir_code
+
+
+def run(statements, iterations, repeat=3):
+    """Print build time, run time and rate for each workload and backend"""
+    pipeline = CompilerPipeline()
+    pipeline.initialize()
+    workloads = (('straight-line', pipeline.compile(straight_line_program(statements)).ir_code),
+                 ('counted-loop', counted_loop_ir(iterations)))
+
+    print(f"{'workload':<14} {'backend':<8} {'build s':>8} {'run s':>8} {'Mops/s':>8} {'speedup':>8}")
+    for name, ir_code in workloads:
+        steps = IRExecutor(ir_code).run(max_steps=len(ir_code) + 10 * iterations).steps
+        baseline = None
+        for backend, build in BACKENDS:
+            start = time.perf_counter()
+            program = build(ir_code)
+            build_time = time.perf_counter() - start
+            seconds = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                program.run(max_steps=steps)
+                seconds = min(seconds, time.perf_counter() - start)
+            baseline = baseline or seconds
+            print(f"{name:<14} {backend:<8} {build_time:>8.3f} {seconds:>8.3f} "
+                  f"{steps / seconds / 1e6:>8.2f} {baseline / seconds:>7.1f}x")
+            del program  # freed here rather than inside the next build timing
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--statements', type=int, default=20000)
+    cli.add_argument('--iterations', type=int, default=1_000_000)
+    args = cli.parse_args(argv)
+    run(args.statements, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
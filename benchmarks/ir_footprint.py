@@ -0,0 +1,62 @@
+"""IR memory footprint and translation throughput.
+
+Compares the bytes per instruction of the slot-based ir.Instr against the
+original 4-key dict form, and times AssemblyTranslator.translate.
+
+    python -m benchmarks.ir_footprint [--statements N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.synth import straight_line_program
+from code_generator import AssemblyTranslator
+from ir import Instr
+from pipeline import CompilerPipeline
+
+
+def bytes_per_instruction(build, count):
+    """Traced allocation of build() divided by count"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    container = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del container
+    return (after - before) / count
+
+
+def run(statements, repeat):
+    """Print footprint and throughput for a program of the given size"""
+    pipeline = CompilerPipeline()
+    pipeline.initialize()
+    ir_code = pipeline.compile(straight_line_program(statements)).ir_code
+    n = len(ir_code)
+
+    dict_bytes = bytes_per_instruction(lambda: [instr.as_dict() for instr in ir_code], n)
+    slot_bytes = bytes_per_instruction(
+        lambda: [Instr(i.op, i.src1, i.src2, i.dst) for i in ir_code], n)
+
+    translator = AssemblyTranslator()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        translator.translate(ir_code)
+        best = min(best, time.perf_counter() - start)
+
+    print(f"IR instructions:          {n}")
+    print(f"dict bytes/instruction:   {dict_bytes:.1f}")
+    print(f"Instr bytes/instruction:  {slot_bytes:.1f}")
+    print(f"translate:                {best:.3f}s ({n / best / 1e6:.2f}M instr/s)")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--statements', type=int, default=100000)
+    cli.add_argument('--repeat', type=int, default=5, help="best-of repetitions (default: 5)")
+    args = cli.parse_args(argv)
+    run(args.statements, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Differential check and throughput of the two lexer engines.
+
+First lexes random valid programs (benchmarks.synth.random_program) and
+random character soup, heavy in comment markers, numbers and invalid
+characters, with both TokenScanner engines. The token streams, issues and
+error offsets must be identical through scan, scan_file (with small chunks)
+and resume. Then it reports tokens/s of both engines on programs of several
+sizes. Exits with status 1 on any difference:
+
+    python -m benchmarks.lexer_engines [--cases 500] [--sizes 1000 10000 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.synth import random_program
+from lexer import TokenScanner
+
+# Fragments of the soup: every token, blanks, comments open and closed,
+# numbers with stray dots and characters the language rejects
+SOUP = ['x', 'int', 'iffy', '_a1', ' ', '\t', '\r', '\n', '\n\n', '//', '/*', '*/', '/', '*',
+        '1', '12', '.', '3.25', '==', '=', '!=', '!', '<=', '<', '>=', '>', '+', '-', '%',
+        '(', ')', '{', '}', ';', ',', '$', '@', '#', '"', '\x0b', 'é', '٣', 'while', 'print']
+
+
+def soup(rng, length):
+    """Random text assembled from SOUP fragments"""
+    return "".join(rng.choice(SOUP) for _ in range(length))
+
+
+def lexed(scanner, src):
+    """Everything a scan produces, in comparable form"""
+    tokens, issues = scanner.scan(src)
+    return ([(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in tokens], list(issues),
+            list(scanner.error_offsets))
+
+
+def file_lexed(scanner, path):
+    """Everything scan_file produces with 64-byte chunks"""
+    tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos)
+              for tok in scanner.scan_file(path, chunk_size=64)]
+    return tokens, list(scanner.issues), list(scanner.error_offsets)
+
+
+def resumed(scanner, src, start, lineno):
+    """Everything resume produces from a token boundary"""
+    tokens = [(tok.type, tok.value, tok.lineno, tok.lexpos, end)
+              for tok, end in scanner.resume(src, start, lineno)]
+    return tokens, list(scanner.issues), list(scanner.error_offsets)
+
+
+def check(cases, seed=0):
+    """
+    Compare the engines on generated inputs
+
+    Returns:
+        int: Number of inputs where they differ
+    """
+    ply, regex = TokenScanner('ply'), TokenScanner('regex')
+    ply.initialize(fast=True)
+    regex.initialize(fast=True)
+    rng = random.Random(seed)
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, 'case.mc')
+        for case in range(cases):
+            if case % 2:
+                src = soup(rng, rng.randint(0, 400))
+            else:
+                src = random_program(rng.randint(1, 60), seed=case)
+            expected = lexed(ply, src)
+            results = [('scan', expected, lexed(regex, src))]
+            with open(path, 'w', encoding='utf-8', newline='') as fh:
+                fh.write(src)
+            results.append(('scan_file', file_lexed(ply, path), file_lexed(regex, path)))
+            if expected[0]:
+                _, _, lineno, start = rng.choice(expected[0])
+                results.append(('resume', resumed(ply, src, start, lineno),
+                                resumed(regex, src, start, lineno)))
+            for how, want, got in results:
+                if want != got:
+                    mismatches += 1
+                    print(f"case {case}: engines differ in {how} on {src[:60]!r}...")
+                    break
+    print(f"{cases} inputs, {mismatches} mismatch(es)")
+    return mismatches
+
+
+def throughput(sizes, repeat):
+    """Print tokens/s of both engines per program size"""
+    engines = {}
+    for engine in ('ply', 'regex'):
+        engines[engine] = TokenScanner(engine)
+        engines[engine].initialize(fast=True)
+    print(f"{'statements':>10} {'tokens':>8} {'ply tok/s':>12} {'regex tok/s':>12} {'speedup':>8}")
+    for size in sizes:
+        src = random_program(size)
+        rates = {}
+        for engine, scanner in engines.items():
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                tokens, _ = scanner.scan(src)
+                best = min(best, time.perf_counter() - start)
+            rates[engine] = len(tokens) / best
+        print(f"{size:>10} {len(tokens):>8} {rates['ply']:>12.0f} {rates['regex']:>12.0f} "
+              f"{rates['regex'] / rates['ply']:>7.2f}x")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--cases', type=int, default=500, help="inputs compared (default: 500)")
+    cli.add_argument('--seed', type=int, default=0)
+    cli.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    cli.add_argument('--repeat', type=int, default=3, help="best-of repetitions (default: 3)")
+    args = cli.parse_args(argv)
+    mismatches = check(args.cases, args.seed)
+    throughput(args.sizes, args.repeat)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
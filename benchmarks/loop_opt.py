@@ -0,0 +1,172 @@
+"""Differential check and effect of the -O2 loop optimizations.
+
+Compiles random nests of counted loops (benchmarks.synth.loop_program) at
+-O0 and -O2 and runs them: the IR executor and the Python target at -O2,
+and the x86-64 target on programs without floats when --native is given,
+must print exactly what the IR executor prints at -O0 and end the same
+way. Hand-written EDGE_CASES, division by a constant zero and signed
+zeros, must also run at -O1 and -O2 exactly as at -O0. Then it reports IR
+instructions executed and Python-target run time at both levels on larger
+loop nests. Exits with status 1 on any difference:
+
+    python -m benchmarks.loop_opt [--cases 300] [--native] [--iterations 60]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.native_harness import outcome, wrap64
+from benchmarks.synth import loop_program
+from executor import IRExecutor
+from pipeline import CompilerPipeline
+from python_generator import PythonTranslator
+
+# Step limit of every run; the generated loops end far sooner
+MAX_STEPS = 10_000_000
+
+EDGE_CASES = [
+    # Division and modulo by a constant zero, which folding must leave for
+    # the program to report at run time
+    "int x; x = 7 / 0; print(x);",
+    "int x; x = 7 % 0; print(x);",
+    "float x; x = 1.5 / 0; print(x);",
+    "float x; x = 1.5 % 0; print(x);",
+    "float x; x = 2.5; x = x % 0; print(x);",
+    # 0.0 and -0.0 compare equal but print differently, so constants and
+    # expressions must not be merged across the sign
+    "print(0.0); print((0 - 1) * 0.0);",
+    "float x; int i; i = 0; while (i < 2) { if (i < 1) { x = (0 - 1) * 0.0; } "
+    "else { x = 0.0; } print(x); i = i + 1; }",
+]
+
+
+def shown(output):
+    """Printed values as text: 0.0 == -0.0, but they print differently"""
+    return [repr(value) for value in output]
+
+
+def compiled(pipelines, src):
+    """IR of src at -O0 and -O2"""
+    return [pipeline.compile(src).ir_code for pipeline in pipelines]
+
+
+def check(cases, native, seed=0):
+    """
+    Compare -O2 runs against the IR executor at -O0
+
+    Returns:
+        int: Number of programs where a run differs
+    """
+    if native:
+        from native import build_program
+    pipelines = [CompilerPipeline(opt_level=level) for level in (0, 2)]
+    for pipeline in pipelines:
+        pipeline.initialize(fast=True)
+    rng = random.Random(seed)
+    mismatches = 0
+    with tempfile.TemporaryDirectory(prefix='mc-loops-') as tmp:
+        for case in range(cases):
+            floats = not native or case % 2 == 1
+            src = loop_program(rng.randint(1, 4), floats=floats, seed=case)
+            plain, optimized = compiled(pipelines, src)
+            expected = outcome(lambda: IRExecutor(plain).run(MAX_STEPS))[:2]
+            runs = [('ir', lambda: IRExecutor(optimized).run(MAX_STEPS)),
+                    ('python', lambda: PythonTranslator().build(optimized).run(MAX_STEPS))]
+            if not floats:
+                exe_path = os.path.join(tmp, f"case{case}")
+                runs.append(('native', build_program(optimized, exe_path, MAX_STEPS).run))
+            for backend, run in runs:
+                status, output, _ = outcome(run)
+                if backend == 'native' and expected[0] == 'ok':
+                    want = (expected[0], [wrap64(value) for value in expected[1]])
+                else:
+                    want = expected
+                if (status, shown(output)) != (want[0], shown(want[1])):
+                    mismatches += 1
+                    print(f"case {case}: {backend} at -O2 differs from -O0", file=sys.stderr)
+                    print(f"    -O0: {want[0]}, {want[1][:10]}", file=sys.stderr)
+                    print(f"    -O2: {status}, {output[:10]}", file=sys.stderr)
+                    break
+    print(f"{cases} programs, {mismatches} mismatch(es)")
+    return mismatches
+
+
+def check_edge_cases(levels):
+    """
+    Compare runs of EDGE_CASES at each level against the IR executor at -O0
+
+    Returns:
+        int: Number of programs where a level differs or fails to compile
+    """
+    pipelines = {level: CompilerPipeline(opt_level=level) for level in (0,) + tuple(levels)}
+    for pipeline in pipelines.values():
+        pipeline.initialize(fast=True)
+    mismatches = 0
+    for src in EDGE_CASES:
+        status, output, _ = outcome(lambda: IRExecutor(pipelines[0].compile(src).ir_code).run())
+        expected = (status, shown(output))
+        for level in levels:
+            try:
+                ir_code = pipelines[level].compile(src).ir_code
+            except Exception as err:
+                mismatches += 1
+                print(f"{src!r}: -O{level} fails to compile: {err!r}", file=sys.stderr)
+                continue
+            runs = [('ir', lambda: IRExecutor(ir_code).run()),
+                    ('python', lambda: PythonTranslator().build(ir_code).run())]
+            for backend, run in runs:
+                status, output, _ = outcome(run)
+                if (status, shown(output)) != expected:
+                    mismatches += 1
+                    print(f"{src!r}: {backend} at -O{level} differs from -O0", file=sys.stderr)
+                    break
+    print(f"{len(EDGE_CASES)} edge cases, {mismatches} mismatch(es)")
+    return mismatches
+
+
+def effect(loops, iterations, repeat):
+    """Print executed instructions and Python-target time at -O0 and -O2"""
+    pipelines = [CompilerPipeline(opt_level=level) for level in (0, 2)]
+    for pipeline in pipelines:
+        pipeline.initialize(fast=True)
+    print(f"{'seed':>4} {'-O0 steps':>10} {'-O2 steps':>10} {'-O0 s':>8} {'-O2 s':>8} "
+          f"{'speedup':>8}")
+    for seed in range(3):
+        src = loop_program(loops, iterations, seed=seed)
+        steps = []
+        seconds = []
+        for ir_code in compiled(pipelines, src):
+            steps.append(IRExecutor(ir_code).run(MAX_STEPS).steps)
+            program = PythonTranslator().build(ir_code)
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                program.run(MAX_STEPS)
+                best = min(best, time.perf_counter() - start)
+            seconds.append(best)
+        print(f"{seed:>4} {steps[0]:>10} {steps[1]:>10} {seconds[0]:>8.3f} {seconds[1]:>8.3f} "
+              f"{seconds[0] / seconds[1]:>7.2f}x")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--cases', type=int, default=300, help="programs compared (default: 300)")
+    cli.add_argument('--seed', type=int, default=0)
+    cli.add_argument('--native', action='store_true',
+                     help="also build and run programs without floats natively")
+    cli.add_argument('--loops', type=int, default=6,
+                     help="outermost loops of the timed programs (default: 6)")
+    cli.add_argument('--iterations', type=int, default=60,
+                     help="largest trip count in the timed programs (default: 60)")
+    cli.add_argument('--repeat', type=int, default=3, help="best-of repetitions (default: 3)")
+    args = cli.parse_args(argv)
+    mismatches = check(args.cases, args.native, args.seed) + check_edge_cases((1, 2))
+    effect(args.loops, args.iterations, args.repeat)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
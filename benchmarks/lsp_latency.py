@@ -0,0 +1,67 @@
+"""Keystroke latency of the language server on large documents.
+
+Types one character at a time into the middle of a random program (see
+benchmarks.synth.random_program) and reports, per document size, the mean
+time to apply an edit (incremental relex), to reanalyze after it (parse and
+name resolution), and to apply and analyze an edit inside a comment, which
+skips the parse. Relexing the whole document is shown for comparison:
+
+    python -m benchmarks.lsp_latency [--sizes 1000 10000 50000] [--keystrokes 50]
+"""
+import argparse
+import time
+
+from benchmarks.synth import random_program
+from language_server import Document
+
+
+def keystrokes(doc, offset, text, analyze):
+    """Mean seconds to type text at offset, one character per edit"""
+    start = time.perf_counter()
+    for char in text:
+        doc.edit(offset, offset, char)
+        if analyze:
+            doc.analyze()
+        offset += 1
+    return (time.perf_counter() - start) / len(text)
+
+
+def run(sizes, count):
+    """Print per-keystroke latencies for each document size"""
+    print(f"{'statements':>10} {'tokens':>8} {'full relex ms':>14} {'edit ms':>8} "
+          f"{'edit+analyze ms':>16} {'comment ms':>11}")
+    for size in sizes:
+        src = random_program(size)
+        middle = src.index('\n', len(src) // 2) + 1
+        doc = Document('file:///bench.mc', src)
+        doc.analyze()
+        tokens = len(doc.tokens)
+
+        start = time.perf_counter()
+        doc.replace(doc.text)
+        full = time.perf_counter() - start
+        doc.analyze()
+
+        # Identifiers long enough that every keystroke changes a token
+        typed = ("q = 1;" * count)[:count]
+        edit = keystrokes(doc, middle, typed, analyze=False)
+        doc.analyze()
+        edit_analyze = keystrokes(doc, middle, typed, analyze=True)
+        doc.edit(middle, middle, "// \n")
+        doc.analyze()
+        comment = keystrokes(doc, middle + 3, "x" * count, analyze=True)
+        print(f"{size:>10} {tokens:>8} {full * 1000:>14.2f} {edit * 1000:>8.3f} "
+              f"{edit_analyze * 1000:>16.2f} {comment * 1000:>11.3f}")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    cli.add_argument('--keystrokes', type=int, default=50,
+                     help="characters typed per measurement (default: 50)")
+    args = cli.parse_args(argv)
+    run(args.sizes, args.keystrokes)
+
+
+if __name__ == "__main__":
+    main()
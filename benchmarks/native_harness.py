@@ -0,0 +1,113 @@
+"""Differential test and timing of the x86-64 target against the IR executor.
+
+Each workload is run by IRExecutor and as a native executable built from
+X86Translator output; the harness checks that both print the same values
+(IR results wrapped to 64 bits, as the native code computes them) and end
+the same way, then reports both run times:
+
+    straight-line  a synthetic program of assignments and prints
+    counted-loop   the loop of benchmarks.execution
+    PATH ...       any source files given on the command line
+
+    python -m benchmarks.native_harness [--statements 20000] [--iterations 1000000] [PATH ...]
+
+Exits with status 1 when any workload disagrees.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.execution import counted_loop_ir
+from benchmarks.synth import straight_line_program
+from executor import IRExecutor, ExecutionError, StepLimitExceeded
+from native import build_program
+from pipeline import CompilerPipeline
+
+
+def wrap64(value):
+    """Value as a signed 64-bit integer would hold it"""
+    return (value + 2 ** 63) % 2 ** 64 - 2 ** 63
+
+
+def outcome(run):
+    """
+    Run a program and summarize how it ended
+
+    Returns:
+        tuple: (status, printed values, seconds); status is 'ok', 'error'
+               or 'step limit'
+    """
+    start = time.perf_counter()
+    try:
+        output, status = run().output, 'ok'
+    except StepLimitExceeded as err:
+        output, status = err.output, 'step limit'
+    except ExecutionError as err:
+        output, status = err.output, 'error'
+    return status, output, time.perf_counter() - start
+
+
+def compare(name, ir_code, exe_path, max_steps):
+    """
+    Print one result row
+
+    Returns:
+        bool: Whether the native run matched the IR executor
+    """
+    start = time.perf_counter()
+    program = build_program(ir_code, exe_path, max_steps)
+    build_time = time.perf_counter() - start
+    expected, expected_output, ir_seconds = outcome(lambda: IRExecutor(ir_code).run(max_steps))
+    status, output, seconds = outcome(program.run)
+    if expected == 'ok':
+        expected_output = [wrap64(value) for value in expected_output]
+    # The two step limits count different things, so only the status is compared then
+    same = status == expected and (status == 'step limit' or output == expected_output)
+    print(f"{name:<24} {status:<10} {len(output):>8} {build_time:>8.3f} {ir_seconds:>8.3f} "
+          f"{seconds:>8.3f} {ir_seconds / seconds:>7.1f}x  {'ok' if same else 'MISMATCH'}")
+    if not same:
+        print(f"    IR executor: {expected}, {expected_output[:10]}", file=sys.stderr)
+        print(f"    native:      {status}, {output[:10]}", file=sys.stderr)
+    return same
+
+
+def run(statements, iterations, paths, max_steps):
+    """Compare every workload; return the number of mismatches"""
+    pipeline = CompilerPipeline()
+    pipeline.initialize()
+    workloads = [('straight-line', pipeline.compile(straight_line_program(statements)).ir_code),
+                 ('counted-loop', counted_loop_ir(iterations))]
+    for path in paths:
+        with open(path, encoding='utf-8') as fh:
+            result = pipeline.compile(fh.read())
+        if result.issues:
+            print(f"{path}: skipped, {result.issues[0]}", file=sys.stderr)
+            continue
+        workloads.append((os.path.basename(path), result.ir_code))
+
+    print(f"{'workload':<24} {'status':<10} {'printed':>8} {'build s':>8} {'IR s':>8} "
+          f"{'native s':>8} {'speedup':>8}")
+    mismatches = 0
+    with tempfile.TemporaryDirectory(prefix='mc-native-') as tmp:
+        for idx, (name, ir_code) in enumerate(workloads):
+            exe_path = os.path.join(tmp, f"program{idx}")
+            steps = max(max_steps, len(ir_code) + 10 * iterations)
+            mismatches += not compare(name, ir_code, exe_path, steps)
+    return mismatches
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('paths', nargs='*', help="source files to compare as well")
+    cli.add_argument('--statements', type=int, default=20000)
+    cli.add_argument('--iterations', type=int, default=1_000_000)
+    cli.add_argument('--max-steps', type=int, default=1_000_000,
+                     help="step limit for source files (IR instructions / loop iterations)")
+    args = cli.parse_args(argv)
+    return 1 if run(args.statements, args.iterations, args.paths, args.max_steps) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Parse-time scaling with the number of statements.
+
+Times SyntaxProcessor.process over pre-scanned tokens for growing programs
+and fits time ~ N^k on a log-log scale; k close to 1 means linear.
+
+    python -m benchmarks.parse_scaling [--sizes 1000 10000 100000]
+"""
+import argparse
+import math
+import time
+
+from benchmarks.synth import straight_line_program
+from lexer import TokenScanner
+from parser import SyntaxProcessor
+
+
+def fit_exponent(sizes, seconds):
+    """Least-squares slope of log(seconds) against log(size)"""
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(t) for t in seconds]
+    mx = sum(xs) / len(xs)
+    my = sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+
+def run(sizes, repeat):
+    """Time parsing at each size and print per-statement cost and the fit"""
+    scanner = TokenScanner()
+    scanner.initialize(fast=True)
+    processor = SyntaxProcessor()
+    processor.initialize(fast=True)
+
+    print(f"{'statements':>12} {'tokens':>10} {'parse s':>10} {'us/stmt':>10}")
+    timings = []
+    for n in sizes:
+        tokens, _ = scanner.scan(straight_line_program(n))
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            processor.process(tokenfunc=scanner.feed(tokens))
+            best = min(best, time.perf_counter() - start)
+        timings.append(best)
+        print(f"{n:>12} {len(tokens):>10} {best:>10.3f} {best / n * 1e6:>10.2f}")
+    if len(sizes) > 1:
+        print(f"fitted exponent k = {fit_exponent(sizes, timings):.2f} (1.0 = linear)")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 25000, 100000, 200000])
+    cli.add_argument('--repeat', type=int, default=3, help="best-of repetitions (default: 3)")
+    args = cli.parse_args(argv)
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Differential check and throughput of the two parser engines.
+
+Parses the same token streams with both SyntaxProcessor engines: random
+valid programs (benchmarks.synth.random_program), blocks and parentheses
+nested far beyond Python's recursion limit, and random programs with a few
+tokens deleted, duplicated or swapped, which exercise syntax errors and the
+descent engine's fallback to PLY. The AST, IR, issues and declared symbols
+must be identical. Then it reports tokens/s of both engines on programs of
+several sizes. Exits with status 1 on any difference:
+
+    python -m benchmarks.parser_engines [--cases 500] [--sizes 1000 10000 50000]
+"""
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.synth import random_program
+from ir_generator import IRGenerator
+from lexer import TokenScanner
+from parser import SyntaxProcessor
+
+# Nesting depth of the deep cases; well past sys.getrecursionlimit()
+DEEP = 20000
+
+# Issues that send the descent engine back to PLY
+SYNTAX_ISSUES = ("Syntax error", "Unexpected end of input")
+
+
+def deep_program(depth):
+    """Blocks, ifs, whiles and parentheses nested depth deep"""
+    heads = ["{ ", "if (x < 1) { ", "while (x != 2) { ", "if (x > 0) { x = 1; } else { "]
+    opening = "".join(heads[level % len(heads)] for level in range(depth))
+    expr = "(" * depth + "x" + " + 1)" * depth
+    return f"int x = 1;\n{opening}x = {expr};\n" + "}" * depth + "\nprint(x);\n"
+
+
+def mutate(rng, tokens):
+    """Copy of tokens with one to three deleted, duplicated or swapped"""
+    tokens = list(tokens)
+    for _ in range(rng.randint(1, 3)):
+        if not tokens:
+            break
+        at = rng.randrange(len(tokens))
+        how = rng.randrange(3)
+        if how == 0:
+            del tokens[at]
+        elif how == 1:
+            tokens.insert(at, tokens[at])
+        else:
+            other = rng.randrange(len(tokens))
+            tokens[at], tokens[other] = tokens[other], tokens[at]
+    return tokens
+
+
+def flatten(ast):
+    """
+    The AST as a flat list, walked without recursion: comparing deeply
+    nested tuples directly would exceed the recursion limit
+
+    Returns:
+        list: Leaves, each tuple or list preceded by its type and length
+    """
+    flat = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (tuple, list)):
+            flat.append(('open', type(node).__name__, len(node)))
+            stack.extend(reversed(node))
+        else:
+            flat.append(node)
+    return flat
+
+
+def parsed(processor, tokens):
+    """Everything a parse produces, in comparable form"""
+    feed = iter(tokens)
+    ast = processor.process(tokenfunc=lambda: next(feed, None))
+    return (flatten(ast), IRGenerator().generate(processor.ast), list(processor.issues),
+            processor.registry.all_entries())
+
+
+def check(cases, seed=0):
+    """
+    Compare the engines on generated inputs
+
+    Returns:
+        int: Number of inputs where they differ
+    """
+    scanner = TokenScanner()
+    scanner.initialize(fast=True)
+    ply, descent = SyntaxProcessor('ply'), SyntaxProcessor('descent')
+    ply.initialize(fast=True)
+    descent.initialize(fast=True)
+    rng = random.Random(seed)
+    inputs = [('deep', scanner.scan(deep_program(DEEP))[0])]
+    for case in range(cases):
+        tokens = list(scanner.scan(random_program(rng.randint(1, 60), seed=case))[0])
+        inputs.append((f"case {case}", mutate(rng, tokens) if case % 2 else tokens))
+
+    mismatches = 0
+    fallbacks = 0
+    for name, tokens in inputs:
+        want, got = parsed(ply, tokens), parsed(descent, tokens)
+        fallbacks += any(msg.startswith(SYNTAX_ISSUES) for msg in want[2])
+        if want != got:
+            mismatches += 1
+            print(f"{name}: engines differ ({len(tokens)} tokens)")
+    print(f"{len(inputs)} inputs ({fallbacks} with syntax errors), {mismatches} mismatch(es)")
+    return mismatches
+
+
+def throughput(sizes, repeat):
+    """Print tokens/s of both engines per program size"""
+    scanner = TokenScanner()
+    scanner.initialize(fast=True)
+    engines = {}
+    for engine in ('ply', 'descent'):
+        engines[engine] = SyntaxProcessor(engine)
+        engines[engine].initialize(fast=True)
+    print(f"{'statements':>10} {'tokens':>8} {'ply tok/s':>12} {'descent tok/s':>14} "
+          f"{'speedup':>8}")
+    for size in sizes:
+        tokens, _ = scanner.scan(random_program(size))
+        rates = {}
+        for engine, processor in engines.items():
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                processor.process(tokenfunc=scanner.feed(tokens))
+                best = min(best, time.perf_counter() - start)
+            rates[engine] = len(tokens) / best
+        print(f"{size:>10} {len(tokens):>8} {rates['ply']:>12.0f} {rates['descent']:>14.0f} "
+              f"{rates['descent'] / rates['ply']:>7.2f}x")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--cases', type=int, default=500, help="inputs compared (default: 500)")
+    cli.add_argument('--seed', type=int, default=0)
+    cli.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    cli.add_argument('--repeat', type=int, default=3, help="best-of repetitions (default: 3)")
+    args = cli.parse_args(argv)
+    mismatches = check(args.cases, args.seed)
+    throughput(args.sizes, args.repeat)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Per-file compile latency: fresh interpreter versus the compile server.
+
+Compiles the same small random programs (benchmarks.synth.random_program)
+once by spawning `python main.py compile` per file, as a build system
+calling the compiler directly does, and once through a CompileClient
+connected to a compile server started for the run. The server runs without
+a cache so both sides really compile:
+
+    python -m benchmarks.server_latency [--files 20] [--statements 200]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synth import random_program
+from compile_server import CompileClient
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(files, statements):
+    """Print the mean latency of both ways of compiling"""
+    sources = [random_program(statements, seed=seed) for seed in range(files)]
+    with tempfile.TemporaryDirectory() as scratch:
+        paths = []
+        for index, src in enumerate(sources):
+            paths.append(os.path.join(scratch, f"p{index}.mc"))
+            with open(paths[-1], 'w', encoding='utf-8') as fh:
+                fh.write(src)
+
+        start = time.perf_counter()
+        for path in paths:
+            subprocess.run([sys.executable, os.path.join(HERE, 'main.py'), 'compile', path,
+                            '-o', os.path.join(scratch, 'out'), '-j', '1', '--no-cache'],
+                           check=False, stdout=subprocess.DEVNULL)
+        spawned = (time.perf_counter() - start) / files
+
+        sock = os.path.join(scratch, 'server.sock')
+        server = subprocess.Popen([sys.executable, os.path.join(HERE, 'main.py'), 'server',
+                                   '--socket', sock, '-j', '1', '--no-cache'],
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            server.stdout.readline()
+            client = CompileClient(sock)
+            start = time.perf_counter()
+            for src in sources:
+                client.call('compile', source=src)
+            served = (time.perf_counter() - start) / files
+            client.call('shutdown')
+            client.close()
+        finally:
+            server.wait(10)
+
+    print(f"{'files':>6} {'statements':>10} {'spawn ms/file':>14} {'server ms/file':>15} "
+          f"{'speedup':>8}")
+    print(f"{files:>6} {statements:>10} {spawned * 1000:>14.1f} {served * 1000:>15.2f} "
+          f"{spawned / served:>7.1f}x")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--files', type=int, default=20)
+    cli.add_argument('--statements', type=int, default=200,
+                     help="statements per program (default: 200)")
+    args = cli.parse_args(argv)
+    run(args.files, args.statements)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""SSA construction and SSA pass time against program size.
+
+Converts branch-heavy and random programs of growing size to SSA form and
+runs sparse conditional constant propagation and global value numbering
+on them (each pass converts the program itself, and back) with the
+garbage collector paused, as PassManager runs them. Then it fits
+time ~ N^k per program kind:
+
+    python -m benchmarks.ssa_scaling [--statements 2500 10000 40000]
+"""
+import argparse
+
+from benchmarks.dataflow_scaling import timed
+from benchmarks.parse_scaling import fit_exponent
+from benchmarks.synth import branchy_program, random_program
+from cfg import gc_paused
+from optimizer import SparseConditionalConstantPropagation, GlobalValueNumbering
+from pipeline import CompilerPipeline
+from ssa import SSAForm
+
+PROGRAMS = (('branchy', branchy_program), ('random', random_program))
+
+
+def run(sizes):
+    """Print SSA build and pass times for each program kind and size"""
+    pipeline = CompilerPipeline()
+    pipeline.initialize()
+    print(f"{'program':<8} {'instrs':>8} {'blocks':>7} {'phis':>7} {'ssa s':>7} {'sccp s':>7} "
+          f"{'gvn s':>7}")
+    for kind, generate in PROGRAMS:
+        lengths = []
+        totals = []
+        for n in sizes:
+            ir_code = pipeline.compile(generate(n)).ir_code
+            form, build = timed(lambda: SSAForm(ir_code))
+            with gc_paused():
+                _, sccp = timed(lambda: SparseConditionalConstantPropagation().run(ir_code))
+                _, gvn = timed(lambda: GlobalValueNumbering().run(ir_code))
+            print(f"{kind:<8} {len(ir_code):>8} {len(form.cfg.blocks):>7} "
+                  f"{sum(map(len, form.phis)):>7} {build:>7.3f} {sccp:>7.3f} {gvn:>7.3f}")
+            lengths.append(len(ir_code))
+            totals.append(build + sccp + gvn)
+            del form
+        if len(sizes) > 1:
+            print(f"{kind}: fitted exponent k = {fit_exponent(lengths, totals):.2f} (1.0 = linear)")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--statements', type=int, nargs='+', default=[2500, 10000, 40000])
+    args = cli.parse_args(argv)
+    run(args.statements)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cold-start benchmark: time from a fresh interpreter to a ready compiler.
+
+Each scenario runs in its own subprocess against a scratch copy of the
+sources, so neither the repository nor the user's table cache is touched.
+
+    python -m benchmarks.startup [--runs N]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Every compiler module; PLY's generated tables are left behind on purpose
+SOURCES = sorted(name for name in os.listdir(ROOT)
+                 if name.endswith('.py') and name != 'parsetab.py')
+
+# What main.py used to do before the compile path could skip Tk, followed by
+# PLY's default reflective table construction and validation
+LEGACY = """
+import tkinter
+from tkinter import ttk, scrolledtext, messagebox
+from lexer import TokenScanner
+from parser import SyntaxProcessor
+TokenScanner().initialize()
+SyntaxProcessor().initialize()
+"""
+
+FAST = """
+import main
+from pipeline import CompilerPipeline
+CompilerPipeline().initialize(fast=True)
+"""
+
+
+def time_child(workdir, code, env):
+    """Wall time of one fresh interpreter running code, in milliseconds"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=workdir, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(runs):
+    """Time each startup scenario and print a summary table"""
+    workdir = tempfile.mkdtemp(prefix='mc-startup-')
+    try:
+        for name in SOURCES:
+            shutil.copy(os.path.join(ROOT, name), workdir)
+        env = dict(os.environ, MINICOMPILER_TABLE_CACHE=os.path.join(workdir, '__plycache__'))
+        # Startup cost includes loading cached bytecode, as it would for users
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+        def legacy_cold():
+            for generated in ('parsetab.py', 'parser.out'):
+                path = os.path.join(workdir, generated)
+                if os.path.exists(path):
+                    os.remove(path)
+            return time_child(workdir, LEGACY, env)
+
+        def fast_cold():
+            shutil.rmtree(env['MINICOMPILER_TABLE_CACHE'], ignore_errors=True)
+            return time_child(workdir, FAST, env)
+
+        scenarios = [
+            ("legacy, no parsetab", legacy_cold),
+            ("legacy, parsetab present", lambda: time_child(workdir, LEGACY, env)),
+            ("fast, empty table cache", fast_cold),
+            ("fast, warm table cache", lambda: time_child(workdir, FAST, env)),
+            ("bare interpreter", lambda: time_child(workdir, 'pass', env)),
+        ]
+        print(f"{'Scenario':<28} {'median ms':>10} {'min ms':>10}")
+        print("-" * 50)
+        for label, scenario in scenarios:
+            scenario()  # prime the OS file cache
+            samples = [scenario() for _ in range(runs)]
+            print(f"{label:<28} {statistics.median(samples):>10.1f} {min(samples):>10.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--runs', type=int, default=15, help="samples per scenario (default: 15)")
+    run(cli.parse_args(argv).runs)
+
+
+if __name__ == "__main__":
+    main()
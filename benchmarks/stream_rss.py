@@ -0,0 +1,77 @@
+"""Peak RSS of streaming (scan_file) versus whole-string (scan) lexing.
+
+Each measurement runs in a fresh interpreter that lexes a generated file of
+the given size and reports its peak resident set size.
+
+    python -m benchmarks.stream_rss [--sizes-mb 2 8 32]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synth import straight_line_program
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import resource, sys, time
+from lexer import TokenScanner
+scanner = TokenScanner()
+scanner.initialize(fast=True)
+start = time.perf_counter()
+if sys.argv[1] == 'stream':
+    count = sum(1 for _ in scanner.scan_file(sys.argv[2]))
+else:
+    with open(sys.argv[2], encoding='utf-8') as fh:
+        count = len(scanner.scan(fh.read())[0])
+elapsed = time.perf_counter() - start
+print(count, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed)
+"""
+
+
+def write_source(path, size_mb):
+    """Write a valid program of about size_mb megabytes"""
+    block = straight_line_program(20000)
+    body = block[block.index('\n', block.rindex('int ')) + 1:]
+    header = block[:len(block) - len(body)]
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write(header)
+        written = len(header)
+        while written < size_mb * 1024 * 1024:
+            fh.write("/* generated\n   block */\n")
+            fh.write(body)
+            written += len(body) + 25
+
+
+def measure(mode, path):
+    """Run one child and return (tokens, peak RSS in MB, seconds)"""
+    out = subprocess.run([sys.executable, '-c', CHILD, mode, path], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout.split()
+    return int(out[0]), int(out[1]) / 1024, float(out[2])
+
+
+def run(sizes_mb, modes):
+    """Print peak RSS for each file size and lexing mode"""
+    print(f"{'file MB':>8} {'mode':>8} {'tokens':>10} {'peak RSS MB':>12} {'tokens/s':>10}")
+    with tempfile.TemporaryDirectory(prefix='mc-stream-') as tmp:
+        for size in sizes_mb:
+            path = os.path.join(tmp, f"gen{size}.mc")
+            write_source(path, size)
+            for mode in modes:
+                tokens, rss, seconds = measure(mode, path)
+                print(f"{size:>8} {mode:>8} {tokens:>10} {rss:>12.1f} {tokens / seconds:>10.0f}")
+            os.remove(path)
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--sizes-mb', type=int, nargs='+', default=[2, 8, 32])
+    cli.add_argument('--modes', nargs='+', default=['stream', 'scan'], choices=['stream', 'scan'])
+    args = cli.parse_args(argv)
+    run(args.sizes_mb, args.modes)
+
+
+if __name__ == "__main__":
+    main()
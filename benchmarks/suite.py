@@ -0,0 +1,247 @@
+"""Throughput and scaling of each compiler component on synthetic programs.
+
+Generates random valid programs (benchmarks.synth.random_program) at
+several sizes and times, best of --repeat runs:
+
+    lexer       TokenScanner.scan                       tokens/s
+    parser      SyntaxProcessor.process over tokens     tokens/s
+                (semantic analysis and IRGenerator included)
+    registry    replay of the VariableRegistry calls    calls/s
+                the parser made
+    translator  AssemblyTranslator.translate            IR instructions/s
+    end-to-end  CompilerPipeline.compile, no cache      tokens/s
+
+and fits time ~ N^k per component. `run --save` writes the results as a
+JSON baseline; `compare` reruns with the baseline's parameters and exits
+with status 1 when a component's total time over all sizes grew by more
+than the tolerance, or its fitted exponent grew:
+
+    python -m benchmarks.suite run [--sizes 500 2000 8000] [--save baseline.json]
+    python -m benchmarks.suite compare baseline.json [--tolerance 0.25]
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+
+from benchmarks.parse_scaling import fit_exponent
+from benchmarks.synth import random_program
+from code_generator import AssemblyTranslator
+from ir_generator import IRGenerator
+from lexer import TokenScanner
+from parser import SyntaxProcessor
+from pipeline import CompilerPipeline
+from symbol_table import VariableRegistry
+
+COMPONENTS = ('lexer', 'parser', 'registry', 'translator', 'end-to-end')
+UNITS = {'lexer': 'tokens', 'parser': 'tokens', 'registry': 'calls',
+         'translator': 'IR instructions', 'end-to-end': 'tokens'}
+
+# Registry calls the parser makes, replayed by the registry benchmark
+REGISTRY_CALLS = ('add', 'find', 'is_declared_in_current_scope', 'push_scope', 'pop_scope')
+
+DEFAULTS = {'sizes': [500, 2000, 8000, 32000], 'expr_depth': 3, 'nesting': 4,
+            'identifiers': 32, 'seed': 0, 'repeat': 3}
+
+# Allowed growth of a fitted exponent before compare reports a regression
+EXPONENT_SLACK = 0.15
+
+
+class RecordingRegistry(VariableRegistry):
+    """VariableRegistry logging the calls made on it"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+        for name in REGISTRY_CALLS:
+            setattr(self, name, self.recorder(name, getattr(self, name)))
+
+    def recorder(self, name, method):
+        calls = self.calls
+
+        def record(*args, **kwargs):
+            calls.append((name, args, kwargs))
+            return method(*args, **kwargs)
+        return record
+
+
+def best_of(repeat, fn):
+    """Shortest of repeat timed calls of fn"""
+    best = float('inf')
+    for _ in range(repeat):
+        # Garbage left by the previous call is not charged to this one
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def replay(calls):
+    """Seconds to apply a call log to a fresh VariableRegistry"""
+    registry = VariableRegistry()
+    gc.collect()
+    bound = [(getattr(registry, name), args, kwargs) for name, args, kwargs in calls]
+    start = time.perf_counter()
+    for method, args, kwargs in bound:
+        method(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def measure(params):
+    """
+    Time every component at every size
+
+    Args:
+        params: dict with the keys of DEFAULTS
+
+    Returns:
+        dict: component -> {'unit', 'sizes', 'seconds', 'units', 'exponent'}
+    """
+    scanner = TokenScanner()
+    scanner.initialize(fast=True)
+    processor = SyntaxProcessor()
+    processor.initialize(fast=True)
+    generator = IRGenerator()
+    pipeline = CompilerPipeline()
+    pipeline.initialize()
+    repeat = params['repeat']
+
+    results = {name: {'unit': UNITS[name], 'sizes': [], 'seconds': [], 'units': []}
+               for name in COMPONENTS}
+    for size in params['sizes']:
+        src = random_program(size, params['expr_depth'], params['nesting'],
+                             params['identifiers'], params['seed'])
+        tokens, _ = scanner.scan(src)
+        processor.registry = recorder = RecordingRegistry()
+        processor.process(tokenfunc=scanner.feed(tokens))
+        calls = recorder.calls
+        processor.registry = VariableRegistry()
+        ir_code = list(generator.generate(processor.ast))
+
+        def parse():
+            processor.process(tokenfunc=scanner.feed(tokens))
+            return generator.generate(processor.ast)
+
+        timings = {
+            'lexer': (best_of(repeat, lambda: scanner.scan(src)), len(tokens)),
+            'parser': (best_of(repeat, parse), len(tokens)),
+            'registry': (min(replay(calls) for _ in range(repeat)), len(calls)),
+            'translator': (best_of(repeat, lambda: AssemblyTranslator().translate(ir_code)),
+                           len(ir_code)),
+            'end-to-end': (best_of(repeat, lambda: pipeline.compile(src)), len(tokens)),
+        }
+        for name, (seconds, units) in timings.items():
+            entry = results[name]
+            entry['sizes'].append(size)
+            entry['seconds'].append(seconds)
+            entry['units'].append(units)
+    for entry in results.values():
+        sizes = entry['sizes']
+        entry['exponent'] = fit_exponent(sizes, entry['seconds']) if len(sizes) > 1 else None
+    return results
+
+
+def print_results(results):
+    """Table of rates per component and size, then the fitted exponents"""
+    print(f"{'component':<12} {'size':>8} {'units':>10} {'seconds':>9} {'rate/s':>12}")
+    for name, entry in results.items():
+        for size, seconds, units in zip(entry['sizes'], entry['seconds'], entry['units']):
+            print(f"{name:<12} {size:>8} {units:>10} {seconds:>9.4f} {units / seconds:>12.0f}")
+    for name, entry in results.items():
+        if entry['exponent'] is not None:
+            print(f"{name:<12} time ~ N^{entry['exponent']:.2f} ({entry['unit']})")
+
+
+def run(params, save=None):
+    """Measure, print and optionally save a baseline"""
+    results = measure(params)
+    print_results(results)
+    if save:
+        baseline = {'params': params, 'python': platform.python_version(),
+                    'machine': platform.machine(), 'results': results}
+        with open(save, 'w', encoding='utf-8') as fh:
+            json.dump(baseline, fh, indent=1)
+            fh.write("\n")
+        print(f"Baseline saved to {save}")
+
+
+def compare(path, tolerance, repeat=None):
+    """
+    Rerun a baseline's measurements and report regressions
+
+    Args:
+        path: Baseline JSON written by run --save
+        tolerance: Allowed slowdown as a fraction, e.g. 0.25 for 25%
+        repeat: Override the baseline's repetition count
+
+    Returns:
+        int: Number of regressions
+    """
+    with open(path, encoding='utf-8') as fh:
+        baseline = json.load(fh)
+    params = dict(baseline['params'])
+    if repeat:
+        params['repeat'] = repeat
+    results = measure(params)
+
+    regressions = 0
+    print(f"{'component':<12} {'size':>8} {'base s':>9} {'now s':>9} {'change':>8}")
+    for name, entry in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for size, seconds, base_seconds in zip(entry['sizes'], entry['seconds'],
+                                               base['seconds']):
+            print(f"{name:<12} {size:>8} {base_seconds:>9.4f} {seconds:>9.4f} "
+                  f"{seconds / base_seconds - 1:>+8.1%}")
+        # Single sizes are noisy; the verdict is on the total
+        total, base_total = sum(entry['seconds']), sum(base['seconds'])
+        change = total / base_total - 1
+        slower = change > tolerance
+        regressions += slower
+        print(f"{name:<12} {'total':>8} {base_total:>9.4f} {total:>9.4f} {change:>+8.1%}"
+              f"{'  REGRESSION' if slower else ''}")
+        if entry['exponent'] is not None and base['exponent'] is not None:
+            grew = entry['exponent'] > base['exponent'] + EXPONENT_SLACK
+            regressions += grew
+            print(f"{name:<12} exponent {base['exponent']:.2f} -> {entry['exponent']:.2f}"
+                  f"{'  REGRESSION' if grew else ''}")
+    print(f"{regressions} regression(s) against {path}")
+    return regressions
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = cli.add_subparsers(dest='command', required=True)
+
+    run_cmd = commands.add_parser('run', help="measure and print, optionally saving a baseline")
+    run_cmd.add_argument('--sizes', type=int, nargs='+', default=DEFAULTS['sizes'])
+    run_cmd.add_argument('--expr-depth', type=int, default=DEFAULTS['expr_depth'])
+    run_cmd.add_argument('--nesting', type=int, default=DEFAULTS['nesting'])
+    run_cmd.add_argument('--identifiers', type=int, default=DEFAULTS['identifiers'])
+    run_cmd.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+    run_cmd.add_argument('--repeat', type=int, default=DEFAULTS['repeat'],
+                         help="best-of repetitions (default: 3)")
+    run_cmd.add_argument('--save', metavar='JSON', help="write the results as a baseline")
+
+    compare_cmd = commands.add_parser('compare', help="rerun a baseline and fail on regressions")
+    compare_cmd.add_argument('baseline', help="JSON written by run --save")
+    compare_cmd.add_argument('--tolerance', type=float, default=0.25,
+                             help="allowed slowdown as a fraction (default: 0.25)")
+    compare_cmd.add_argument('--repeat', type=int, default=None,
+                             help="best-of repetitions (default: the baseline's)")
+
+    args = cli.parse_args(argv)
+    if args.command == 'run':
+        params = {'sizes': args.sizes, 'expr_depth': args.expr_depth, 'nesting': args.nesting,
+                  'identifiers': args.identifiers, 'seed': args.seed, 'repeat': args.repeat}
+        run(params, args.save)
+        return 0
+    return 1 if compare(args.baseline, args.tolerance, args.repeat) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Symbol lookup cost against block nesting depth.
+
+Compares VariableRegistry, which keeps one shadow stack per identifier,
+with a registry that walks the scope stack from the innermost scope out on
+every lookup (the previous implementation). Reports raw find() throughput
+for a global seen from the innermost scope, and parse time of
+identifier-heavy nested programs (see benchmarks.synth.nested_scope_program):
+
+    python -m benchmarks.symbol_lookup [--depths 1 16 64 256] [--references 20]
+"""
+import argparse
+import time
+
+from benchmarks.synth import nested_scope_program
+from lexer import TokenScanner
+from parser import SyntaxProcessor
+from symbol_table import VariableRegistry
+
+
+class ScopeWalkRegistry(VariableRegistry):
+    """Baseline: lookups search every enclosing scope dictionary"""
+
+    def find(self, identifier):
+        for scope in reversed(self.scope_stack):
+            if identifier in scope:
+                return scope[identifier]
+        return None
+
+
+def lookups_per_second(registry_class, depth, count=200_000):
+    """find() calls per second for a global name under depth nested scopes"""
+    registry = registry_class()
+    registry.add('g', 'int')
+    for level in range(depth):
+        registry.push_scope()
+        registry.add(f"l{level}", 'int')
+    find = registry.find
+    start = time.perf_counter()
+    for _ in range(count):
+        find('g')
+    return count / (time.perf_counter() - start)
+
+
+def parse_seconds(registry_class, tokens, scanner, processor, repeat):
+    """Best parse time of pre-scanned tokens with the given registry"""
+    processor.registry = registry_class()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processor.process(tokenfunc=scanner.feed(tokens))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(depths, references, repeat):
+    """Print lookup rate and parse time of both registries per depth"""
+    scanner = TokenScanner()
+    scanner.initialize(fast=True)
+    processor = SyntaxProcessor()
+    processor.initialize(fast=True)
+
+    print(f"{'depth':>6} {'tokens':>8} {'walk Mfind/s':>13} {'shadow Mfind/s':>15} "
+          f"{'walk parse s':>13} {'shadow parse s':>15} {'speedup':>8}")
+    for depth in depths:
+        tokens, _ = scanner.scan(nested_scope_program(depth, references))
+        walk_rate = lookups_per_second(ScopeWalkRegistry, depth)
+        shadow_rate = lookups_per_second(VariableRegistry, depth)
+        walk_parse = parse_seconds(ScopeWalkRegistry, tokens, scanner, processor, repeat)
+        shadow_parse = parse_seconds(VariableRegistry, tokens, scanner, processor, repeat)
+        print(f"{depth:>6} {len(tokens):>8} {walk_rate / 1e6:>13.2f} {shadow_rate / 1e6:>15.2f} "
+              f"{walk_parse:>13.3f} {shadow_parse:>15.3f} {walk_parse / shadow_parse:>7.2f}x")
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cli.add_argument('--depths', type=int, nargs='+', default=[1, 16, 64, 256, 1024])
+    cli.add_argument('--references', type=int, default=20,
+                     help="assignments per nesting level (default: 20)")
+    cli.add_argument('--repeat', type=int, default=3, help="best-of repetitions (default: 3)")
+    args = cli.parse_args(argv)
+    run(args.depths, args.references, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Synthetic source programs for benchmarks."""
+import random
+
+
+def straight_line_program(statements, variables=8, seed=0):
+    """
+    Generate a flat program of declarations, assignments and prints
+
+    Args:
+        statements: Number of statements after the declarations
+        variables: Number of distinct variables referenced
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        str: Source code
+    """
+    rng = random.Random(seed)
+    names = [f"v{i}" for i in range(variables)]
+    lines = [f"int {name};" for name in names]
+    lines.extend(f"{name} = {i};" for i, name in enumerate(names))
+    ops = '+-*'
+    for i in range(statements):
+        dst = rng.choice(names)
+        if i % 8 == 7:
+            lines.append(f"print({dst});")
+        else:
+            lines.append(f"{dst} = {rng.choice(names)} {rng.choice(ops)} {rng.randint(1, 9)};")
+    return "\n".join(lines) + "\n"
+
+
+def branchy_program(statements, variables=8, seed=0):
+    """
+    Generate a program of if/while statements with small bodies
+
+    Every statement contributes a few basic blocks, for control-flow and
+    dataflow benchmarks.
+
+    Args:
+        statements: Number of if/while statements after the declarations
+        variables: Number of distinct variables referenced
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        str: Source code
+    """
+    rng = random.Random(seed)
+    names = [f"v{i}" for i in range(variables)]
+    lines = [f"int {name};" for name in names]
+    lines.extend(f"{name} = {i};" for i, name in enumerate(names))
+    for i in range(statements):
+        cond = f"{rng.choice(names)} < {rng.randint(1, 99)}"
+        dst = rng.choice(names)
+        body = f"{dst} = {rng.choice(names)} + {rng.choice(names)}; print({dst});"
+        keyword = 'while' if i % 4 == 3 else 'if'
+        lines.append(f"{keyword} ({cond}) {{ {body} }}")
+    return "\n".join(lines) + "\n"
+
+
+def nested_scope_program(depth, references, variables=8, seed=0):
+    """
+    Generate blocks nested depth deep whose statements mostly read globals
+
+    Each level declares one local and assigns it references times from
+    globals and its own local, so every identifier lookup has to see past
+    all enclosing block scopes.
+
+    Args:
+        depth: Nesting depth of the innermost block
+        references: Assignments per level
+        variables: Number of global variables
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        str: Source code
+    """
+    rng = random.Random(seed)
+    names = [f"g{i}" for i in range(variables)]
+    lines = [f"int {name};" for name in names]
+    lines.extend(f"{name} = {i};" for i, name in enumerate(names))
+    for level in range(depth):
+        local = f"l{level}"
+        lines.append(f"if ({rng.choice(names)} < {rng.randint(1, 99)}) {{")
+        lines.append(f"int {local};")
+        for _ in range(references):
+            lines.append(f"{local} = {rng.choice(names)} + {rng.choice(names)} * {local};")
+    lines.append("print(g0);")
+    lines.extend("}" for _ in range(depth))
+    return "\n".join(lines) + "\n"
+
+
+def loop_program(loops, iterations=12, floats=True, seed=0):
+    """
+    Generate terminating counted loops nested up to three deep
+
+    Loops count up or down by a constant step, some on float counters, and
+    their bodies mix multiplications of the counter by constants, invariant
+    expressions, conditional assignments, float accumulation and divisions
+    by zero inside loops that are never entered, for exercising the loop
+    optimizations.
+
+    Args:
+        loops: Number of outermost loops
+        iterations: Largest trip count of each loop
+        floats: Whether to use floats at all (the x86 target has none)
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        str: Source code
+    """
+    rng = random.Random(seed)
+    names = [f"g{i}" for i in range(6)]
+    lines = ["int zero;", "float acc;" if floats else "int acc;"]
+    lines.extend(f"int {name};" for name in names)
+    lines.extend(f"{name} = {rng.randint(0, 9)};" for name in names)
+    counters = 0
+
+    def body(level, counter, depth):
+        nonlocal counters
+        indent = '    ' * depth
+        for _ in range(rng.randint(2, 5)):
+            dst, a, b = rng.choice(names), rng.choice(names), rng.choice(names)
+            factor = rng.randint(2, 9)
+            pick = rng.randrange(8)
+            if pick == 0:
+                lines.append(f"{indent}{dst} = {dst} + {counter} * {factor};")
+            elif pick == 1:
+                counters += 1
+                lines.append(f"{indent}int t{counters} = {a} * {b} % 1000 + {factor};")
+                lines.append(f"{indent}{dst} = t{counters} - {counter};")
+            elif pick == 2:
+                lines.append(f"{indent}if ({counter} % 3 == 0) {{ {dst} = {a} % 100 + {factor}; }}")
+            elif pick == 3:
+                lines.append(f"{indent}print({factor} * {counter} + {a});")
+            elif pick == 4 and floats:
+                lines.append(f"{indent}acc = acc + {counter} * 0.5;")
+            elif pick == 5:
+                lines.append(f"{indent}while (zero > 0) {{ {dst} = {a} / zero; }}")
+            elif level < 2:
+                loop(level + 1, depth)
+            else:
+                lines.append(f"{indent}{dst} = {a} * {factor} % 1000 + {b} % 1000;")
+
+    def loop(level, depth):
+        nonlocal counters
+        counters += 1
+        counter = f"i{counters}"
+        indent = '    ' * depth
+        step = rng.randint(1, 3)
+        trips = rng.randint(0, iterations)
+        shape = rng.randrange(4 if floats else 3)
+        if shape == 0:
+            lines.append(f"{indent}int {counter} = 0;")
+            lines.append(f"{indent}while ({counter} {rng.choice(['<', '<='])} {trips}) {{")
+            update = f"{counter} = {counter} + {step};"
+        elif shape == 1:
+            lines.append(f"{indent}int {counter} = {trips * step};")
+            lines.append(f"{indent}while ({counter} {rng.choice(['>', '!='])} 0) {{")
+            update = f"{counter} = {counter} - {step};"
+        elif shape == 2:
+            lines.append(f"{indent}int {counter} = 0;")
+            lines.append(f"{indent}while ({trips} > {counter}) {{")
+            update = f"{counter} = {step} + {counter};"
+        else:
+            lines.append(f"{indent}float {counter} = 0.0;")
+            lines.append(f"{indent}while ({counter} < {trips / 2}) {{")
+            update = f"{counter} = {counter} + 0.5;"
+        body(level, counter, depth + 1)
+        lines.append(f"{indent}    {update}")
+        if rng.random() < 0.5:
+            body(level, counter, depth + 1)
+        lines.append(f"{indent}}}")
+
+    for _ in range(loops):
+        loop(0, 0)
+    lines.extend(f"print({name});" for name in names + ['acc'])
+    return "\n".join(lines) + "\n"
+
+
+class ProgramGenerator:
+    """Random valid programs with tunable size, expression depth, nesting and identifiers"""
+
+    OPERATORS = ('+', '-', '*', '/', '%')
+    RELATIONS = ('<', '<=', '>', '>=', '==', '!=')
+
+    def __init__(self, expr_depth=3, nesting=3, identifiers=16, seed=0):
+        self.expr_depth = expr_depth
+        self.nesting = nesting
+        self.identifiers = identifiers
+        self.rng = random.Random(seed)
+        self.lines = []
+        # Names visible at the current point, one list per open scope
+        self.scopes = []
+        self.local_counter = 0
+
+    def name(self):
+        """A declared name, globals and locals alike"""
+        scope = self.rng.choice([scope for scope in self.scopes if scope])
+        return self.rng.choice(scope)
+
+    def expression(self, depth):
+        """Source of an expression tree depth operators deep"""
+        rng = self.rng
+        if depth <= 0:
+            return self.name() if rng.random() < 0.7 else str(rng.randint(0, 99))
+        op = rng.choice(self.OPERATORS)
+        left = self.expression(depth - 1)
+        if op in '/%':
+            # Divisors are non-zero literals, so every program runs
+            right = str(rng.randint(1, 9))
+        else:
+            right = self.expression(rng.randint(0, depth - 1))
+        text = f"{left} {op} {right}"
+        return f"({text})" if rng.random() < 0.5 else text
+
+    def statement(self, level, budget):
+        """
+        Append one statement, nesting blocks while budget allows
+
+        Args:
+            level: Current block nesting
+            budget: Statements left to generate, blocks included
+
+        Returns:
+            int: Statements generated
+        """
+        rng = self.rng
+        pick = rng.random()
+        if level < self.nesting and budget > 2 and pick < 0.2:
+            keyword = 'while' if pick < 0.05 else 'if'
+            cond = (f"{self.expression(rng.randint(0, self.expr_depth))} "
+                    f"{rng.choice(self.RELATIONS)} {self.expression(0)}")
+            self.lines.append(f"{'    ' * level}{keyword} ({cond}) {{")
+            used = 1 + self.block(level + 1, rng.randint(1, min(budget - 1, 8)))
+            if keyword == 'if' and budget - used > 1 and rng.random() < 0.4:
+                self.lines.append(f"{'    ' * level}}} else {{")
+                used += self.block(level + 1, rng.randint(1, min(budget - used, 8)))
+            self.lines.append(f"{'    ' * level}}}")
+            return used
+        indent = '    ' * level
+        if pick < 0.3 and level:
+            self.local_counter += 1
+            local = f"t{self.local_counter}"
+            self.lines.append(f"{indent}int {local} = {self.expression(self.expr_depth)};")
+            self.scopes[-1].append(local)
+        elif pick < 0.4:
+            self.lines.append(f"{indent}print({self.expression(self.expr_depth)});")
+        else:
+            self.lines.append(f"{indent}{self.name()} = {self.expression(self.expr_depth)};")
+        return 1
+
+    def block(self, level, count):
+        """Append count statements in a new scope; returns statements generated"""
+        self.scopes.append([])
+        used = 0
+        while used < count:
+            used += self.statement(level, count - used)
+        self.scopes.pop()
+        return used
+
+    def generate(self, statements):
+        """
+        Generate a program
+
+        Args:
+            statements: Number of statements after the declarations, block
+                        headers and nested statements included
+
+        Returns:
+            str: Source code
+        """
+        names = [f"v{i}" for i in range(self.identifiers)]
+        self.lines = [f"int {name};" for name in names]
+        self.lines.extend(f"{name} = {i};" for i, name in enumerate(names))
+        self.scopes = [names]
+        self.local_counter = 0
+        used = 0
+        while used < statements:
+            used += self.statement(0, statements - used)
+        return "\n".join(self.lines) + "\n"
+
+
+def random_program(statements, expr_depth=3, nesting=3, identifiers=16, seed=0):
+    """
+    Generate a random valid program (see ProgramGenerator)
+
+    Args:
+        statements: Number of statements after the declarations
+        expr_depth: Operators along the deepest path of each expression
+        nesting: Deepest block nesting
+        identifiers: Number of global variables
+        seed: Random seed, so runs are reproducible
+
+    Returns:
+        str: Source code
+    """
+    return ProgramGenerator(expr_depth, nesting, identifiers, seed).generate(statements)
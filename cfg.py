@@ -0,0 +1,414 @@
+"""Basic blocks and control-flow graphs over the three-address IR.
+
+A block starts at the first instruction, at every label some jump refers to,
+and after every jump. Labels nothing jumps to do not split blocks.
+"""
+import gc
+from contextlib import contextmanager
+
+from ir import MARK, JUMP, JUMP_IF_FALSE
+
+
+@contextmanager
+def gc_paused():
+    """
+    Suspend the cyclic garbage collector
+
+    Analyses allocate one small acyclic object per block or instruction;
+    with a large IR alive, the collections those allocations trigger would
+    otherwise rescan it over and over.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def depth_first_postorder(entry, succs):
+    """
+    Nodes reachable from entry in depth-first postorder
+
+    Args:
+        entry: Start node (an int)
+        succs: Sequence indexed by node giving its successor nodes
+
+    Returns:
+        list: Reachable nodes only
+    """
+    seen = {entry}
+    order = []
+    stack = [(entry, iter(succs[entry]))]
+    while stack:
+        node, pending = stack[-1]
+        for succ in pending:
+            if succ not in seen:
+                seen.add(succ)
+                stack.append((succ, iter(succs[succ])))
+                break
+        else:
+            stack.pop()
+            order.append(node)
+    return order
+
+
+def immediate_dominators(entry, succs, preds):
+    """
+    Immediate dominator of every node (Cooper, Harvey & Kennedy)
+
+    Pass the reversed edges and the exit node to get post-dominators.
+
+    Args:
+        entry: Start node
+        succs: Sequence indexed by node giving its successors
+        preds: Sequence indexed by node giving its predecessors
+
+    Returns:
+        list: idom per node; entry maps to itself, unreachable nodes to None
+    """
+    order = depth_first_postorder(entry, succs)
+    number = [None] * len(succs)
+    for idx, node in enumerate(order):
+        number[node] = idx
+    idom = [None] * len(succs)
+    idom[entry] = entry
+    changed = True
+    while changed:
+        changed = False
+        for node in reversed(order):
+            if node == entry:
+                continue
+            new = None
+            for pred in preds[node]:
+                if idom[pred] is None:
+                    continue
+                if new is None:
+                    new = pred
+                    continue
+                # Walk both up the tree until they meet
+                a = pred
+                while a != new:
+                    while number[a] < number[new]:
+                        a = idom[a]
+                    while number[new] < number[a]:
+                        new = idom[new]
+            if idom[node] != new:
+                idom[node] = new
+                changed = True
+    return idom
+
+
+class BasicBlock:
+    """A maximal straight-line run of IR instructions"""
+
+    __slots__ = ('index', 'start', 'end', 'succs', 'preds')
+
+    def __init__(self, index, start, end):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.succs = []
+        self.preds = []
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"BasicBlock({self.index}, [{self.start}:{self.end}], succs={self.succs})"
+
+
+class NaturalLoop:
+    """A loop: its header block, the blocks of its body and those jumping back"""
+
+    __slots__ = ('header', 'body', 'latches')
+
+    def __init__(self, header, body, latches):
+        self.header = header
+        # Block indices, the header included
+        self.body = body
+        self.latches = latches
+
+    def __repr__(self):
+        return f"NaturalLoop(B{self.header}, {len(self.body)} blocks, latches={self.latches})"
+
+
+class ControlFlowGraph:
+    """Basic blocks of an instruction list with successor and predecessor edges"""
+
+    def __init__(self, ir_code):
+        self.ir_code = ir_code
+        self.blocks = []
+        self.block_of_label = {}
+        self._postorder = None
+        self._idom = None
+        self._dom_span = None
+        with gc_paused():
+            self.build()
+
+    def build(self):
+        """Split ir_code into blocks and connect them"""
+        code = self.ir_code
+        targets = set()
+        for instr in code:
+            if instr.op is JUMP:
+                targets.add(instr.src1)
+            elif instr.op is JUMP_IF_FALSE:
+                targets.add(instr.src2)
+
+        blocks = self.blocks
+        start = 0
+        for idx, instr in enumerate(code):
+            op = instr.op
+            if op is MARK and instr.src1 in targets and idx > start:
+                blocks.append(BasicBlock(len(blocks), start, idx))
+                start = idx
+            elif op is JUMP or op is JUMP_IF_FALSE:
+                blocks.append(BasicBlock(len(blocks), start, idx + 1))
+                start = idx + 1
+        if start < len(code):
+            blocks.append(BasicBlock(len(blocks), start, len(code)))
+
+        # A block may begin with several labels in a row
+        labels = self.block_of_label
+        for block in blocks:
+            for idx in range(block.start, block.end):
+                if code[idx].op is not MARK:
+                    break
+                labels[code[idx].src1] = block.index
+
+        count = len(blocks)
+        for block in blocks:
+            last = code[block.end - 1]
+            succs = block.succs
+            if last.op is JUMP:
+                if last.src1 in labels:
+                    succs.append(labels[last.src1])
+            else:
+                if block.index + 1 < count:
+                    succs.append(block.index + 1)
+                if last.op is JUMP_IF_FALSE and last.src2 in labels:
+                    target = labels[last.src2]
+                    if target not in succs:
+                        succs.append(target)
+            for succ in succs:
+                blocks[succ].preds.append(block.index)
+
+    def instructions(self, block):
+        """The instructions of a block, in order"""
+        return self.ir_code[block.start:block.end]
+
+    def postorder(self):
+        """
+        Block indices in depth-first postorder from the entry block
+
+        A conditional jump's target is searched before its fall-through, so
+        reverse postorder follows the layout of structured code: a loop's
+        body comes before its exit and a branch before its join, instead of
+        after everything the exit or join leads to.
+
+        Returns:
+            list: Reachable blocks only
+        """
+        if self._postorder is not None:
+            return list(self._postorder)
+        if not self.blocks:
+            return []
+        succs = [block.succs[::-1] for block in self.blocks]
+        self._postorder = depth_first_postorder(0, succs)
+        return list(self._postorder)
+
+    def dominators(self):
+        """
+        Immediate dominator of every block
+
+        Returns:
+            list: Block index per block; the entry maps to itself and
+                  unreachable blocks to None
+        """
+        if self._idom is None:
+            blocks = self.blocks
+            self._idom = immediate_dominators(0, [b.succs for b in blocks],
+                                              [b.preds for b in blocks]) if blocks else []
+        return self._idom
+
+    def dominates(self, a, b):
+        """Whether block a dominates block b (every block dominates itself)"""
+        if self._dom_span is None:
+            self._dom_span = self._dominator_spans()
+        enter, leave = self._dom_span
+        if enter[a] is None or enter[b] is None:
+            return a == b
+        return enter[a] <= enter[b] and leave[b] <= leave[a]
+
+    def _dominator_spans(self):
+        """
+        Preorder and postorder number of every block in the dominator tree
+
+        a dominates b when b's numbers nest inside a's, which answers each
+        query in constant time instead of walking up from b.
+
+        Returns:
+            tuple: (enter, leave) lists, None for unreachable blocks
+        """
+        idom = self.dominators()
+        count = len(idom)
+        children = [[] for _ in range(count)]
+        for block, parent in enumerate(idom):
+            if parent is not None and parent != block:
+                children[parent].append(block)
+        enter = [None] * count
+        leave = [None] * count
+        if not count:
+            return enter, leave
+        clock = 0
+        enter[0] = clock
+        stack = [(0, iter(children[0]))]
+        while stack:
+            block, pending = stack[-1]
+            child = next(pending, None)
+            if child is None:
+                stack.pop()
+                clock += 1
+                leave[block] = clock
+            else:
+                clock += 1
+                enter[child] = clock
+                stack.append((child, iter(children[child])))
+        return enter, leave
+
+    def loops(self, max_blocks=None):
+        """
+        Natural loops, each nested loop before the loops around it
+
+        A back edge goes from a block to one dominating it, the loop's
+        header; the body is the header plus every block reaching a back
+        edge without passing through the header. A retreating edge to a
+        block that does not dominate its source (irreducible flow, which
+        the language cannot produce) makes no loop.
+
+        Args:
+            max_blocks: Leave out loops whose body has more blocks than
+                        this, without walking the rest of it; the bodies of
+                        n nested loops add up to O(n^2) blocks otherwise
+
+        Returns:
+            list: NaturalLoop objects, smallest body first
+        """
+        blocks = self.blocks
+        order = self.postorder()
+        number = [None] * len(blocks)
+        for idx, block in enumerate(order):
+            number[block] = idx
+        latches = {}
+        for block in order:
+            for succ in blocks[block].succs:
+                # Only a retreating edge (to a block finishing later) can go back
+                if number[succ] >= number[block] and self.dominates(succ, block):
+                    latches.setdefault(succ, []).append(block)
+
+        # Innermost first: a nested header is dominated by the headers around
+        # it, so it finishes earlier. Each loop found is folded into its
+        # header, so the walks of the loops around it step over it in one
+        # move and all the walks together visit every edge about once.
+        headers = sorted(latches, key=number.__getitem__)
+        folded = list(range(len(blocks)))  # block -> header of the outermost loop found around it
+        size = [1] * len(blocks)           # blocks in a found loop, by its header
+        members = {}                       # header -> blocks and folded headers right inside
+        for header in headers:
+            inside = []
+            seen = {header}
+            stack = []
+            for latch in latches[header]:
+                top = self._fold_root(folded, latch)
+                if top not in seen:
+                    seen.add(top)
+                    stack.append(top)
+            while stack:
+                block = stack.pop()
+                inside.append(block)
+                size[header] += size[block]
+                for pred in blocks[block].preds:
+                    if number[pred] is None:
+                        continue
+                    top = self._fold_root(folded, pred)
+                    if top not in seen:
+                        seen.add(top)
+                        stack.append(top)
+            for block in inside:
+                folded[block] = header
+            members[header] = inside
+
+        # Nested loops are inside the loops around them, so once one is too
+        # big so are those
+        limit = len(blocks) if max_blocks is None else max_blocks
+        bodies = {}
+        loops = []
+        for header in headers:
+            if size[header] > limit:
+                continue
+            body = {header}
+            for block in members[header]:
+                if block in bodies:
+                    body |= bodies[block]
+                else:
+                    body.add(block)
+            bodies[header] = body
+            loops.append(NaturalLoop(header, body, latches[header]))
+        loops.sort(key=lambda loop: len(loop.body))
+        return loops
+
+    @staticmethod
+    def _fold_root(folded, block):
+        """The header block has been folded into, halving the path on the way"""
+        while folded[block] != block:
+            folded[block] = folded[folded[block]]
+            block = folded[block]
+        return block
+
+    def reverse_postorder(self):
+        """Block indices in reverse postorder, the natural forward-analysis order"""
+        order = self.postorder()
+        order.reverse()
+        return order
+
+    def backward_order(self):
+        """
+        Reachable block indices in reverse postorder of the reversed graph,
+        searched from the blocks without successors: the natural
+        backward-analysis order. Postorder of the graph itself visits a loop
+        nest's inner headers before the outer ones feed them, so liveness
+        would take a sweep per nesting level. Blocks that reach no exit
+        (endless loops) follow in postorder.
+        """
+        forward = self.postorder()
+        if not forward:
+            return []
+        count = len(self.blocks)
+        preds = [block.preds for block in self.blocks]
+        # A virtual node every exit leads to, finishing last
+        preds.append([block.index for block in self.blocks if not block.succs])
+        order = depth_first_postorder(count, preds)
+        order.pop()
+        order.reverse()
+        reached = set(forward)
+        order = [index for index in order if index in reached]
+        placed = set(order)
+        order.extend(index for index in forward if index not in placed)
+        return order
+
+    def unreachable(self):
+        """Indices of blocks the entry block cannot reach"""
+        reached = set(self.postorder())
+        return [block.index for block in self.blocks if block.index not in reached]
+
+    def format(self):
+        """
+        Blocks and edges as text
+
+        Returns:
+            list: Lines, one per block
+        """
+        return [f"B{b.index}: [{b.start}:{b.end}] preds={b.preds} succs={b.succs}"
+                for b in self.blocks]
@@ -1,34 +1,66 @@
+from ir import (ASSIGN, ADD, SUB, MUL, DIV, MOD, LT, LE, GT, GE, EQ, NE, MARK, JUMP, JUMP_IF_FALSE,
+                OUTPUT, ARITHMETIC, COMPARISON)
+from regalloc import LinearScanAllocator
+
+
 class AssemblyTranslator:
     """Converts IR to assembly language"""
     
+    ARITH_MNEMONICS = {ADD: 'ADD', SUB: 'SUB', MUL: 'IMUL', DIV: 'IDIV', MOD: 'MOD'}
+    SET_MNEMONICS = {LT: 'SETL', LE: 'SETLE', GT: 'SETG', GE: 'SETGE',
+                     EQ: 'SETE', NE: 'SETNE'}
+    
     def __init__(self):
         self.asm_output = []
         self.regs = ['AX', 'BX', 'CX', 'DX']
-        self.reg_alloc = {}
-        self.reg_idx = 0
+        self.allocator = LinearScanAllocator(self.regs)
+        self.location = {}
+        self.stats = {}
+        
+    def slot_address(self, slot):
+        """Frame address of a spill slot"""
+        return f"[BP-{4 * (slot + 1)}]"
         
-    def allocate_reg(self, var):
+    def operand(self, value, scratch=0):
         """
-        Allocate a register for a variable
+        Register or immediate holding an operand, reloading it if spilled
         
         Args:
-            var: Variable name
+            value: Name or literal
+            scratch: Scratch register index to reload a spilled name into
             
         Returns:
-            str: Register name
+            Register name or the literal itself
         """
-        if var in self.reg_alloc:
-            return self.reg_alloc[var]
-        
-        reg = self.regs[self.reg_idx % len(self.regs)]
-        self.reg_idx += 1
-        self.reg_alloc[var] = reg
+        if not isinstance(value, str):
+            return value
+        interval = self.location[value]
+        if interval.reg is not None:
+            return interval.reg
+        reg = self.allocator.scratch[scratch]
+        self.asm_output.append(f"    MOV {reg}, {self.slot_address(interval.slot)}")
+        self.stats['reloads'] += 1
         return reg
+        
+    def result_reg(self, var):
+        """Register an instruction should write var's new value to"""
+        interval = self.location[var]
+        return interval.reg if interval.reg is not None else self.allocator.scratch[0]
+        
+    def store(self, var, reg):
+        """Write a result computed in reg back to var's spill slot, if it has one"""
+        interval = self.location[var]
+        if interval.reg is None:
+            self.asm_output.append(f"    MOV {self.slot_address(interval.slot)}, {reg}")
+            self.stats['stores'] += 1
     
     def translate(self, ir_code):
         """
         Translate intermediate representation to assembly code
         
+        Registers come from a liveness-based linear-scan allocation
+        (see regalloc); statistics of the last call are kept in self.stats.
+        
         Args:
             ir_code: List of IR instructions
             
@@ -36,68 +68,74 @@ class AssemblyTranslator:
             list: Assembly code lines
         """
         self.asm_output = []
+        self.location = self.allocator.allocate(ir_code)
+        self.stats = self.allocator.stats()
+        self.stats.update(reloads=0, stores=0, moves_eliminated=0)
+        frame = 4 * self.stats['spilled']
         self.asm_output.append("; Generated Assembly Code")
         self.asm_output.append("section .data")
         self.asm_output.append("section .text")
         self.asm_output.append("global main")
         self.asm_output.append("main:")
+        if frame:
+            self.asm_output.append("    PUSH BP")
+            self.asm_output.append("    MOV BP, SP")
+            self.asm_output.append(f"    SUB SP, {frame}")
         
+        emit = self.asm_output.append
         for instr in ir_code:
-            op = instr['op']
-            s1 = instr['src1']
-            s2 = instr['src2']
-            d = instr['dst']
+            op = instr.op
+            s1 = instr.src1
+            s2 = instr.src2
+            d = instr.dst
             
-            if op == 'assign':
-                r_src = self.allocate_reg(s1) if isinstance(s1, str) and s1.startswith('temp') else None
-                r_dst = self.allocate_reg(d)
-                
-                if r_src:
-                    self.asm_output.append(f"    MOV {r_dst}, {r_src}")
+            if op is ASSIGN:
+                v = self.operand(s1)
+                interval = self.location[d]
+                if interval.reg is None:
+                    emit(f"    MOV {self.slot_address(interval.slot)}, {v}")
+                    self.stats['stores'] += 1
+                elif v == interval.reg:
+                    self.stats['moves_eliminated'] += 1
                 else:
-                    self.asm_output.append(f"    MOV {r_dst}, {s1}")
+                    emit(f"    MOV {interval.reg}, {v}")
                     
-            elif op in ['+', '-', '*', '/', '%']:
-                r1 = self.allocate_reg(s1) if isinstance(s1, str) else None
-                r2 = self.allocate_reg(s2) if isinstance(s2, str) else None
-                r_res = self.allocate_reg(d)
-                
-                ops = {'+': 'ADD', '-': 'SUB', '*': 'IMUL', '/': 'IDIV', '%': 'MOD'}
+            elif op in ARITHMETIC:
+                v1 = self.operand(s1, 0)
+                v2 = v1 if s2 == s1 and isinstance(s2, str) else self.operand(s2, 1)
+                r_res = self.result_reg(d)
                 
-                v1 = r1 if r1 else s1
-                v2 = r2 if r2 else s2
-                
-                self.asm_output.append(f"    {ops[op]} {r_res}, {v1}, {v2}")
+                emit(f"    {self.ARITH_MNEMONICS[op]} {r_res}, {v1}, {v2}")
+                self.store(d, r_res)
                     
-            elif op in ['<', '<=', '>', '>=', '==', '!=']:
-                r1 = self.allocate_reg(s1) if isinstance(s1, str) else None
-                r2 = self.allocate_reg(s2) if isinstance(s2, str) else None
-                r_res = self.allocate_reg(d)
-                
-                v1 = r1 if r1 else s1
-                v2 = r2 if r2 else s2
+            elif op in COMPARISON:
+                v1 = self.operand(s1, 0)
+                v2 = v1 if s2 == s1 and isinstance(s2, str) else self.operand(s2, 1)
+                r_res = self.result_reg(d)
                 
-                self.asm_output.append(f"    CMP {v1}, {v2}")
-                self.asm_output.append(f"    SETCC {r_res}")
+                emit(f"    CMP {v1}, {v2}")
+                emit(f"    {self.SET_MNEMONICS[op]} {r_res}")
+                self.store(d, r_res)
                 
-            elif op == 'mark':
-                self.asm_output.append(f"{s1}:")
+            elif op is MARK:
+                emit(f"{s1}:")
                 
-            elif op == 'jump':
-                self.asm_output.append(f"    JMP {s1}")
+            elif op is JUMP:
+                emit(f"    JMP {s1}")
                 
-            elif op == 'jump_if_false':
-                r = self.allocate_reg(s1) if isinstance(s1, str) else None
-                v = r if r else s1
-                self.asm_output.append(f"    CMP {v}, 0")
-                self.asm_output.append(f"    JZ {s2}")
+            elif op is JUMP_IF_FALSE:
+                v = self.operand(s1)
+                emit(f"    CMP {v}, 0")
+                emit(f"    JZ {s2}")
                 
-            elif op == 'output':
-                r = self.allocate_reg(s1) if isinstance(s1, str) else None
-                v = r if r else s1
-                self.asm_output.append(f"    CALL print_{v}")
+            elif op is OUTPUT:
+                v = self.operand(s1)
+                emit(f"    CALL print_{v}")
         
+        if frame:
+            self.asm_output.append("    MOV SP, BP")
+            self.asm_output.append("    POP BP")
         self.asm_output.append("    MOV EAX, 0")
         self.asm_output.append("    RET")
         
-        return self.asm_output
\ No newline at end of file
+        return self.asm_output
@@ -0,0 +1,236 @@
+"""Content-addressed on-disk cache of compilation results.
+
+An entry is keyed by the SHA-256 of the source text, the compiler version
+(a hash of the compiler's own modules, PLY's version and the Python
+version) and the options that change the output. Its value is everything a
+CompilationResult carries: tokens, issues, AST, symbol table snapshot, IR,
+target code and statistics, flattened to tuples and stored with marshal +
+zlib.
+
+Entries are files under <root>/<first two hex digits>/<key>. A hit touches
+the file, so modification times order entries by last use; once the cache
+grows past its size cap the least recently used entries are deleted. Set
+MINICOMPILER_COMPILE_CACHE to relocate the cache.
+"""
+import functools
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+import zlib
+
+import ply
+
+from cfg import gc_paused
+from ir import Instr, Op
+from lexer import TokenRecord
+
+CACHE_ROOT = os.environ.get('MINICOMPILER_COMPILE_CACHE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '__compilecache__')
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Modules whose source determines what the pipeline produces
+COMPILER_MODULES = ('lexer', 'parser', 'symbol_table', 'ir', 'ir_generator', 'cfg', 'dataflow',
+                    'ssa', 'optimizer', 'regalloc', 'code_generator', 'peephole',
+                    'python_generator', 'x86_generator', 'pipeline', 'compile_cache')
+
+# Bump when the entry layout changes
+FORMAT = 1
+
+OPS = list(Op)
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version():
+    """
+    Hash of everything besides the source that decides a compilation's output
+
+    Returns:
+        str: Hex digest over the compiler modules, PLY and Python versions
+    """
+    digest = hashlib.sha256(f"{FORMAT}\0{ply.__version__}\0{sys.version}\0".encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in COMPILER_MODULES:
+        with open(os.path.join(here, name + '.py'), 'rb') as fh:
+            digest.update(fh.read())
+    return digest.hexdigest()[:16]
+
+
+def cache_key(src, opt_level, target):
+    """
+    Content address of one compilation
+
+    Args:
+        src: Source code string
+        opt_level: IR optimization level
+        target: Code generation target name
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256(f"{compiler_version()}\0{opt_level}\0{target}\0".encode())
+    digest.update(src.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def encode(fields):
+    """
+    Serialize CompilationResult fields
+
+    Args:
+        fields: dict of CompilationResult constructor arguments
+
+    Returns:
+        bytes: Compressed entry
+    """
+    record = dict(fields)
+    record['tokens'] = [(tok.type, tok.value, tok.lineno, tok.lexpos) for tok in fields['tokens']]
+    record['ir_code'] = [(int(instr.op), instr.src1, instr.src2, instr.dst)
+                         for instr in fields['ir_code']]
+    return zlib.compress(marshal.dumps(record), 1)
+
+
+def decode(data):
+    """
+    Inverse of encode
+
+    Returns:
+        dict: CompilationResult constructor arguments
+    """
+    record = marshal.loads(zlib.decompress(data))
+    record['tokens'] = [TokenRecord(*tok) for tok in record['tokens']]
+    record['ir_code'] = [Instr(OPS[op], src1, src2, dst)
+                         for op, src1, src2, dst in record['ir_code']]
+    return record
+
+
+class CompileCache:
+    """Size-capped, least-recently-used store of encoded compilation results"""
+
+    def __init__(self, root=CACHE_ROOT, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        # Bytes on disk as of the last scan plus what this process has written
+        self.size = None
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def path(self, key):
+        """File holding an entry"""
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """
+        Look an entry up, marking it as just used
+
+        Args:
+            key: From cache_key
+
+        Returns:
+            dict: CompilationResult constructor arguments, or None on a miss
+        """
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            os.utime(path)
+            with gc_paused():
+                record = decode(data)
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            # Missing, evicted by another process meanwhile, or damaged
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return record
+
+    def put(self, key, fields):
+        """
+        Store an entry, then evict old ones if the cap is exceeded
+
+        Args:
+            key: From cache_key
+            fields: dict of CompilationResult constructor arguments
+        """
+        try:
+            data = encode(fields)
+        except ValueError:
+            # An AST nested deeper than marshal recurses is not cached
+            return
+        if len(data) > self.max_bytes:
+            return
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # Written aside and renamed, so readers never see half an entry
+            fd, scratch = tempfile.mkstemp(prefix='.put-', dir=directory)
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(scratch, path)
+        except OSError:
+            return
+        self.stats['stores'] += 1
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.entries())
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """
+        Every entry on disk
+
+        Returns:
+            list: (last use, size, path) tuples
+        """
+        found = []
+        try:
+            shards = list(os.scandir(self.root))
+        except OSError:
+            return found
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue
+                found.append((info.st_mtime_ns, info.st_size, entry.path))
+        return found
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits its cap"""
+        entries = sorted(self.entries())
+        size = sum(size for _, size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+            self.stats['evictions'] += 1
+        self.size = size
+
+    def clear(self):
+        """Delete every entry"""
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.size = 0
+
+
+def format_cache_stats(stats):
+    """One summary line for a cache's hit/miss counters"""
+    lookups = stats['hits'] + stats['misses']
+    rate = stats['hits'] / lookups if lookups else 0.0
+    return (f"Cache: {stats['hits']} hits, {stats['misses']} misses ({rate:.0%} hit rate), "
+            f"{stats['evictions']} evicted")
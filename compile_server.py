@@ -0,0 +1,452 @@
+"""Long-lived compile server sharing warm compilers between clients.
+
+An asyncio front end listens on a Unix socket (or a local TCP port) and
+speaks newline-delimited JSON. Every request is an object with an "op":
+
+    compile   {"id", "source", "opt_level", "target", "timeout"}
+              -> {"id", "status": "ok", "issues", "tokens", "ir", "output",
+                  "cached", "seconds"}, "output" being the target code
+    stats     -> {"id", "status": "ok", "stats": {...}}
+    shutdown  -> {"id", "status": "ok"}, then the server stops
+
+Failures answer {"id", "status": "timeout" | "error", "error"}. Responses
+on one connection come back in completion order, matched by "id".
+
+Compile requests wait in a bounded queue; when it is full the server stops
+reading from connections, so clients feel backpressure instead of the
+server buffering without limit. Whenever a worker process is free the
+queued requests (up to batch_size) go to it as one batch. Each worker keeps
+one warm CompilerPipeline per target and a shared CompileCache. A request's
+timeout counts from its arrival; past it the worker cancels the compile at
+its next check and the client gets a timeout.
+
+    python main.py server [--socket PATH | --port N] [-j N]
+    python main.py client examples/ -o build
+"""
+import asyncio
+import collections
+import functools
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch import collect_sources, write_listings
+from compile_cache import CompileCache, DEFAULT_MAX_BYTES
+from listing import format_tokens, format_ir
+from pipeline import CompilationCancelled, CompilerPipeline, TARGETS
+
+DEFAULT_SOCKET = os.environ.get('MINICOMPILER_SERVER_SOCKET') or os.path.join(
+    tempfile.gettempdir(), f"minicompiler-{os.getuid() if hasattr(os, 'getuid') else 0}.sock")
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_MAX_PENDING = 256
+
+# Largest request or response line, in bytes
+MAX_MESSAGE = 64 * 1024 * 1024
+
+# Recent request latencies kept for the stats percentiles
+LATENCY_WINDOW = 1024
+
+_worker_pipelines = {}
+
+
+def _init_worker(cache_dir=None, cache_size=DEFAULT_MAX_BYTES):
+    """Build one warm pipeline per target (inherited as-is by forked workers)"""
+    cache = CompileCache(cache_dir, cache_size) if cache_dir is not None else None
+    for target in TARGETS:
+        pipeline = _worker_pipelines.get(target)
+        if pipeline is None:
+            pipeline = _worker_pipelines[target] = CompilerPipeline(0, target)
+            pipeline.initialize()
+        pipeline.cache = cache
+
+
+class Deadline:
+    """Event-like cancel flag for CompilerPipeline.compile that sets itself at a wall-clock time"""
+
+    def __init__(self, when):
+        self.when = when
+
+    def is_set(self):
+        return time.time() >= self.when
+
+
+def compile_one(src, opt_level, target, deadline):
+    """
+    Compile one request's source in a worker
+
+    Args:
+        src: Source code string
+        opt_level: IR optimization level
+        target: Key of pipeline.TARGETS
+        deadline: time.time() past which the compile is abandoned
+
+    Returns:
+        dict: Response fields besides "id"
+    """
+    if time.time() >= deadline:
+        return {'status': 'timeout', 'error': "timed out while queued"}
+    pipeline = _worker_pipelines[target]
+    pipeline.opt_level = opt_level
+    start = time.perf_counter()
+    try:
+        result = pipeline.compile(src, cancel=Deadline(deadline))
+    except CompilationCancelled as exc:
+        return {'status': 'timeout', 'error': f"timed out during {exc}"}
+    except Exception as exc:
+        # One bad request must not fail the rest of its batch
+        return {'status': 'error', 'error': f"compiler failure: {exc!r}"}
+    return {'status': 'ok', 'issues': result.issues, 'tokens': format_tokens(result.tokens),
+            'ir': format_ir(result.ir_code), 'output': "\n".join(result.asm) + "\n",
+            'cached': result.cached, 'seconds': time.perf_counter() - start}
+
+
+def compile_batch(jobs):
+    """Worker entry point: compile_one over (src, opt_level, target, deadline) tuples"""
+    return [compile_one(*job) for job in jobs]
+
+
+class CompileServer:
+    """asyncio front end batching compile requests onto a pool of warm pipelines"""
+
+    def __init__(self, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_TIMEOUT, cache_dir=None,
+                 cache_size=DEFAULT_MAX_BYTES):
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.executor = None
+        self.pending = None
+        self.slots = None
+        self.stopping = None
+        self.in_flight = 0
+        self.started = time.monotonic()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.counters = {'requests': 0, 'compiled': 0, 'with_issues': 0, 'cache_hits': 0,
+                         'timeouts': 0, 'errors': 0, 'batches': 0, 'batched_requests': 0}
+
+    async def run(self, path=None, port=None, ready=None):
+        """
+        Serve until a shutdown request or SIGINT/SIGTERM
+
+        Args:
+            path: Unix socket path (used when port is None)
+            port: TCP port on 127.0.0.1
+            ready: Optional callable(address) once the server accepts connections
+        """
+        loop = asyncio.get_running_loop()
+        options = (self.cache_dir, self.cache_size)
+        # Warm the tables here first so forked workers inherit them
+        _init_worker(*options)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=options)
+        self.pending = asyncio.Queue(maxsize=self.max_pending)
+        self.slots = asyncio.Semaphore(self.workers)
+        self.stopping = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stopping.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        if port is None:
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.handle, path, limit=MAX_MESSAGE)
+            address = path
+        else:
+            server = await asyncio.start_server(self.handle, '127.0.0.1', port, limit=MAX_MESSAGE)
+            address = f"127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        dispatcher = asyncio.create_task(self.dispatch())
+        if ready is not None:
+            ready(address)
+        try:
+            async with server:
+                await self.stopping.wait()
+        finally:
+            dispatcher.cancel()
+            self.executor.shutdown(cancel_futures=True)
+            if port is None and os.path.exists(path):
+                os.remove(path)
+
+    async def handle(self, reader, writer):
+        """Read one connection's requests, answering each as it completes"""
+        lock = asyncio.Lock()
+        answers = set()
+        try:
+            while not self.stopping.is_set():
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # Line over MAX_MESSAGE, or the client went away
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request is not an object")
+                except ValueError as exc:
+                    await self.reply(writer, lock, {'id': None, 'status': 'error',
+                                                    'error': f"bad request: {exc}"})
+                    continue
+                op = request.get('op')
+                if op == 'compile':
+                    future = await self.submit(request)
+                    answer = asyncio.create_task(self.answer(writer, lock, request, future))
+                    answers.add(answer)
+                    answer.add_done_callback(answers.discard)
+                elif op == 'stats':
+                    await self.reply(writer, lock, {'id': request.get('id'), 'status': 'ok',
+                                                    'stats': self.snapshot()})
+                elif op == 'shutdown':
+                    await self.reply(writer, lock, {'id': request.get('id'), 'status': 'ok'})
+                    self.stopping.set()
+                else:
+                    await self.reply(writer, lock, {'id': request.get('id'), 'status': 'error',
+                                                    'error': f"unknown op {op!r}"})
+            if answers:
+                await asyncio.wait(answers)
+        finally:
+            writer.close()
+
+    async def submit(self, request):
+        """
+        Validate a compile request and queue it, waiting while the queue is full
+
+        Returns:
+            asyncio.Future: Resolves to the response fields besides "id"
+        """
+        self.counters['requests'] += 1
+        future = asyncio.get_running_loop().create_future()
+        src = request.get('source')
+        opt_level = request.get('opt_level', 0)
+        target = request.get('target', 'asm')
+        timeout = request.get('timeout') or self.timeout
+        if not isinstance(src, str):
+            future.set_result({'status': 'error', 'error': "source must be a string"})
+        elif target not in TARGETS:
+            future.set_result({'status': 'error', 'error': f"unknown target {target!r}"})
+        elif opt_level not in (0, 1, 2):
+            future.set_result({'status': 'error', 'error': f"bad opt_level {opt_level!r}"})
+        else:
+            job = (src, opt_level, target, time.time() + timeout)
+            await self.pending.put((job, future, time.monotonic()))
+        return future
+
+    async def answer(self, writer, lock, request, future):
+        """Wait for one compile, no longer than its timeout, and send the response"""
+        timeout = request.get('timeout') or self.timeout
+        try:
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            response = {'status': 'timeout', 'error': f"timed out after {timeout}s"}
+        status = response['status']
+        if status == 'ok':
+            self.counters['compiled'] += 1
+            self.counters['with_issues'] += bool(response['issues'])
+            self.counters['cache_hits'] += response['cached']
+        else:
+            self.counters['timeouts' if status == 'timeout' else 'errors'] += 1
+        await self.reply(writer, lock, dict(response, id=request.get('id')))
+
+    async def reply(self, writer, lock, response):
+        """Write one response line, tolerating a client that has gone away"""
+        async with lock:
+            try:
+                writer.write(json.dumps(response, separators=(',', ':')).encode('utf-8') + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self):
+        """Hand queued requests to free workers, as many per batch as are waiting"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            batch = [await self.pending.get()]
+            while len(batch) < self.batch_size and not self.pending.empty():
+                batch.append(self.pending.get_nowait())
+            self.in_flight += 1
+            self.counters['batches'] += 1
+            self.counters['batched_requests'] += len(batch)
+            work = loop.run_in_executor(self.executor, compile_batch, [job for job, _, _ in batch])
+            work.add_done_callback(functools.partial(self.finish, batch))
+
+    def finish(self, batch, work):
+        """Resolve a batch's futures from the worker's results"""
+        self.slots.release()
+        self.in_flight -= 1
+        now = time.monotonic()
+        try:
+            results = work.result()
+        except Exception as exc:
+            results = [{'status': 'error', 'error': f"worker failure: {exc!r}"}] * len(batch)
+        for (_, future, queued), result in zip(batch, results):
+            self.latencies.append(now - queued)
+            # Already answered when the front end timed it out
+            if not future.done():
+                future.set_result(result)
+
+    def snapshot(self):
+        """
+        Current counters and load
+
+        Returns:
+            dict: Request counters, batching, queue depth and latency percentiles
+        """
+        stats = dict(self.counters)
+        batches = stats['batches']
+        stats['mean_batch'] = stats['batched_requests'] / batches if batches else 0.0
+        stats['queued'] = self.pending.qsize() if self.pending is not None else 0
+        stats['busy_workers'] = self.in_flight
+        stats['workers'] = self.workers
+        stats['uptime_seconds'] = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+        if latencies:
+            stats['latency_ms'] = {
+                'p50': latencies[len(latencies) // 2] * 1000,
+                'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+                'max': latencies[-1] * 1000}
+        return stats
+
+
+def serve(path=DEFAULT_SOCKET, port=None, ready=None, **options):
+    """
+    Run a CompileServer until it is shut down
+
+    Args:
+        path: Unix socket path
+        port: TCP port on 127.0.0.1, used instead of path when given
+        ready: Optional callable(address) once connections are accepted
+        options: CompileServer arguments
+    """
+    asyncio.run(CompileServer(**options).run(path, port, ready))
+
+
+class CompileClient:
+    """Blocking client for a CompileServer"""
+
+    def __init__(self, path=DEFAULT_SOCKET, port=None):
+        if port is None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection(('127.0.0.1', port))
+        self.responses = self.sock.makefile('rb')
+        self.next_id = 0
+
+    def close(self):
+        self.responses.close()
+        self.sock.close()
+
+    def send(self, request):
+        """Send one request and return its id"""
+        self.next_id += 1
+        request = dict(request, id=self.next_id)
+        self.sock.sendall(json.dumps(request, separators=(',', ':')).encode('utf-8') + b"\n")
+        return self.next_id
+
+    def receive(self):
+        """Next response, in completion order"""
+        line = self.responses.readline()
+        if not line:
+            raise ConnectionError("compile server closed the connection")
+        return json.loads(line)
+
+    def call(self, op, **fields):
+        """Send one request and wait for its response"""
+        self.send(dict(fields, op=op))
+        return self.receive()
+
+    def compile_many(self, sources, window=32, **options):
+        """
+        Compile several sources, keeping up to window requests in flight
+
+        Bounding the requests in flight keeps the client reading responses
+        while the server applies backpressure to its writes.
+
+        Args:
+            sources: Iterable of source strings
+            window: Requests sent ahead of their responses
+            options: opt_level, target and timeout of every request
+
+        Yields:
+            tuple: (index into sources, response), in completion order
+        """
+        ids = {}
+        for index, src in enumerate(sources):
+            if len(ids) >= window:
+                response = self.receive()
+                yield ids.pop(response['id']), response
+            ids[self.send(dict(options, op='compile', source=src))] = index
+        while ids:
+            response = self.receive()
+            yield ids.pop(response['id']), response
+
+
+def run_client(paths, out_dir, suffix='.mc', opt_level=0, target='asm', path=DEFAULT_SOCKET,
+               port=None, timeout=None, stream=sys.stdout):
+    """
+    Compile sources on a running server, writing the listings run_batch would
+
+    Args:
+        paths: Files or directories to compile
+        out_dir: Directory that mirrors the source tree with listings
+        suffix: Source file extension searched for in directories
+        opt_level: IR optimization level (0, 1 or 2)
+        target: Code generation target, a key of pipeline.TARGETS
+        path: Server's Unix socket
+        port: Server's TCP port, used instead of path when given
+        timeout: Seconds allowed per file, or None for the server's default
+        stream: Where the report is written
+
+    Returns:
+        int: Number of files that reported issues or failed
+    """
+    work = []
+    for root, src_path in collect_sources(paths, suffix):
+        rel = os.path.relpath(src_path, root) if root else src_path
+        work.append((src_path, os.path.join(out_dir, os.path.splitext(rel)[0])))
+
+    def sources():
+        for src_path, _ in work:
+            with open(src_path, encoding='utf-8') as fh:
+                yield fh.read()
+
+    start = time.perf_counter()
+    failed = 0
+    hits = 0
+    client = CompileClient(path, port)
+    try:
+        for index, response in client.compile_many(sources(), opt_level=opt_level, target=target,
+                                                   timeout=timeout):
+            src_path, out_stem = work[index]
+            if response['status'] != 'ok':
+                failed += 1
+                stream.write(f"{src_path}: {response['status']}: {response['error']}\n")
+                continue
+            write_listings(out_stem, target, response['tokens'], response['ir'],
+                           response['output'])
+            hits += response['cached']
+            if response['issues']:
+                failed += 1
+                for msg in response['issues']:
+                    stream.write(f"{src_path}: {msg}\n")
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - start
+
+    rate = len(work) / elapsed if elapsed > 0 else float('inf')
+    stream.write(f"Compiled {len(work)} file(s) on the server in {elapsed:.2f}s "
+                 f"({rate:.1f} files/s); {failed} with issues; {hits} cache hits\n")
+    return failed
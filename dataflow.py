@@ -0,0 +1,346 @@
+"""Worklist dataflow analysis over a ControlFlowGraph.
+
+Facts are numbered and sets of facts are Python ints used as bitsets, so
+meet and transfer are a handful of machine-word operations per block
+however many facts there are. A problem supplies per-block gen/kill masks,
+a direction and a meet (union for may-problems, intersection for
+must-problems); the shared solver iterates to the fixed point
+
+    out[b] = gen[b] | (in[b] & ~kill[b])
+
+with in/out swapped for backward problems. Facts that never cross a block
+boundary (temporaries defined and consumed inside one block) are left out
+of the universe, which keeps the bitsets narrow on large programs.
+"""
+import heapq
+
+from cfg import gc_paused
+from ir import ASSIGN, BINARY, DEFINES, SINGLE_OPERAND, expression_key, read_names
+
+
+def upward_exposed(cfg):
+    """
+    Per-block names read before any write in the block, and names written
+
+    Computed once per CFG and shared by the problems that need it.
+
+    Args:
+        cfg: ControlFlowGraph
+
+    Returns:
+        tuple: (uses, defs), lists of sets indexed by block
+    """
+    cached = getattr(cfg, '_upward_exposed', None)
+    if cached is not None:
+        return cached
+    with gc_paused():
+        cfg._upward_exposed = _upward_exposed(cfg)
+    return cfg._upward_exposed
+
+
+def _upward_exposed(cfg):
+    code = cfg.ir_code
+    uses = []
+    defs = []
+    for block in cfg.blocks:
+        used = set()
+        defined = set()
+        for instr in code[block.start:block.end]:
+            op = instr.op
+            if op in BINARY:
+                a = instr.src1
+                if type(a) is str and a not in defined:
+                    used.add(a)
+                b = instr.src2
+                if type(b) is str and b not in defined:
+                    used.add(b)
+                defined.add(instr.dst)
+            elif op in SINGLE_OPERAND:
+                a = instr.src1
+                if type(a) is str and a not in defined:
+                    used.add(a)
+                if op is ASSIGN:
+                    defined.add(instr.dst)
+        uses.append(used)
+        defs.append(defined)
+    return uses, defs
+
+
+def bitmask(positions):
+    """
+    Build an int with the given bits set in time linear in its width
+
+    Args:
+        positions: Iterable of bit numbers
+
+    Returns:
+        int: The bitset
+    """
+    positions = list(positions)
+    if not positions:
+        return 0
+    raw = bytearray(max(positions) // 8 + 1)
+    for pos in positions:
+        raw[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(raw, 'little')
+
+
+class DataflowProblem:
+    """Gen/kill bitset problem over a CFG; subclasses fill universe, gen and kill"""
+
+    forward = True
+    may = True
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.universe = []
+        self.gen = []
+        self.kill = []
+        self.ins = []
+        self.outs = []
+        self.iterations = 0
+        with gc_paused():
+            self.compute_local()
+
+    def compute_local(self):
+        """Fill universe, gen and kill (one mask per block)"""
+        raise NotImplementedError
+
+    def top(self):
+        """Initial value: nothing for may-problems, everything for must-problems"""
+        return 0 if self.may else (1 << len(self.universe)) - 1
+
+    def boundary(self):
+        """Value flowing into the entry (or out of the exits, when backward)"""
+        return 0
+
+    def solve(self):
+        """
+        Iterate to the fixed point
+
+        Blocks are visited in reverse postorder (of the reversed graph when
+        backward, see ControlFlowGraph.backward_order) and only re-queued
+        when an input changes. The worklist is a heap of positions in that
+        order, so a re-queued block waits for the blocks before it rather
+        than for everything queued since: a loop body settles in a few
+        sweeps instead of once per block queued behind it.
+
+        Returns:
+            DataflowProblem: self, with ins and outs filled
+        """
+        with gc_paused():
+            self._fixed_point()
+        return self
+
+    def _fixed_point(self):
+        blocks = self.cfg.blocks
+        count = len(blocks)
+        top = self.top()
+        boundary = self.boundary()
+        gen = self.gen
+        kill = self.kill
+        may = self.may
+        # Named by the direction of flow: before is the meet side, after the
+        # transfer side
+        before = [top] * count
+        after = [top] * count
+
+        order = self.cfg.reverse_postorder() if self.forward else self.cfg.backward_order()
+        order.extend(self.cfg.unreachable())
+        if self.forward:
+            sources = [block.preds for block in blocks]
+            sinks = [block.succs for block in blocks]
+        else:
+            sources = [block.succs for block in blocks]
+            sinks = [block.preds for block in blocks]
+
+        rank = [0] * count
+        for position, b in enumerate(order):
+            rank[b] = position
+        queued = [True] * count
+        # Sorted, hence already a heap
+        worklist = list(range(count))
+        pop = heapq.heappop
+        push = heapq.heappush
+        iterations = 0
+        while worklist:
+            b = order[pop(worklist)]
+            queued[b] = False
+            iterations += 1
+            incoming = sources[b]
+            if not incoming:
+                value = boundary
+            elif may:
+                value = 0
+                for p in incoming:
+                    value |= after[p]
+            else:
+                value = top
+                for p in incoming:
+                    value &= after[p]
+            before[b] = value
+            value = gen[b] | (value & ~kill[b])
+            if value != after[b]:
+                after[b] = value
+                for s in sinks[b]:
+                    if not queued[s]:
+                        queued[s] = True
+                        push(worklist, rank[s])
+
+        self.iterations = iterations
+        if self.forward:
+            self.ins, self.outs = before, after
+        else:
+            self.ins, self.outs = after, before
+
+    def facts(self, bits):
+        """
+        Decode a bitset
+
+        Args:
+            bits: Set of facts as an int
+
+        Returns:
+            list: Universe entries whose bits are set
+        """
+        universe = self.universe
+        found = []
+        while bits:
+            low = bits & -bits
+            found.append(universe[low.bit_length() - 1])
+            bits ^= low
+        return found
+
+
+class Liveness(DataflowProblem):
+    """Names whose current value may still be read (backward, may)"""
+
+    forward = False
+
+    def compute_local(self):
+        uses, defs = upward_exposed(self.cfg)
+
+        # Only upward-exposed names can be live on entry to any block
+        bit = {}
+        for used in uses:
+            for name in used:
+                if name not in bit:
+                    bit[name] = len(self.universe)
+                    self.universe.append(name)
+        self.bit = bit
+        for used, defined in zip(uses, defs):
+            gen = 0
+            for name in used:
+                gen |= 1 << bit[name]
+            kill = 0
+            for name in defined:
+                if name in bit:
+                    kill |= 1 << bit[name]
+            self.gen.append(gen)
+            self.kill.append(kill)
+
+    def live_in(self, block):
+        """Names live on entry to a block"""
+        return self.facts(self.ins[block])
+
+    def live_out(self, block):
+        """Names live on exit from a block"""
+        return self.facts(self.outs[block])
+
+
+class ReachingDefinitions(DataflowProblem):
+    """
+    Definitions (instruction indices) that may reach each block (forward, may)
+
+    Only definitions of names some other block can read are tracked.
+    """
+
+    def compute_local(self):
+        code = self.cfg.ir_code
+        # Only names read in some block before being written there can be
+        # reached by a definition from another block
+        exposed = set()
+        for used in upward_exposed(self.cfg)[0]:
+            exposed.update(used)
+
+        last_defs = []
+        for block in self.cfg.blocks:
+            last = {}
+            for idx in range(block.start, block.end):
+                instr = code[idx]
+                if instr.op in DEFINES and instr.dst in exposed:
+                    last[instr.dst] = idx
+            last_defs.append(last)
+
+        # A definition overwritten later in its own block reaches no boundary
+        bit = {}
+        positions = {}
+        for last in last_defs:
+            for name, idx in last.items():
+                bit[idx] = len(self.universe)
+                self.universe.append(idx)
+                positions.setdefault(name, []).append(bit[idx])
+        defs_of = {name: bitmask(found) for name, found in positions.items()}
+        self.bit = bit
+        self.defs_of = defs_of
+        # kill may include gen: the transfer function adds gen back, and a
+        # block defining a single name then shares that name's mask
+        for last in last_defs:
+            gen = 0
+            kill = 0
+            for name, idx in last.items():
+                gen |= 1 << bit[idx]
+                kill = defs_of[name] if not kill else kill | defs_of[name]
+            self.gen.append(gen)
+            self.kill.append(kill)
+
+    def reaching(self, block):
+        """Instruction indices of the definitions reaching a block's entry"""
+        return self.facts(self.ins[block])
+
+
+class AvailableExpressions(DataflowProblem):
+    """Binary expressions already computed on every path (forward, must)"""
+
+    may = False
+
+    def compute_local(self):
+        code = self.cfg.ir_code
+        bit = {}
+        positions = {}
+        expr_bit = [None] * len(code)
+        for idx, instr in enumerate(code):
+            if instr.op in BINARY:
+                key = expression_key(instr)
+                found = bit.get(key)
+                if found is None:
+                    found = bit[key] = len(self.universe)
+                    self.universe.append(key)
+                    for name in read_names(instr):
+                        positions.setdefault(name, []).append(found)
+                expr_bit[idx] = found
+        users = {name: bitmask(found) for name, found in positions.items()}
+        self.bit = bit
+        self.users = users
+
+        for block in self.cfg.blocks:
+            available = 0
+            kill = 0
+            for idx in range(block.start, block.end):
+                found = expr_bit[idx]
+                if found is not None:
+                    available |= 1 << found
+                    dst = code[idx].dst
+                elif code[idx].op is ASSIGN:
+                    dst = code[idx].dst
+                else:
+                    continue
+                if dst in users:
+                    available &= ~users[dst]
+                    kill |= users[dst]
+            self.gen.append(available)
+            self.kill.append(kill)
+
+    def available(self, block):
+        """Expression keys available on entry to a block"""
+        return self.facts(self.ins[block])
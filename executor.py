@@ -0,0 +1,300 @@
+"""Execution of three-address IR.
+
+IRExecutor compiles an instruction list once into a flat array of
+pre-bound closures and then runs it with a single dispatch loop:
+
+    pc = program[pc]()
+
+Labels are resolved to instruction indices while compiling and MARK
+instructions are dropped, so a jump is just a different return value.
+Every variable, temporary and literal gets a slot in one list, which each
+closure indexes by a captured int; nothing looks up names at run time.
+Arithmetic and comparisons follow ir.evaluate, the semantics the
+optimizer folds with.
+"""
+import operator
+import os
+import sys
+import tempfile
+
+from cfg import gc_paused
+from ir import (ASSIGN, ADD, SUB, MUL, DIV, MOD, LT, LE, GT, GE, EQ, NE, MARK, JUMP, JUMP_IF_FALSE,
+                OUTPUT, BINARY, divide, modulo)
+
+# Executed instructions (MARKs excluded) before run() gives up; the
+# language has no other way to bound a loop
+MAX_STEPS = 10_000_000
+
+
+# Same results as ir.evaluate, without its per-call dispatch on op
+OPERATORS = {
+    ADD: operator.add,
+    SUB: operator.sub,
+    MUL: operator.mul,
+    DIV: divide,
+    MOD: modulo,
+    LT: lambda a, b: 1 if a < b else 0,
+    LE: lambda a, b: 1 if a <= b else 0,
+    GT: lambda a, b: 1 if a > b else 0,
+    GE: lambda a, b: 1 if a >= b else 0,
+    EQ: lambda a, b: 1 if a == b else 0,
+    NE: lambda a, b: 1 if a != b else 0,
+}
+
+
+class ExecutionError(Exception):
+    """A run stopped early; output and steps describe what happened before"""
+
+    def __init__(self, message, output=None, steps=0):
+        super().__init__(message)
+        self.output = output or []
+        self.steps = steps
+
+
+class StepLimitExceeded(ExecutionError):
+    """Raised when a run executes more than its max_steps instructions"""
+
+
+class _Halt(Exception):
+    """Raised by the closure placed after the last instruction"""
+
+
+def _halt():
+    raise _Halt
+
+
+class ExecutionResult:
+    """Output and final state of one run"""
+
+    def __init__(self, output, steps, variables):
+        self.output = output
+        self.steps = steps
+        self.variables = variables
+
+
+class IRExecutor:
+    """Compiles an IR instruction list to closures and runs it"""
+
+    def __init__(self, ir_code):
+        self.ir_code = ir_code
+        self.slots = {}
+        self.initial = []
+        self.program = []
+        self.source_index = []
+        # Closures capture these two lists; run() refills them in place
+        self._run_memory = []
+        self._run_output = []
+        with gc_paused():
+            self.compile()
+
+    def slot(self, value):
+        """
+        Slot index of a name or literal, allocated on first sight
+
+        Names start at 0, like uninitialized globals in C; literal slots hold
+        their value and are never written.
+        """
+        key = (value.__class__, value)
+        if value.__class__ is float:
+            # 0.0 and -0.0 compare and hash equal but print differently
+            key = (float, repr(value))
+        found = self.slots.get(key)
+        if found is None:
+            found = self.slots[key] = len(self.initial)
+            self.initial.append(0 if isinstance(value, str) else value)
+        return found
+
+    def compile(self):
+        """Resolve labels and build one closure per non-MARK instruction"""
+        labels = {}
+        position = 0
+        for instr in self.ir_code:
+            if instr.op is MARK:
+                labels[instr.src1] = position
+            else:
+                position += 1
+
+        self.initial = []
+        self.slots = {}
+        program = self.program = []
+        source_index = self.source_index = []
+        for idx, instr in enumerate(self.ir_code):
+            op = instr.op
+            if op is MARK:
+                continue
+            nxt = len(program) + 1
+            if op in BINARY:
+                step = self._binary(OPERATORS[op], self.slot(instr.src1), self.slot(instr.src2),
+                                    self.slot(instr.dst), nxt)
+            elif op is ASSIGN:
+                step = self._assign(self.slot(instr.src1), self.slot(instr.dst), nxt)
+            elif op is OUTPUT:
+                step = self._output(self.slot(instr.src1), nxt)
+            elif op is JUMP:
+                step = self._jump(self._target(labels, instr.src1))
+            elif op is JUMP_IF_FALSE:
+                step = self._jump_if_false(self.slot(instr.src1),
+                                           self._target(labels, instr.src2), nxt)
+            else:
+                raise ValueError(f"Cannot execute {instr!r}")
+            program.append(step)
+            source_index.append(idx)
+        program.append(_halt)
+
+    @staticmethod
+    def _target(labels, label):
+        if label not in labels:
+            raise ValueError(f"Jump to undefined label {label!r}")
+        return labels[label]
+
+    # Closure factories: everything a step touches is a cell variable
+
+    def _binary(self, fn, a, b, dst, nxt):
+        memory = self._run_memory
+
+        def step():
+            memory[dst] = fn(memory[a], memory[b])
+            return nxt
+        return step
+
+    def _assign(self, src, dst, nxt):
+        memory = self._run_memory
+
+        def step():
+            memory[dst] = memory[src]
+            return nxt
+        return step
+
+    def _output(self, src, nxt):
+        memory = self._run_memory
+        output = self._run_output
+
+        def step():
+            output.append(memory[src])
+            return nxt
+        return step
+
+    @staticmethod
+    def _jump(target):
+        def step():
+            return target
+        return step
+
+    def _jump_if_false(self, cond, target, nxt):
+        memory = self._run_memory
+
+        def step():
+            return nxt if memory[cond] else target
+        return step
+
+    def run(self, max_steps=MAX_STEPS):
+        """
+        Execute the program from its first instruction
+
+        Args:
+            max_steps: Upper bound on executed instructions
+
+        Returns:
+            ExecutionResult: Printed values, executed instructions and the
+                             final value of every name
+
+        Raises:
+            StepLimitExceeded: After max_steps instructions
+            ExecutionError: On division or modulo by zero
+        """
+        memory = self._run_memory
+        output = self._run_output
+        memory[:] = self.initial
+        output.clear()
+        program = self.program
+        pc = 0
+        steps = 0
+        try:
+            for steps in range(max_steps):
+                pc = program[pc]()
+            steps = max_steps
+            if program[pc] is _halt:
+                raise _Halt
+        except _Halt:
+            return ExecutionResult(list(output), steps, self.variables())
+        except ZeroDivisionError:
+            instr = self.ir_code[self.source_index[pc]]
+            raise ExecutionError(f"Division by zero in {instr!r}", list(output), steps) from None
+        raise StepLimitExceeded(f"Step limit of {max_steps} instructions reached",
+                                list(output), max_steps)
+
+    def variables(self):
+        """Current value of every name"""
+        memory = self._run_memory
+        return {value: memory[slot] for (kind, value), slot in self.slots.items() if kind is str}
+
+
+def execute(ir_code, max_steps=MAX_STEPS):
+    """
+    Compile and run an instruction list once
+
+    Args:
+        ir_code: List of Instr
+        max_steps: Upper bound on executed instructions
+
+    Returns:
+        ExecutionResult
+    """
+    return IRExecutor(ir_code).run(max_steps)
+
+
+def run_source(path, opt_level=0, max_steps=MAX_STEPS, backend='ir', lexer='ply',
+               parser='ply', stream=sys.stdout, errors=sys.stderr):
+    """
+    Compile a source file and execute it, printing one line per print()
+
+    Args:
+        path: Source file
+        opt_level: IR optimization level (0, 1 or 2)
+        max_steps: Upper bound on executed instructions (loop iterations
+                   for the python and native backends)
+        backend: 'ir' runs IRExecutor, 'python' the PythonTranslator target,
+                 'native' an executable built from the X86Translator target
+        lexer: TokenScanner engine, 'ply' or 'regex'
+        parser: SyntaxProcessor engine, 'ply' or 'descent'
+        stream: Where program output goes
+        errors: Where compile issues and runtime errors go
+
+    Returns:
+        int: 0 on success, 1 on compile issues or a runtime error
+    """
+    # The pipeline imports the code generators, which import this module
+    from pipeline import CompilerPipeline
+    from python_generator import PythonTranslator
+    import native
+
+    with open(path, encoding='utf-8') as fh:
+        src = fh.read()
+    pipeline = CompilerPipeline(opt_level, lexer=lexer, parser=parser)
+    pipeline.initialize()
+    result = pipeline.compile(src)
+    if result.issues:
+        for msg in result.issues:
+            errors.write(f"{path}: {msg}\n")
+        return 1
+
+    try:
+        if backend == 'python':
+            outcome = PythonTranslator().build(result.ir_code).run(max_steps)
+        elif backend == 'native':
+            with tempfile.TemporaryDirectory(prefix='mc-run-') as tmp:
+                exe = os.path.join(tmp, 'program')
+                outcome = native.build_program(result.ir_code, exe, max_steps).run()
+        else:
+            outcome = execute(result.ir_code, max_steps)
+    except (ValueError, native.ToolchainError) as err:
+        errors.write(f"{path}: {err}\n")
+        return 1
+    except ExecutionError as err:
+        for value in err.output:
+            stream.write(f"{value}\n")
+        errors.write(f"{path}: {err}\n")
+        return 1
+    for value in outcome.output:
+        stream.write(f"{value}\n")
+    return 0
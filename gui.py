@@ -1,25 +1,39 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-from lexer import TokenScanner
-from parser import SyntaxProcessor
-from code_generator import AssemblyTranslator
+from compile_cache import CompileCache, format_cache_stats
+from pipeline import CompilerPipeline, CompilationCancelled
+from profiler import PhaseProfiler, format_profile
+from listing import (TOKEN_HEADER, IR_HEADER, ASM_HEADER, format_token_row, format_symbols,
+                     format_ir_instruction, format_issues)
+from virtual_view import VirtualListView
 
 
 class CompilerInterface:
     """Main GUI for the compiler application"""
     
+    POLL_MS = 50  # How often worker messages are drained on the Tk thread
+    PHASE_LABELS = {'lex': "Lexing", 'parse': "Parsing", 'codegen': "Generating code"}
+    PHASE_SPAN = {'lex': (0.0, 0.3), 'parse': (0.3, 0.9), 'codegen': (0.9, 1.0)}
+    
     def __init__(self, window):
         self.window = window
         self.window.title("Mini Compiler - By Soma Das")
         self.window.geometry("1400x850")
         self.window.configure(bg='#1e1e1e')
         
-        # Initialize compiler components
-        self.scanner = TokenScanner()
-        self.scanner.initialize()
-        self.processor = SyntaxProcessor()
-        self.processor.initialize()
-        self.translator = AssemblyTranslator()
+        # Shared by every pipeline; recompiling unchanged code is a cache hit
+        self.cache = CompileCache()
+        
+        # Compiler pipelines run on background threads; a superseded job may
+        # still be winding down, so idle pipelines are pooled and reused
+        self.idle_pipelines = [self.new_pipeline()]
+        self.pipeline_lock = threading.Lock()
+        self.results = queue.Queue()
+        self.job_id = 0
+        self.job_cancel = None
+        self.polling = False
         
         self.build_interface()
         
@@ -119,8 +133,21 @@ if (a <= b) {
         controls.grid(row=2, column=0, columnspan=2, pady=10)
         
         ttk.Button(controls, text="Compile", command=self.run_compilation).pack(side=tk.LEFT, padx=5)
+        self.cancel_btn = ttk.Button(controls, text="Cancel", command=self.cancel_compilation,
+                                     state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
         ttk.Button(controls, text="Reset", command=self.reset_all).pack(side=tk.LEFT, padx=5)
         
+        self.progress = ttk.Progressbar(controls, length=200, maximum=1.0)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.status = ttk.Label(controls, text="Ready", width=30)
+        self.status.pack(side=tk.LEFT, padx=5)
+        self.cache_status = ttk.Label(controls, text=format_cache_stats(self.cache.stats))
+        self.cache_status.pack(side=tk.LEFT, padx=5)
+        self.trace_memory = tk.BooleanVar(value=False)
+        ttk.Checkbutton(controls, text="Trace allocations",
+                        variable=self.trace_memory).pack(side=tk.LEFT, padx=5)
+        
         # Output Section
         output_panel = ttk.LabelFrame(container, text="Compilation Results", padding="10")
         output_panel.grid(row=1, column=1, sticky=(tk.W, tk.E, tk.N, tk.S), padx=5)
@@ -129,113 +156,169 @@ if (a <= b) {
         self.tabs.pack(fill=tk.BOTH, expand=True)
         
         # Create output tabs
-        self.make_tab("Token Stream", "tok_view")
+        self.make_tab("Token Stream", "tok_view", virtual=True)
         self.make_tab("Symbol Table", "var_view")
-        self.make_tab("IR Code", "ir_view")
-        self.make_tab("Assembly", "asm_view")
+        self.make_tab("IR Code", "ir_view", virtual=True)
+        self.make_tab("Assembly", "asm_view", virtual=True)
         self.make_tab("Issues", "err_view")
+        self.make_tab("Profile", "profile_view")
         
-    def make_tab(self, label, attr):
+    def make_tab(self, label, attr, virtual=False):
         """
         Create a new tab in the output notebook
         
         Args:
             label: Tab label
             attr: Attribute name for the text widget
+            virtual: Use a VirtualListView that formats rows on demand
         """
         frame = ttk.Frame(self.tabs)
         self.tabs.add(frame, text=label)
         
-        view = scrolledtext.ScrolledText(frame, width=60, height=30, font=('Consolas', 9))
+        if virtual:
+            view = VirtualListView(frame, width=60, height=30, font=('Consolas', 9))
+        else:
+            view = scrolledtext.ScrolledText(frame, width=60, height=30, font=('Consolas', 9))
         view.pack(fill=tk.BOTH, expand=True)
         setattr(self, attr, view)  # FIXED: was setattr(self, view, view)
         
+    def clear_views(self):
+        """Empty every output tab"""
+        for view in [self.tok_view, self.ir_view, self.asm_view]:
+            view.clear()
+        for view in [self.var_view, self.err_view, self.profile_view]:
+            view.delete('1.0', tk.END)
+        
+    def new_pipeline(self):
+        """Create a compiler pipeline with its tables loaded"""
+        pipeline = CompilerPipeline(cache=self.cache, profiler=PhaseProfiler())
+        pipeline.initialize(fast=True)
+        return pipeline
+        
     def run_compilation(self):
-        """Execute the compilation pipeline"""
+        """Start compiling the editor contents on a background thread"""
         src = self.code_input.get('1.0', tk.END)
         
-        # Clear all output views
-        for view in ['tok_view', 'var_view', 'ir_view', 'asm_view', 'err_view']:
-            getattr(self, view).delete('1.0', tk.END)
+        # A new compile supersedes any job still in flight
+        if self.job_cancel is not None:
+            self.job_cancel.set()
+        self.job_id += 1
+        self.job_cancel = threading.Event()
         
-        # Clear symbol table before compilation
-        self.processor.registry.clear()
+        worker = threading.Thread(target=self.compile_job,
+                                  args=(self.job_id, src, self.job_cancel, self.trace_memory.get()),
+                                  daemon=True)
+        worker.start()
         
-        # Phase 1: Lexical Analysis
-        tokens, lex_errs = self.scanner.scan(src)
+        self.cancel_btn.configure(state=tk.NORMAL)
+        self.show_progress('lex', 0.0)
+        if not self.polling:
+            self.polling = True
+            self.window.after(self.POLL_MS, self.poll_results)
         
-        tok_display = "TOKEN STREAM\n" + "="*70 + "\n\n"
-        tok_display += f"{'Type':<18} {'Value':<18} {'Line':<8}\n"
-        tok_display += "-"*70 + "\n"
-        for tok in tokens:
-            tok_display += f"{tok['kind']:<18} {str(tok['val']):<18} {tok['ln']:<8}\n"
+    def compile_job(self, job_id, src, cancel, trace_memory=False):
+        """
+        Worker thread body: compile src and queue the outcome for the UI
         
-        self.tok_view.insert('1.0', tok_display)
+        Args:
+            job_id: Sequence number used to drop superseded results
+            src: Source code to compile
+            cancel: Event set when the job is cancelled or superseded
+            trace_memory: Profile allocations as well as time
+        """
+        with self.pipeline_lock:
+            pipeline = self.idle_pipelines.pop() if self.idle_pipelines else None
+        if pipeline is None:
+            pipeline = self.new_pipeline()
+        pipeline.profiler.trace_memory = trace_memory
         
-        # Phase 2 & 3: Syntax Analysis & Semantic Analysis
-        self.processor.process(src)
-
-        # Symbol Table Display with scope information
-        var_display = "SYMBOL TABLE\n" + "="*100 + "\n\n"
-        var_display += f"{'Identifier':<18} {'Type':<12} {'Value':<12} {'Context':<15} {'Scope':<20} {'Level':<8}\n"
-        var_display += "-"*100 + "\n"
-        for entry in self.processor.registry.all_entries():
-            val_str = str(entry['val']) if entry['val'] is not None else 'None'
-            var_display += f"{entry['id']:<18} {entry['dtype']:<12} {val_str:<12} {entry['ctx']:<15} {entry['scope']:<20} {entry['scope_level']:<8}\n"
-        
-        self.var_view.insert('1.0', var_display)
-        
-        # Intermediate Representation Display
-        ir_display = "INTERMEDIATE REPRESENTATION\n" + "="*70 + "\n\n"
-        for idx, instr in enumerate(self.processor.ir_instructions):
-            op = instr['op']
-            s1 = instr['src1']
-            s2 = instr['src2']
-            d = instr['dst']
-            
-            if op == 'assign':
-                ir_display += f"{idx+1}. {d} := {s1}\n"
-            elif op in ['+', '-', '*', '/', '%']:
-                ir_display += f"{idx+1}. {d} := {s1} {op} {s2}\n"
-            elif op in ['<', '<=', '>', '>=', '==', '!=']:
-                ir_display += f"{idx+1}. {d} := {s1} {op} {s2}\n"
-            elif op == 'mark':
-                ir_display += f"{idx+1}. {s1}:\n"
-            elif op == 'jump':
-                ir_display += f"{idx+1}. goto {s1}\n"
-            elif op == 'jump_if_false':
-                ir_display += f"{idx+1}. if_false {s1} goto {s2}\n"
-            elif op == 'output':
-                ir_display += f"{idx+1}. print {s1}\n"
+        def report(phase, fraction):
+            self.results.put((job_id, 'progress', (phase, fraction)))
+        
+        try:
+            outcome = ('done', pipeline.compile(src, cancel=cancel, progress=report))
+        except CompilationCancelled:
+            outcome = ('cancelled', None)
+        except Exception as exc:
+            outcome = ('failed', exc)
+        finally:
+            with self.pipeline_lock:
+                self.idle_pipelines.append(pipeline)
+        self.results.put((job_id,) + outcome)
+        
+    def poll_results(self):
+        """Drain worker messages on the Tk thread, rescheduling while a job runs"""
+        running = True
+        while True:
+            try:
+                job_id, kind, payload = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if job_id != self.job_id:
+                continue
+            if kind == 'progress':
+                self.show_progress(*payload)
+                continue
+            running = False
+            self.cancel_btn.configure(state=tk.DISABLED)
+            self.job_cancel = None
+            if kind == 'done':
+                self.progress['value'] = 1.0
+                self.status.configure(text="Done (cached)" if payload.cached else "Done")
+                self.cache_status.configure(text=format_cache_stats(self.cache.stats))
+                self.show_results(payload)
+            elif kind == 'cancelled':
+                self.progress['value'] = 0.0
+                self.status.configure(text="Cancelled")
             else:
-                ir_display += f"{idx+1}. {op} {s1} {s2} {d}\n"
+                self.progress['value'] = 0.0
+                self.status.configure(text="Failed")
+                messagebox.showerror("Compilation Failed", str(payload))
+        if running:
+            self.window.after(self.POLL_MS, self.poll_results)
+        else:
+            self.polling = False
         
-        self.ir_view.insert('1.0', ir_display)
+    def show_progress(self, phase, fraction):
+        """Map a phase-local fraction onto the progress bar"""
+        lo, hi = self.PHASE_SPAN[phase]
+        self.progress['value'] = lo + (hi - lo) * fraction
+        self.status.configure(text=f"{self.PHASE_LABELS[phase]}... {fraction:.0%}")
         
-        # Phase 4: Code Generation
-        asm = self.translator.translate(self.processor.ir_instructions)
-        asm_display = "ASSEMBLY OUTPUT\n" + "="*70 + "\n\n"
-        asm_display += "\n".join(asm)
+    def cancel_compilation(self):
+        """Cancel the in-flight compile, if any"""
+        if self.job_cancel is not None:
+            self.job_cancel.set()
+            self.status.configure(text="Cancelling...")
         
-        self.asm_view.insert('1.0', asm_display)
+    def show_results(self, result):
+        """
+        Fill the output tabs from a finished compilation
+        
+        Args:
+            result: CompilationResult from the worker
+        """
+        self.clear_views()
+        
+        # Large listings are formatted lazily, a screenful at a time
+        self.tok_view.set_rows(TOKEN_HEADER, result.tokens, lambda idx, tok: format_token_row(tok))
+        self.var_view.insert('1.0', format_symbols(result.symbols))
+        self.ir_view.set_rows(IR_HEADER, result.ir_code, format_ir_instruction)
+        self.asm_view.set_rows(ASM_HEADER, result.asm, lambda idx, line: line)
         
         # Error/Issue Display
-        all_errs = lex_errs + self.processor.issues
+        all_errs = result.issues
+        self.err_view.insert('1.0', format_issues(all_errs))
+        self.profile_view.insert('1.0', "\n".join(format_profile(result.profile)) + "\n")
         if all_errs:
-            err_display = "COMPILATION ISSUES\n" + "="*70 + "\n\n"
-            for idx, err in enumerate(all_errs, 1):
-                err_display += f"{idx}. {err}\n"
-            self.err_view.insert('1.0', err_display)
             messagebox.showwarning("Issues Found", f"Detected {len(all_errs)} issue(s)")
         else:
-            self.err_view.insert('1.0', "✓ Compilation completed successfully!")
             messagebox.showinfo("Success", "Code compiled without errors!")
         
     def reset_all(self):
         """Clear all input and output fields"""
+        self.cancel_compilation()
         self.code_input.delete('1.0', tk.END)
-        for view in ['tok_view', 'var_view', 'ir_view', 'asm_view', 'err_view']:
-            getattr(self, view).delete('1.0', tk.END)
-        
-        # Clear symbol table
-        self.processor.registry.clear()
+        self.clear_views()
+        self.progress['value'] = 0.0
+        self.status.configure(text="Ready")
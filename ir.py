@@ -0,0 +1,232 @@
+"""Three-address intermediate representation.
+
+Instructions are compact __slots__ objects carrying an interned Op code
+rather than 4-key dicts keyed by strings. Consumers dispatch on Op members
+(small ints); code that still indexes instructions like the old dicts, e.g.
+instr['op'] == '+', keeps working through Instr.__getitem__.
+"""
+import math
+from enum import IntEnum
+
+
+class Op(IntEnum):
+    """Three-address opcodes"""
+
+    ASSIGN = 0
+    ADD = 1
+    SUB = 2
+    MUL = 3
+    DIV = 4
+    MOD = 5
+    LT = 6
+    LE = 7
+    GT = 8
+    GE = 9
+    EQ = 10
+    NE = 11
+    MARK = 12
+    JUMP = 13
+    JUMP_IF_FALSE = 14
+    OUTPUT = 15
+
+    @property
+    def symbol(self):
+        """Spelling used by the original dict-based IR and the listings"""
+        return SYMBOLS[self]
+
+
+SYMBOLS = {
+    Op.ASSIGN: 'assign',
+    Op.ADD: '+', Op.SUB: '-', Op.MUL: '*', Op.DIV: '/', Op.MOD: '%',
+    Op.LT: '<', Op.LE: '<=', Op.GT: '>', Op.GE: '>=', Op.EQ: '==', Op.NE: '!=',
+    Op.MARK: 'mark',
+    Op.JUMP: 'jump',
+    Op.JUMP_IF_FALSE: 'jump_if_false',
+    Op.OUTPUT: 'output',
+}
+
+# Source operator or legacy op string -> Op
+OPCODES = {symbol: op for op, symbol in SYMBOLS.items()}
+
+ARITHMETIC = frozenset({Op.ADD, Op.SUB, Op.MUL, Op.DIV, Op.MOD})
+COMPARISON = frozenset({Op.LT, Op.LE, Op.GT, Op.GE, Op.EQ, Op.NE})
+BINARY = ARITHMETIC | COMPARISON
+COMMUTATIVE = frozenset({Op.ADD, Op.MUL, Op.EQ, Op.NE})
+
+# Comparison -> the one true exactly when it is false. Exact for ints; a
+# NaN operand makes every ordering false, so only == and != negate floats
+NEGATED = {Op.LT: Op.GE, Op.LE: Op.GT, Op.GT: Op.LE, Op.GE: Op.LT, Op.EQ: Op.NE, Op.NE: Op.EQ}
+
+
+class Instr:
+    """A single three-address instruction"""
+
+    __slots__ = ('op', 'src1', 'src2', 'dst')
+
+    def __init__(self, op, src1=None, src2=None, dst=None):
+        self.op = op
+        self.src1 = src1
+        self.src2 = src2
+        self.dst = dst
+
+    def __getitem__(self, key):
+        """Read-only view with the keys of the original dict instructions"""
+        if key == 'op':
+            return SYMBOLS[self.op]
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def as_dict(self):
+        """Convert to the original {'op', 'src1', 'src2', 'dst'} dict form"""
+        return {'op': SYMBOLS[self.op], 'src1': self.src1, 'src2': self.src2, 'dst': self.dst}
+
+    def __eq__(self, other):
+        if not isinstance(other, Instr):
+            return NotImplemented
+        return (self.op == other.op and self.src1 == other.src1
+                and self.src2 == other.src2 and self.dst == other.dst)
+
+    def __repr__(self):
+        return f"Instr({self.op.name}, {self.src1!r}, {self.src2!r}, {self.dst!r})"
+
+
+# Enum attribute access (Op.X) goes through EnumType.__getattr__, so code
+# that runs per instruction, here and in the passes and backends, uses these
+# module-level aliases and tests membership in the sets below
+ASSIGN = Op.ASSIGN
+ADD = Op.ADD
+SUB = Op.SUB
+MUL = Op.MUL
+DIV = Op.DIV
+MOD = Op.MOD
+LT = Op.LT
+LE = Op.LE
+GT = Op.GT
+GE = Op.GE
+EQ = Op.EQ
+NE = Op.NE
+MARK = Op.MARK
+JUMP = Op.JUMP
+JUMP_IF_FALSE = Op.JUMP_IF_FALSE
+OUTPUT = Op.OUTPUT
+
+SINGLE_OPERAND = frozenset({ASSIGN, OUTPUT, JUMP_IF_FALSE})
+DEFINES = BINARY | {ASSIGN}
+
+
+def reads(instr):
+    """
+    Operand values an instruction reads (names and literals)
+
+    Labels carried by MARK/JUMP/JUMP_IF_FALSE are not operands.
+    """
+    op = instr.op
+    if op in BINARY:
+        return (instr.src1, instr.src2)
+    if op in SINGLE_OPERAND:
+        return (instr.src1,)
+    return ()
+
+
+def read_names(instr):
+    """Variable and temporary names an instruction reads"""
+    op = instr.op
+    if op in BINARY:
+        a = instr.src1
+        b = instr.src2
+        if type(a) is str:
+            return (a, b) if type(b) is str else (a,)
+        return (b,) if type(b) is str else ()
+    if op in SINGLE_OPERAND and type(instr.src1) is str:
+        return (instr.src1,)
+    return ()
+
+
+def writes(instr):
+    """Name an instruction assigns, or None"""
+    return instr.dst if instr.op in DEFINES else None
+
+
+def operand_key(value):
+    """
+    Hashable key of an operand, equal only for interchangeable operands
+
+    1 and 1.0 compare equal in Python but produce different results, and so
+    do 0.0 and -0.0, which also print differently: the type is part of the
+    key and floats are keyed by their repr.
+    """
+    if type(value) is float:
+        return (float, repr(value))
+    return (type(value), value)
+
+
+def expression_key(instr):
+    """
+    Hashable key of a binary instruction's right-hand side
+
+    Operands of commutative operators are ordered, so a + b and b + a share a
+    key. Operands are keyed by operand_key.
+    """
+    a, b = operand_key(instr.src1), operand_key(instr.src2)
+    if instr.op in COMMUTATIVE and (a[0].__name__, a[1]) > (b[0].__name__, b[1]):
+        a, b = b, a
+    return (instr.op, a, b)
+
+
+def _c_div(a, b):
+    """Integer division truncating toward zero, as in C"""
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def divide(a, b):
+    """'/' of the language: truncating for two ints, true division otherwise"""
+    if isinstance(a, int) and isinstance(b, int):
+        return _c_div(a, b)
+    return a / b
+
+
+def modulo(a, b):
+    """'%' of the language: the sign follows the dividend, as in C"""
+    if isinstance(a, int) and isinstance(b, int):
+        return a - b * _c_div(a, b)
+    if b == 0:
+        # math.fmod raises ValueError here, not ZeroDivisionError like '/'
+        raise ZeroDivisionError("float modulo")
+    return math.fmod(a, b)
+
+
+def evaluate(op, a, b):
+    """
+    Compute a binary operation with the language's runtime semantics
+
+    Integer '/' and '%' truncate toward zero like C; comparisons yield 1 or 0.
+    Every backend and the optimizer fold through this, so they agree.
+
+    Raises:
+        ZeroDivisionError: For '/' or '%' by zero
+    """
+    if op is ADD:
+        return a + b
+    if op is SUB:
+        return a - b
+    if op is MUL:
+        return a * b
+    if op is DIV:
+        return divide(a, b)
+    if op is MOD:
+        return modulo(a, b)
+    if op is LT:
+        return int(a < b)
+    if op is LE:
+        return int(a <= b)
+    if op is GT:
+        return int(a > b)
+    if op is GE:
+        return int(a >= b)
+    if op is EQ:
+        return int(a == b)
+    if op is NE:
+        return int(a != b)
+    raise ValueError(f"{op!r} is not a binary operation")
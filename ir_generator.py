@@ -0,0 +1,187 @@
+"""Lowering of the syntax tree to three-address IR.
+
+IRGenerator walks the trees SyntaxProcessor builds and emits instructions
+in execution order: a branch's test before its arms, a loop's test at its
+head and the jump back after its body:
+
+    while (c) { body }              if (c) { then } else { other }
+
+    Label1:                             t = c
+        t = c                           jump_if_false t, Label1
+        jump_if_false t, Label2         then
+        body                            jump Label2
+        jump Label1                 Label1:
+    Label2:                             other
+                                    Label2:
+
+Statements and expressions are walked with explicit stacks rather than
+recursion, so nesting is limited no more than in the descent parser.
+Temporaries are numbered in evaluation order, left operand first, and
+spelled t.1, t.2, ..., which no identifier can be. A declaration keeps its
+source name unless that name is already declared elsewhere in the program;
+then it is qualified with its block, numbered in source order (x.block3),
+so a shadowing local never overwrites the variable it hides.
+"""
+from ir import ASSIGN, MARK, JUMP, JUMP_IF_FALSE, OUTPUT, OPCODES, Instr
+
+# Pending entry closing the innermost block scope
+LEAVE = object()
+
+
+class IRGenerator:
+    """Lowers syntax trees to three-address IR"""
+
+    def __init__(self):
+        self.ir_instructions = []
+        self.tmp_counter = 0
+        self.lbl_counter = 0
+        self.blk_counter = 0
+        # Source name -> IR names of its visible declarations, innermost last
+        self.visible = {}
+        # Source names declared so far anywhere in the program
+        self.taken = set()
+
+    def gen_temp(self):
+        """Generate a temporary variable name"""
+        self.tmp_counter += 1
+        return f"t.{self.tmp_counter}"
+
+    def gen_label(self):
+        """Generate a label for control flow"""
+        self.lbl_counter += 1
+        return f"Label{self.lbl_counter}"
+
+    def add_instruction(self, operation, operand1=None, operand2=None, dest=None):
+        """
+        Add an instruction to the intermediate representation
+
+        Args:
+            operation: Opcode (ir.Op)
+            operand1: First operand
+            operand2: Second operand
+            dest: Destination variable
+
+        Returns:
+            dest: The destination variable
+        """
+        self.ir_instructions.append(Instr(operation, operand1, operand2, dest))
+        return dest
+
+    def generate(self, programs):
+        """
+        Lower whole programs
+
+        Args:
+            programs: ('program', statements) trees in source order, as
+                      collected in SyntaxProcessor.ast
+
+        Returns:
+            list: The instructions, also kept in self.ir_instructions
+        """
+        self.ir_instructions = []
+        self.tmp_counter = 0
+        self.lbl_counter = 0
+        self.blk_counter = 0
+        self.visible = {}
+        self.taken = set()
+        # (block number, source names it declares) of the open blocks
+        scopes = [(0, [])]
+        # Statements not lowered yet and instructions due between them,
+        # next one last
+        pending = [stmt for program in reversed(programs) for stmt in reversed(program[1])]
+        emit = self.add_instruction
+        while pending:
+            node = pending.pop()
+            if type(node) is Instr:
+                self.ir_instructions.append(node)
+                continue
+            if node is None:
+                # A redeclaration: reported by the parser, which drops it
+                continue
+            if node is LEAVE:
+                for name in scopes.pop()[1]:
+                    self.visible[name].pop()
+                continue
+            kind = node[0]
+            if kind == 'assign':
+                emit(ASSIGN, self.value(node[2]), None, self.resolve(node[1]))
+            elif kind == 'decl_init':
+                # The initializer still sees what the new name hides
+                value = self.value(node[3])
+                emit(ASSIGN, value, None, self.declare(node[2], scopes[-1]))
+            elif kind == 'decl':
+                self.declare(node[2], scopes[-1])
+            elif kind == 'output':
+                emit(OUTPUT, self.value(node[1]))
+            elif kind == 'block':
+                self.blk_counter += 1
+                scopes.append((self.blk_counter, []))
+                pending.append(LEAVE)
+                pending.extend(reversed(node[1]))
+            elif kind == 'if':
+                skip = self.gen_label()
+                emit(JUMP_IF_FALSE, self.value(node[1]), skip)
+                if len(node) == 3:
+                    pending += [Instr(MARK, skip), node[2]]
+                else:
+                    end = self.gen_label()
+                    pending += [Instr(MARK, end), node[3], Instr(MARK, skip), Instr(JUMP, end),
+                                node[2]]
+            elif kind == 'loop':
+                start = self.gen_label()
+                end = self.gen_label()
+                emit(MARK, start)
+                emit(JUMP_IF_FALSE, self.value(node[1]), end)
+                pending += [Instr(MARK, end), Instr(JUMP, start), node[2]]
+        return self.ir_instructions
+
+    def declare(self, name, scope):
+        """
+        Make a declaration visible until its block ends
+
+        Args:
+            name: Declared source name
+            scope: (block number, declared names) of the innermost open block
+
+        Returns:
+            str: The name the IR uses for it
+        """
+        number, declared = scope
+        ir_name = f"{name}.block{number}" if name in self.taken else name
+        self.taken.add(name)
+        self.visible.setdefault(name, []).append(ir_name)
+        declared.append(name)
+        return ir_name
+
+    def resolve(self, name):
+        """IR name of the declaration a source name refers to"""
+        stack = self.visible.get(name)
+        # Undeclared names are reported by the parser and kept as they are
+        return stack[-1] if stack else name
+
+    def value(self, expr):
+        """
+        Emit the instructions computing an expression
+
+        Args:
+            expr: Number, variable name or ('binop', operator, left, right)
+
+        Returns:
+            Operand holding the value: the number or name itself, or a temp
+        """
+        if type(expr) is not tuple:
+            return self.resolve(expr) if type(expr) is str else expr
+        operands = []
+        # (node, operands already computed) still to visit, next one last
+        pending = [(expr, False)]
+        while pending:
+            node, ready = pending.pop()
+            if type(node) is not tuple:
+                operands.append(self.resolve(node) if type(node) is str else node)
+            elif ready:
+                right = operands.pop()
+                operands[-1] = self.add_instruction(OPCODES[node[1]], operands[-1], right,
+                                                    self.gen_temp())
+            else:
+                pending += [(node, True), (node[3], False), (node[2], False)]
+        return operands[0]
@@ -0,0 +1,606 @@
+"""Language Server Protocol support for the mini language, over stdio.
+
+Speaks JSON-RPC 2.0 with Content-Length framing on stdin/stdout:
+
+    python main.py lsp
+
+Each open document keeps a warm TokenScanner and SyntaxProcessor. An edit
+relexes only from the token before the changed range until the new tokens
+line up with the old ones again; the token records after that are kept and
+only the position lists alongside them are shifted.
+Parsing and name resolution wait until no edit has arrived for the debounce
+interval (or a request needs them), and are skipped entirely when the edit
+left every token's kind and value unchanged, e.g. inside a comment or
+whitespace.
+
+Offered features:
+
+    diagnostics      lexical, syntax and semantic issues, pushed after analysis
+    hover            type and declaring scope of a variable (VariableRegistry)
+    definition       the declaration a variable reference resolves to
+    semantic tokens  keywords, types, variables (marking declarations),
+                     numbers and operators
+"""
+import bisect
+import json
+import queue
+import re
+import sys
+import threading
+import time
+
+from lexer import TokenScanner
+from parser import SyntaxProcessor
+from symbol_table import VariableRegistry
+
+DEBOUNCE_SECONDS = 0.2
+
+# Protocol constants
+SYNC_INCREMENTAL = 2
+SEVERITY_ERROR = 1
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+TOKEN_TYPES = ('keyword', 'type', 'variable', 'number', 'operator')
+TOKEN_MODIFIERS = ('declaration',)
+DECLARATION_BIT = 1
+
+OPERATORS = ('PLUS', 'MINUS', 'MULTIPLY', 'DIVIDE', 'MOD', 'EQUALS', 'EQUAL_TO', 'NOT_EQUAL',
+             'LESS', 'LESS_EQ', 'GREATER', 'GREATER_EQ')
+
+# Token type -> index into TOKEN_TYPES; punctuation is left to the editor
+SEMANTIC_KINDS = {kind: TOKEN_TYPES.index('keyword') for kind in TokenScanner.keywords.values()}
+SEMANTIC_KINDS.update({'INT': TOKEN_TYPES.index('type'), 'FLOAT': TOKEN_TYPES.index('type'),
+                       'IDENTIFIER': TOKEN_TYPES.index('variable'),
+                       'INTEGER': TOKEN_TYPES.index('number'),
+                       'DECIMAL': TOKEN_TYPES.index('number')})
+SEMANTIC_KINDS.update((kind, TOKEN_TYPES.index('operator')) for kind in OPERATORS)
+
+# Parser issues about names; the server reports them from its own resolution
+# pass, which knows where each name is
+SEMANTIC_ISSUES = ("Undefined variable", "Redeclaration of")
+
+# The range already says where; line numbers in messages go stale on edits
+LINE_SUFFIX = re.compile(r" \(line \d+\)$")
+
+
+class Document:
+    """Text, tokens and analysis of one open file"""
+
+    def __init__(self, uri, text, version=None):
+        self.uri = uri
+        self.version = version
+        self.scanner = TokenScanner()
+        self.scanner.initialize(fast=True)
+        self.processor = SyntaxProcessor()
+        self.processor.initialize(fast=True)
+        # Published diagnostics are out of date
+        self.dirty = True
+        # A token's kind or value changed since the last parse
+        self.syntax_dirty = True
+        # (token index or None for end of input, message)
+        self.syntax_issues = []
+        self.semantic_issues = []
+        # Token index -> VariableRegistry entry, and -> index of its declaration
+        self.symbols = {}
+        self.definitions = {}
+        self.declarations = set()
+        self.replace(text)
+
+    def replace(self, text):
+        """Take a whole new text, relexing all of it"""
+        self.text = text
+        self.line_starts = [0] + [match.end() for match in re.finditer('\n', text)]
+        # Token records, whose lexpos and lineno go stale after edits, and
+        # the current start offset, end offset and line of each
+        self.tokens = []
+        self.starts = []
+        self.ends = []
+        self.lines = []
+        for tok, end in self.scanner.resume(text, 0, 1):
+            self.tokens.append(tok)
+            self.starts.append(tok.lexpos)
+            self.ends.append(end)
+            self.lines.append(tok.lineno)
+        self.error_offsets = list(self.scanner.error_offsets)
+        self.dirty = self.syntax_dirty = True
+
+    def edit(self, start, end, inserted):
+        """
+        Replace text[start:end] and relex around it
+
+        Args:
+            start: Offset of the first replaced character
+            end: Offset just past the last replaced character
+            inserted: Replacement text
+        """
+        delta = len(inserted) - (end - start)
+        self.text = self.text[:start] + inserted + self.text[end:]
+
+        starts = self.line_starts
+        # Line starts up to start stay, those inside the replaced range go
+        keep, shifted = bisect.bisect_right(starts, start), bisect.bisect_right(starts, end)
+        added = [start + match.end() for match in re.finditer('\n', inserted)]
+        self.line_starts = starts[:keep] + added + [pos + delta for pos in starts[shifted:]]
+
+        self.relex(start, start + len(inserted), delta)
+        self.dirty = True
+
+    def relex(self, start, new_end, delta):
+        """
+        Relex the text edited between start and new_end
+
+        Lexing restarts at the last token ending before the edit, since a
+        token can take characters after it (1. + 5 lexes as 1.5), or at an
+        unterminated /* the edit may close, and stops
+        at the first new token past the edit that starts where an old token
+        did: from there on the lexer sees the same text in the same state.
+
+        Args:
+            start: Offset where the edit begins
+            new_end: Offset just past the inserted text
+            delta: Change in text length
+        """
+        tokens, starts, ends, lines = self.tokens, self.starts, self.ends, self.lines
+        first = bisect.bisect_left(ends, start)
+        if first:
+            first -= 1
+            # An unterminated /* lexes as DIVIDE MULTIPLY; it becomes a
+            # comment once the edit supplies a closing */
+            if self.text.find('*/', max(0, start - 1), new_end + 1) >= 0:
+                for index in range(first):
+                    if (tokens[index].type == 'DIVIDE' and tokens[index + 1].type == 'MULTIPLY'
+                            and starts[index + 1] == starts[index] + 1):
+                        first = index
+                        break
+            restart, lineno = starts[first], lines[first]
+        else:
+            restart, lineno = 0, 1
+
+        fresh, fresh_starts, fresh_ends, fresh_lines = [], [], [], []
+        resync = None
+        old = first
+        for tok, end in self.scanner.resume(self.text, restart, lineno):
+            if tok.lexpos >= new_end:
+                old_pos = tok.lexpos - delta
+                while old < len(tokens) and starts[old] < old_pos:
+                    old += 1
+                if old < len(tokens) and starts[old] == old_pos:
+                    resync = old
+                    line_shift = tok.lineno - lines[old]
+                    break
+            fresh.append(tok)
+            fresh_starts.append(tok.lexpos)
+            fresh_ends.append(end)
+            fresh_lines.append(tok.lineno)
+
+        errors = [pos for pos in self.error_offsets if pos < restart]
+        errors += self.scanner.error_offsets
+        if resync is None:
+            stop = len(tokens)
+            tail_starts, tail_ends, tail_lines = [], [], []
+        else:
+            stop = resync
+            errors += [pos + delta for pos in self.error_offsets if pos >= starts[resync]]
+            tail_starts = [pos + delta for pos in starts[resync:]] if delta else starts[resync:]
+            tail_ends = [pos + delta for pos in ends[resync:]] if delta else ends[resync:]
+            tail_lines = ([line + line_shift for line in lines[resync:]] if line_shift
+                          else lines[resync:])
+
+        replaced = tokens[first:stop]
+        if (len(replaced) != len(fresh)
+                or any(old_tok.type != new_tok.type or old_tok.value != new_tok.value
+                       for old_tok, new_tok in zip(replaced, fresh))):
+            self.syntax_dirty = True
+        self.tokens = tokens[:first] + fresh + tokens[stop:]
+        self.starts = starts[:first] + fresh_starts + tail_starts
+        self.ends = ends[:first] + fresh_ends + tail_ends
+        self.lines = lines[:first] + fresh_lines + tail_lines
+        self.error_offsets = errors
+
+    def parse(self):
+        """Parse the token list, noting the lookahead token of every syntax error"""
+        processor = self.processor
+        tokens = self.tokens
+        located = []
+        fed = 0
+        seen = 0
+
+        def next_token():
+            # PLY reports an error on the lookahead, the last token handed out
+            nonlocal fed, seen
+            issues = processor.issues
+            while seen < len(issues):
+                located.append((fed - 1 if fed <= len(tokens) else None, issues[seen]))
+                seen += 1
+            fed += 1
+            return tokens[fed - 1] if fed <= len(tokens) else None
+
+        processor.process(tokenfunc=next_token, lexer=self.scanner.scanner)
+        located.extend((None, issue) for issue in processor.issues[seen:])
+        self.syntax_issues = [(index, issue) for index, issue in located
+                              if not issue.startswith(SEMANTIC_ISSUES)]
+
+    def resolve(self):
+        """
+        Bind every identifier to its declaration, following the parser's
+        scoping: blocks open scopes and a declaration takes effect at its
+        semicolon, after its initializer
+        """
+        registry = VariableRegistry()
+        tokens = self.tokens
+        symbols, definitions, declarations, issues = {}, {}, set(), []
+        declared_at = {}
+        pending = None
+
+        for index, tok in enumerate(tokens):
+            kind = tok.type
+            if kind == 'IDENTIFIER':
+                if index and tokens[index - 1].type in ('INT', 'FLOAT'):
+                    pending = index
+                    continue
+                entry = registry.find(tok.value)
+                if entry is None:
+                    issues.append((index, f"Undefined variable '{tok.value}'"))
+                else:
+                    symbols[index] = entry
+                    definitions[index] = declared_at[id(entry)]
+            elif kind == 'SEMICOLON' and pending is not None:
+                name = tokens[pending].value
+                entry = registry.find_in_current_scope(name)
+                if entry is not None:
+                    issues.append((pending, f"Redeclaration of '{name}' in current scope"))
+                else:
+                    registry.add(name, tokens[pending - 1].value, None, context='declaration')
+                    entry = registry.find(name)
+                    declared_at[id(entry)] = pending
+                    declarations.add(pending)
+                symbols[pending] = entry
+                definitions[pending] = declared_at[id(entry)]
+                pending = None
+            elif kind == 'LBRACE':
+                registry.push_scope(f"block_{registry.current_scope_id + 1}")
+            elif kind == 'RBRACE':
+                registry.pop_scope()
+
+        self.symbols, self.definitions = symbols, definitions
+        self.declarations, self.semantic_issues = declarations, issues
+
+    def analyze(self):
+        """
+        Bring the analysis up to date with the text
+
+        Returns:
+            list: LSP Diagnostic objects
+        """
+        if self.syntax_dirty:
+            self.parse()
+            self.resolve()
+            self.syntax_dirty = False
+        self.dirty = False
+        return self.diagnostics()
+
+    def diagnostics(self):
+        """
+        Current issues with their ranges
+
+        Returns:
+            list: LSP Diagnostic objects, in document order
+        """
+        found = [(pos, pos + 1, f"Invalid character '{self.text[pos]}'")
+                 for pos in self.error_offsets]
+        for index, issue in self.syntax_issues + self.semantic_issues:
+            if index is None:
+                found.append((len(self.text), len(self.text), issue))
+            else:
+                found.append((self.starts[index], self.ends[index],
+                              LINE_SUFFIX.sub('', issue)))
+        found.sort(key=lambda item: item[:2])
+        return [{'range': self.range_of(start, end), 'severity': SEVERITY_ERROR,
+                 'source': 'minicompiler', 'message': message}
+                for start, end, message in found]
+
+    def token_at(self, offset):
+        """Index of the token under offset, or ending right at it, or None"""
+        index = bisect.bisect_right(self.ends, offset)
+        if index < len(self.tokens) and self.starts[index] <= offset:
+            return index
+        if index and self.ends[index - 1] == offset:
+            return index - 1
+        return None
+
+    def hover(self, offset):
+        """
+        Describe the variable at offset
+
+        Returns:
+            dict: LSP Hover, or None
+        """
+        index = self.token_at(offset)
+        entry = self.symbols.get(index)
+        if entry is None:
+            return None
+        text = (f"```\n{entry['dtype']} {entry['id']}\n```\n"
+                f"Declared in `{entry['scope']}` (scope level {entry['scope_level']}), "
+                f"line {self.lines[self.definitions[index]]}")
+        return {'contents': {'kind': 'markdown', 'value': text},
+                'range': self.range_of(self.starts[index], self.ends[index])}
+
+    def definition(self, offset):
+        """
+        Locate the declaration of the variable at offset
+
+        Returns:
+            dict: LSP Location, or None
+        """
+        index = self.definitions.get(self.token_at(offset))
+        if index is None:
+            return None
+        return {'uri': self.uri, 'range': self.range_of(self.starts[index], self.ends[index])}
+
+    def semantic_tokens(self):
+        """
+        Encode the highlighted tokens relative to each other
+
+        Returns:
+            list: Five integers per token, as SemanticTokens.data
+        """
+        data = []
+        last_line = last_char = 0
+        for index, tok in enumerate(self.tokens):
+            kind = SEMANTIC_KINDS.get(tok.type)
+            if kind is None:
+                continue
+            start = self.starts[index]
+            line = self.lines[index] - 1
+            char = self.column(self.line_starts[line], start)
+            data += (line - last_line, char - last_char if line == last_line else char,
+                     self.ends[index] - start, kind,
+                     DECLARATION_BIT if index in self.declarations else 0)
+            last_line, last_char = line, char
+        return data
+
+    def column(self, line_start, offset):
+        """UTF-16 code units between a line start and an offset on that line"""
+        segment = self.text[line_start:offset]
+        return len(segment) if segment.isascii() else len(segment.encode('utf-16-le')) // 2
+
+    def position_of(self, offset):
+        """LSP Position of a character offset"""
+        line = bisect.bisect_right(self.line_starts, offset) - 1
+        return {'line': line, 'character': self.column(self.line_starts[line], offset)}
+
+    def range_of(self, start, end):
+        """LSP Range between two character offsets"""
+        return {'start': self.position_of(start), 'end': self.position_of(end)}
+
+    def offset_of(self, position):
+        """
+        Character offset of an LSP Position, clamped to the text
+
+        Args:
+            position: {'line', 'character'}, the character in UTF-16 code units
+        """
+        line = position['line']
+        if line >= len(self.line_starts):
+            return len(self.text)
+        start = self.line_starts[line]
+        stop = self.line_starts[line + 1] - 1 if line + 1 < len(self.line_starts) else len(self.text)
+        segment = self.text[start:stop]
+        units = position['character']
+        if segment.isascii():
+            return start + min(units, len(segment))
+        for count, char in enumerate(segment):
+            units -= 2 if ord(char) > 0xFFFF else 1
+            if units < 0:
+                return start + count
+        return stop
+
+
+def read_message(stream):
+    """
+    Read one framed JSON-RPC message
+
+    Args:
+        stream: Binary input stream
+
+    Returns:
+        dict: The message, or None at end of input
+    """
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            if length is not None:
+                break
+            continue
+        name, _, value = line.decode('ascii').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return json.loads(body)
+
+
+def write_message(stream, message):
+    """Write one JSON-RPC message with its Content-Length header"""
+    body = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    stream.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+    stream.flush()
+
+
+class LanguageServer:
+    """JSON-RPC loop dispatching LSP messages to open Documents"""
+
+    def __init__(self, reader, writer, debounce=DEBOUNCE_SECONDS):
+        self.reader = reader
+        self.writer = writer
+        self.debounce = debounce
+        self.documents = {}
+        self.inbox = queue.Queue()
+        # When pending edits get analyzed, or None when nothing is pending
+        self.deadline = None
+        self.shutdown_requested = False
+        self.requests = {
+            'initialize': self.initialize,
+            'shutdown': self.shutdown,
+            'textDocument/hover': self.hover,
+            'textDocument/definition': self.definition,
+            'textDocument/semanticTokens/full': self.semantic_tokens,
+        }
+        self.notifications = {
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didClose': self.did_close,
+        }
+
+    def receive(self):
+        """Reader thread: queue incoming messages, then None at end of input"""
+        while True:
+            message = read_message(self.reader)
+            self.inbox.put(message)
+            # Not left blocked in a read while the interpreter exits
+            if message is None or message.get('method') == 'exit':
+                return
+
+    def serve(self):
+        """
+        Handle messages until exit or end of input
+
+        Returns:
+            int: Exit status, 0 when exit followed shutdown
+        """
+        threading.Thread(target=self.receive, daemon=True).start()
+        while True:
+            timeout = None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+            try:
+                message = self.inbox.get(timeout=timeout)
+            except queue.Empty:
+                self.publish_pending()
+                continue
+            if message is None:
+                return 0 if self.shutdown_requested else 1
+            if message.get('method') == 'exit':
+                return 0 if self.shutdown_requested else 1
+            self.dispatch(message)
+
+    def dispatch(self, message):
+        """Run the handler of a request or notification and answer requests"""
+        method = message.get('method')
+        if 'id' not in message:
+            handler = self.notifications.get(method)
+            if handler is not None:
+                try:
+                    handler(message.get('params') or {})
+                except Exception as exc:
+                    print(f"{method} failed: {exc!r}", file=sys.stderr)
+            return
+        if method is None:
+            # A response to a request of ours; none are sent
+            return
+        handler = self.requests.get(method)
+        if handler is None:
+            self.send({'jsonrpc': '2.0', 'id': message['id'],
+                       'error': {'code': METHOD_NOT_FOUND, 'message': f"Unhandled method {method}"}})
+            return
+        try:
+            result = handler(message.get('params') or {})
+        except Exception as exc:
+            self.send({'jsonrpc': '2.0', 'id': message['id'],
+                       'error': {'code': INTERNAL_ERROR, 'message': f"{method} failed: {exc!r}"}})
+            return
+        self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+    def send(self, message):
+        write_message(self.writer, message)
+
+    def publish(self, doc):
+        """Analyze a document and push its diagnostics"""
+        diagnostics = doc.analyze()
+        self.send({'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics',
+                   'params': {'uri': doc.uri, 'version': doc.version, 'diagnostics': diagnostics}})
+
+    def publish_pending(self):
+        """Analyze every document edited since its last analysis"""
+        self.deadline = None
+        for doc in list(self.documents.values()):
+            if doc.dirty:
+                self.publish(doc)
+
+    def document(self, params):
+        """Open document a request refers to, analyzed up to its last edit"""
+        doc = self.documents.get(params['textDocument']['uri'])
+        if doc is not None and doc.dirty:
+            self.publish(doc)
+        return doc
+
+    # Requests
+    def initialize(self, params):
+        return {
+            'capabilities': {
+                'textDocumentSync': {'openClose': True, 'change': SYNC_INCREMENTAL},
+                'hoverProvider': True,
+                'definitionProvider': True,
+                'semanticTokensProvider': {
+                    'legend': {'tokenTypes': list(TOKEN_TYPES),
+                               'tokenModifiers': list(TOKEN_MODIFIERS)},
+                    'full': True,
+                },
+            },
+            'serverInfo': {'name': 'minicompiler'},
+        }
+
+    def shutdown(self, params):
+        self.shutdown_requested = True
+        return None
+
+    def hover(self, params):
+        doc = self.document(params)
+        if doc is None:
+            return None
+        return doc.hover(doc.offset_of(params['position']))
+
+    def definition(self, params):
+        doc = self.document(params)
+        if doc is None:
+            return None
+        return doc.definition(doc.offset_of(params['position']))
+
+    def semantic_tokens(self, params):
+        doc = self.document(params)
+        return {'data': doc.semantic_tokens() if doc is not None else []}
+
+    # Notifications
+    def did_open(self, params):
+        item = params['textDocument']
+        doc = self.documents[item['uri']] = Document(item['uri'], item['text'], item.get('version'))
+        self.publish(doc)
+
+    def did_change(self, params):
+        item = params['textDocument']
+        doc = self.documents.get(item['uri'])
+        if doc is None:
+            return
+        doc.version = item.get('version')
+        for change in params['contentChanges']:
+            if 'range' in change:
+                span = change['range']
+                doc.edit(doc.offset_of(span['start']), doc.offset_of(span['end']), change['text'])
+            else:
+                doc.replace(change['text'])
+        self.deadline = time.monotonic() + self.debounce
+
+    def did_close(self, params):
+        uri = params['textDocument']['uri']
+        if self.documents.pop(uri, None) is not None:
+            self.send({'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics',
+                       'params': {'uri': uri, 'diagnostics': []}})
+
+
+def serve_stdio(debounce=DEBOUNCE_SECONDS):
+    """Run a server on the process's stdin and stdout"""
+    return LanguageServer(sys.stdin.buffer, sys.stdout.buffer, debounce).serve()
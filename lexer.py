@@ -1,4 +1,15 @@
+import mmap
+import os
+import re
+import sys
 import ply.lex as lex
+import table_cache
+
+# Module name for the optimized table kept in the table cache
+TABLE_MODULE = 'mc_lextab'
+
+# Lexer engines TokenScanner can run: PLY's lexer, or RegexLexer
+ENGINES = ('ply', 'regex')
 
 
 class TokenScanner:
@@ -47,7 +58,8 @@ class TokenScanner:
     t_RBRACE = r'\}'
     t_SEMICOLON = r';'
     t_COMMA = r','
-    t_ignore = ' \t'
+    # Carriage returns too, so CRLF sources lex like LF ones
+    t_ignore = ' \t\r'
 
     def t_DECIMAL(self, tok):
         r'\d+\.\d+'
@@ -61,6 +73,9 @@ class TokenScanner:
 
     def t_IDENTIFIER(self, tok):
         r'[a-zA-Z_][a-zA-Z_0-9]*'
+        # Intern names so every IR operand and symbol key for an identifier
+        # shares one string object
+        tok.value = sys.intern(tok.value)
         tok.type = self.keywords.get(tok.value, 'IDENTIFIER')
         return tok
 
@@ -70,16 +85,42 @@ class TokenScanner:
 
     def t_error(self, tok):
         self.issues.append(f"Invalid character '{tok.value[0]}' at line {tok.lineno}")
+        self.error_offsets.append(tok.lexpos)
         tok.lexer.skip(1)
 
-    def __init__(self):
+    def __init__(self, engine='ply'):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown lexer engine '{engine}'")
+        self.engine = engine
         self.scanner = None
         self.token_stream = []
         self.issues = []
+        # Character offset of each invalid character, parallel to issues
+        self.error_offsets = []
 
-    def initialize(self):
-        """Initialize the lexer"""
-        self.scanner = lex.lex(module=self)
+    def initialize(self, fast=False):
+        """
+        Initialize the lexer
+
+        Args:
+            fast: Load prebuilt optimized tables from the table cache,
+                  building them only when the token rules have changed
+                  (the regex engine has no tables and ignores it)
+        """
+        if self.engine == 'regex':
+            self.scanner = RegexLexer(self)
+            return
+        if not fast:
+            self.scanner = lex.lex(module=self)
+            return
+
+        tab_dir = table_cache.table_dir('lex', table_cache.grammar_hash(self, 't_'))
+        lextab = table_cache.load_table(tab_dir, TABLE_MODULE)
+        if lextab is not None:
+            self.scanner = lex.lex(module=self, optimize=True, lextab=lextab)
+        else:
+            self.scanner = table_cache.build_table(
+                tab_dir, lambda out: lex.lex(module=self, optimize=True, lextab=TABLE_MODULE, outputdir=out))
 
     def scan(self, code):
         """
@@ -91,19 +132,278 @@ class TokenScanner:
         Returns:
             tuple: (token_stream, issues) - list of tokens and list of errors
         """
-        self.token_stream = []
+        self.token_stream = list(self.stream(code))
+        return self.token_stream, self.issues
+
+    def stream(self, code):
+        """
+        Lazily tokenize a source string
+
+        Args:
+            code: Source code string to tokenize
+
+        Yields:
+            TokenRecord: One record per token; issues collect in self.issues
+        """
         self.issues = []
-        self.scanner.input(code)
-        
+        self.error_offsets = []
+        scanner = self.scanner
+        scanner.lineno = 1
+        scanner.input(code)
+        if self.engine == 'regex':
+            yield from scanner.records()
+            return
+        next_tok = scanner.token
         while True:
-            tok = self.scanner.token()
+            tok = next_tok()
             if not tok:
+                return
+            yield TokenRecord(tok.type, tok.value, tok.lineno, tok.lexpos)
+
+    def resume(self, code, start, lineno):
+        """
+        Lazily tokenize a source string from an offset, as the language
+        server does to relex only around an edit
+
+        Args:
+            code: Whole source code string
+            start: Character offset to start at, on a token boundary
+            lineno: Line number at start
+
+        Yields:
+            tuple: (TokenRecord, end offset); issues and error_offsets
+                   collect only the invalid characters seen from start
+        """
+        self.issues = []
+        self.error_offsets = []
+        scanner = self.scanner
+        scanner.input(code)
+        scanner.lexpos = start
+        scanner.lineno = lineno
+        if self.engine == 'regex':
+            for record in scanner.records():
+                yield record, scanner.lexpos
+            return
+        next_tok = scanner.token
+        while True:
+            tok = next_tok()
+            if not tok:
+                return
+            # PLY leaves lexpos just past the token it returns
+            yield TokenRecord(tok.type, tok.value, tok.lineno, tok.lexpos), scanner.lexpos
+
+    def scan_file(self, path, chunk_size=1 << 20):
+        """
+        Lazily tokenize a source file through a memory map
+
+        The file is lexed in chunks of roughly chunk_size bytes that end on a
+        line break outside any multi-line comment, so no token or comment is
+        split and only one chunk is ever decoded into a Python string.
+        Pages already lexed are released back to the OS as scanning moves on.
+
+        Args:
+            path: Source file (UTF-8)
+            chunk_size: Target bytes lexed per chunk
+
+        Yields:
+            TokenRecord: Records with file-wide line numbers and character offsets
+        """
+        self.issues = []
+        self.error_offsets = []
+        scanner = self.scanner
+        scanner.lineno = 1
+        with open(path, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    data.madvise(mmap.MADV_SEQUENTIAL)
+                start = 0
+                base = 0
+                released = 0
+                while start < size:
+                    end = _chunk_end(data, start, size, chunk_size)
+                    text = data[start:end].decode('utf-8')
+                    scanner.input(text)
+                    if self.engine == 'regex':
+                        toks = scanner.records()
+                    else:
+                        toks = iter(scanner.token, None)
+                    for tok in toks:
+                        yield TokenRecord(tok.type, tok.value, tok.lineno, base + tok.lexpos)
+                    base += len(text)
+                    if hasattr(mmap, 'MADV_DONTNEED'):
+                        done = end - end % mmap.PAGESIZE
+                        if done > released:
+                            data.madvise(mmap.MADV_DONTNEED, released, done - released)
+                            released = done
+                    start = end
+
+    def feed(self, tokens):
+        """
+        Adapt scanned token records to PLY's tokenfunc protocol
+
+        Lets SyntaxProcessor parse the stream produced by scan, stream or
+        scan_file instead of lexing the source a second time, so parser
+        diagnostics carry the same line numbers as the Token Stream tab.
+
+        Args:
+            tokens: Token records (list or iterator)
+
+        Returns:
+            callable: Returns the next token, or None at end of input
+        """
+        records = iter(tokens)
+        return lambda: next(records, None)
+
+
+class TokenRecord:
+    """Compact token: PLY-compatible attributes plus the original dict keys"""
+
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    _KEYS = {'kind': 'type', 'val': 'value', 'ln': 'lineno', 'pos': 'lexpos'}
+
+    def __init__(self, kind, val, ln, pos):
+        self.type = kind
+        self.value = val
+        self.lineno = ln
+        self.lexpos = pos
+
+    def __getitem__(self, key):
+        """Read-only view with the keys of the original token dicts"""
+        return getattr(self, self._KEYS[key])
+
+    def __repr__(self):
+        return f"TokenRecord({self.type}, {self.value!r}, {self.lineno}, {self.lexpos})"
+
+
+class RegexLexer:
+    """
+    Lexer engine running every token rule of TokenScanner as one
+    precompiled regex
+
+    PLY's lexer calls a Python function for each identifier, number and
+    newline and builds a LexToken per token. Here a single finditer pass
+    yields TokenRecords directly: blanks are skipped as a prefix of every
+    match, keywords and operators map to their types through one dict,
+    and line numbers advance once per run of newlines. Alternatives that
+    can start at the same character keep PLY's priority (comments before
+    '/', DECIMAL before INTEGER, '==' before '='), so the token stream,
+    issues and error offsets are the same as PLY's. Trailing blanks match
+    nothing, and finditer's search past them must not report them as
+    invalid, hence ERROR excludes blanks.
+    """
+
+    master = re.compile(r"""[ \t\r]*(?:
+        (?P<IDENTIFIER>[a-zA-Z_][a-zA-Z_0-9]*)
+      | (?P<COMMENT>//.*|/\*[\s\S]*?\*/)
+      | (?P<OPERATOR>==|!=|<=|>=|[-+*/%=<>(){};,])
+      | (?P<DECIMAL>\d+\.\d+)
+      | (?P<INTEGER>\d+)
+      | (?P<NEWLINE>\n+)
+      | (?P<ERROR>[^ \t\r\n])
+    )""", re.VERBOSE)
+
+    # Keyword and operator text -> token type
+    kinds = dict(TokenScanner.keywords, **{
+        '+': 'PLUS', '-': 'MINUS', '*': 'MULTIPLY', '/': 'DIVIDE', '%': 'MOD',
+        '=': 'EQUALS', '==': 'EQUAL_TO', '!=': 'NOT_EQUAL', '<': 'LESS', '<=': 'LESS_EQ',
+        '>': 'GREATER', '>=': 'GREATER_EQ', '(': 'LPAREN', ')': 'RPAREN', '{': 'LBRACE',
+        '}': 'RBRACE', ';': 'SEMICOLON', ',': 'COMMA'})
+
+    def __init__(self, owner):
+        # TokenScanner collecting issues and error_offsets
+        self.owner = owner
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+
+    def input(self, data):
+        """Set the text to lex, from its start (as PLY's input)"""
+        self.lexdata = data
+        self.lexpos = 0
+
+    def records(self):
+        """
+        Tokenize lexdata from lexpos
+
+        Yields:
+            TokenRecord: One record per token; lexpos and lineno are kept
+                         just past the last record, as PLY keeps them
+        """
+        issues = self.owner.issues
+        error_offsets = self.owner.error_offsets
+        kinds = self.kinds
+        intern = sys.intern
+        lineno = self.lineno
+        for match in self.master.finditer(self.lexdata, self.lexpos):
+            group = match.lastgroup
+            if group == 'IDENTIFIER':
+                value = intern(match[group])
+                kind = kinds.get(value, group)
+            elif group == 'OPERATOR':
+                value = match[group]
+                kind = kinds[value]
+            elif group == 'INTEGER':
+                value = int(match[group])
+                kind = group
+            elif group == 'NEWLINE':
+                lineno += match.end() - match.start(group)
+                continue
+            elif group == 'DECIMAL':
+                value = float(match[group])
+                kind = group
+            elif group == 'COMMENT':
+                lineno += match[group].count('\n')
+                continue
+            else:
+                issues.append(f"Invalid character '{match[group]}' at line {lineno}")
+                error_offsets.append(match.start(group))
+                continue
+            self.lineno = lineno
+            self.lexpos = match.end()
+            yield TokenRecord(kind, value, lineno, match.start(group))
+        self.lineno = lineno
+        self.lexpos = len(self.lexdata)
+
+
+# Comments are the only constructs that can span lines, and no token other
+# than a comment contains '/', so this finds comment starts exactly as the
+# master regex would
+_COMMENT_SCAN = re.compile(rb'//[^\n]*|/\*.*?\*/|/\*', re.S)
+
+
+def _chunk_end(data, start, size, chunk_size):
+    """
+    Pick the end of the next chunk to lex
+
+    Args:
+        data: Memory-mapped source
+        start: Byte offset where the chunk begins
+        size: Total size of data
+        chunk_size: Target chunk length
+
+    Returns:
+        int: Byte offset just past a line break that is not inside a comment
+    """
+    end = start + chunk_size
+    while end < size:
+        newline = data.find(b'\n', end)
+        if newline == -1:
+            return size
+        end = newline + 1
+        for match in _COMMENT_SCAN.finditer(data, start, end):
+            if match.end() - match.start() == 2 and data[match.start() + 1] == ord('*'):
+                # Unterminated /* ... */: stop before it, or take it whole
+                if match.start() > start:
+                    return match.start()
+                close = data.find(b'*/', match.start() + 2)
+                if close == -1:
+                    return size
+                end = close + 2
                 break
-            self.token_stream.append({
-                'kind': tok.type,
-                'val': tok.value,
-                'ln': tok.lineno,
-                'pos': tok.lexpos
-            })
-        
-        return self.token_stream, self.issues
+        else:
+            return end
+    return size
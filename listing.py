@@ -0,0 +1,137 @@
+"""Text listings for the compiler's outputs.
+
+Shared by the GUI tabs and the headless batch compiler so both render
+tokens, symbols, IR and assembly identically.
+"""
+from ir import ASSIGN, MARK, JUMP, JUMP_IF_FALSE, OUTPUT, BINARY
+
+
+TOKEN_HEADER = ["TOKEN STREAM", "=" * 70, "", f"{'Type':<18} {'Value':<18} {'Line':<8}", "-" * 70]
+IR_HEADER = ["INTERMEDIATE REPRESENTATION", "=" * 70, ""]
+ASM_HEADER = ["ASSEMBLY OUTPUT", "=" * 70, ""]
+
+
+def format_token_row(tok):
+    """
+    Render a single token
+
+    Args:
+        tok: TokenRecord
+
+    Returns:
+        str: Token Stream listing line
+    """
+    return f"{tok.type:<18} {str(tok.value):<18} {tok.lineno:<8}"
+
+
+def format_tokens(tokens):
+    """
+    Render a token stream as a table
+
+    Args:
+        tokens: TokenRecords from TokenScanner.scan
+
+    Returns:
+        str: Token Stream listing
+    """
+    lines = list(TOKEN_HEADER)
+    lines.extend(map(format_token_row, tokens))
+    return "\n".join(lines) + "\n"
+
+
+def format_symbols(entries):
+    """
+    Render symbol table entries with scope information
+
+    Args:
+        entries: Entries from VariableRegistry.all_entries
+
+    Returns:
+        str: Symbol Table listing
+    """
+    lines = [
+        "SYMBOL TABLE", "=" * 100, "",
+        f"{'Identifier':<18} {'Type':<12} {'Value':<12} {'Context':<15} {'Scope':<20} {'Level':<8}",
+        "-" * 100,
+    ]
+    for entry in entries:
+        val_str = str(entry['val']) if entry['val'] is not None else 'None'
+        lines.append(f"{entry['id']:<18} {entry['dtype']:<12} {val_str:<12} {entry['ctx']:<15} "
+                     f"{entry['scope']:<20} {entry['scope_level']:<8}")
+    return "\n".join(lines) + "\n"
+
+
+def format_ir_instruction(idx, instr):
+    """
+    Render a single three-address instruction
+
+    Args:
+        idx: Zero-based instruction index
+        instr: IR instruction
+
+    Returns:
+        str: Numbered listing line
+    """
+    op = instr.op
+    s1 = instr.src1
+    s2 = instr.src2
+    d = instr.dst
+
+    if op is ASSIGN:
+        return f"{idx+1}. {d} := {s1}"
+    elif op in BINARY:
+        return f"{idx+1}. {d} := {s1} {op.symbol} {s2}"
+    elif op is MARK:
+        return f"{idx+1}. {s1}:"
+    elif op is JUMP:
+        return f"{idx+1}. goto {s1}"
+    elif op is JUMP_IF_FALSE:
+        return f"{idx+1}. if_false {s1} goto {s2}"
+    elif op is OUTPUT:
+        return f"{idx+1}. print {s1}"
+    return f"{idx+1}. {op.symbol} {s1} {s2} {d}"
+
+
+def format_ir(ir_code):
+    """
+    Render the intermediate representation
+
+    Args:
+        ir_code: List of IR instructions
+
+    Returns:
+        str: IR Code listing
+    """
+    lines = list(IR_HEADER)
+    lines.extend(format_ir_instruction(idx, instr) for idx, instr in enumerate(ir_code))
+    return "\n".join(lines) + "\n"
+
+
+def format_asm(asm):
+    """
+    Render generated assembly
+
+    Args:
+        asm: Assembly code lines
+
+    Returns:
+        str: Assembly listing
+    """
+    return "\n".join(ASM_HEADER + list(asm))
+
+
+def format_issues(issues):
+    """
+    Render compilation issues
+
+    Args:
+        issues: Lexical, syntax and semantic issue messages
+
+    Returns:
+        str: Issues listing
+    """
+    if not issues:
+        return "✓ Compilation completed successfully!"
+    lines = ["COMPILATION ISSUES", "=" * 70, ""]
+    lines.extend(f"{idx}. {err}" for idx, err in enumerate(issues, 1))
+    return "\n".join(lines) + "\n"
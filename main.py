@@ -1,13 +1,170 @@
-import tkinter as tk
-from gui import CompilerInterface
+import argparse
+import sys
 
 
-def main():
-    """Initialize and run the compiler GUI"""
+def build_arg_parser():
+    """Build the command line interface"""
+    cli = argparse.ArgumentParser(description="Mini Compiler")
+    commands = cli.add_subparsers(dest='command')
+
+    compile_cmd = commands.add_parser('compile', help="compile sources headlessly")
+    compile_cmd.add_argument('paths', nargs='+', help="source files or directories")
+    compile_cmd.add_argument('-o', '--out-dir', default='build',
+                             help="directory for .tokens/.ir/.asm listings (default: build)")
+    compile_cmd.add_argument('-j', '--jobs', type=int, default=None,
+                             help="worker processes (default: CPU count)")
+    compile_cmd.add_argument('--suffix', default='.mc',
+                             help="source extension searched in directories (default: .mc)")
+    compile_cmd.add_argument('-O', dest='opt_level', type=int, default=0, choices=(0, 1, 2),
+                             help="optimization level: 1 adds local IR passes and assembly "
+                                  "peephole, 2 global SSA and loop passes (default: 0)")
+    compile_cmd.add_argument('--target', default='asm', choices=('asm', 'python', 'x86'),
+                             help="code generator: pseudo-assembly (.asm), a Python "
+                                  "function (.py) or x86-64 GNU assembly (.s) (default: asm)")
+    compile_cmd.add_argument('--cache-dir', default=None,
+                             help="compilation cache directory (default: __compilecache__ "
+                                  "next to the compiler, or $MINICOMPILER_COMPILE_CACHE)")
+    compile_cmd.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                             help="evict least recently used cache entries beyond this size "
+                                  "(default: 256)")
+    compile_cmd.add_argument('--no-cache', action='store_true',
+                             help="recompile every file instead of reusing cached results")
+    compile_cmd.add_argument('--profile', metavar='JSON', default=None,
+                             help="record time and counts per compiler phase and write them "
+                                  "as JSON to this file ('-' for stdout)")
+    compile_cmd.add_argument('--profile-memory', action='store_true',
+                             help="with --profile, also trace allocations (slows compilation)")
+    compile_cmd.add_argument('--lexer', default='ply', choices=('ply', 'regex'),
+                             help="lexer engine: PLY, or one combined regex (faster, same "
+                                  "tokens) (default: ply)")
+    compile_cmd.add_argument('--parser', default='ply', choices=('ply', 'descent'),
+                             help="parser engine: PLY's LALR tables, or recursive descent "
+                                  "(faster, same output) (default: ply)")
+
+    run_cmd = commands.add_parser('run', help="compile a source and execute its IR")
+    run_cmd.add_argument('path', help="source file")
+    run_cmd.add_argument('-O', dest='opt_level', type=int, default=0, choices=(0, 1, 2),
+                         help="optimization level applied before running (default: 0)")
+    run_cmd.add_argument('--max-steps', type=int, default=None,
+                         help="stop after this many IR instructions, or loop iterations "
+                              "with --backend python or native (default: 10000000)")
+    run_cmd.add_argument('--backend', default='ir', choices=('ir', 'python', 'native'),
+                         help="execute the IR directly, compiled to Python, or as an x86-64 "
+                              "executable (default: ir)")
+    run_cmd.add_argument('--lexer', default='ply', choices=('ply', 'regex'),
+                         help="lexer engine (default: ply)")
+    run_cmd.add_argument('--parser', default='ply', choices=('ply', 'descent'),
+                         help="parser engine (default: ply)")
+
+    server_cmd = commands.add_parser('server', help="run a compile server with warm compilers")
+    server_cmd.add_argument('--socket', default=None,
+                            help="Unix socket to listen on (default: minicompiler-<uid>.sock "
+                                 "in the temp directory, or $MINICOMPILER_SERVER_SOCKET)")
+    server_cmd.add_argument('--port', type=int, default=None,
+                            help="listen on this TCP port of 127.0.0.1 instead of a socket")
+    server_cmd.add_argument('-j', '--jobs', type=int, default=None,
+                            help="worker processes (default: CPU count)")
+    server_cmd.add_argument('--batch-size', type=int, default=16,
+                            help="most requests handed to a worker at once (default: 16)")
+    server_cmd.add_argument('--max-pending', type=int, default=256,
+                            help="queued requests before clients are made to wait "
+                                 "(default: 256)")
+    server_cmd.add_argument('--timeout', type=float, default=30.0,
+                            help="default seconds allowed per request (default: 30)")
+    server_cmd.add_argument('--cache-dir', default=None,
+                            help="compilation cache directory (default: __compilecache__ "
+                                 "next to the compiler, or $MINICOMPILER_COMPILE_CACHE)")
+    server_cmd.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                            help="evict least recently used cache entries beyond this size "
+                                 "(default: 256)")
+    server_cmd.add_argument('--no-cache', action='store_true',
+                            help="recompile every request instead of reusing cached results")
+
+    client_cmd = commands.add_parser('client', help="compile sources on a running compile server")
+    client_cmd.add_argument('paths', nargs='*', help="source files or directories")
+    client_cmd.add_argument('-o', '--out-dir', default='build',
+                            help="directory for .tokens/.ir/.asm listings (default: build)")
+    client_cmd.add_argument('--suffix', default='.mc',
+                            help="source extension searched in directories (default: .mc)")
+    client_cmd.add_argument('-O', dest='opt_level', type=int, default=0, choices=(0, 1, 2),
+                            help="optimization level (default: 0)")
+    client_cmd.add_argument('--target', default='asm', choices=('asm', 'python', 'x86'),
+                            help="code generator (default: asm)")
+    client_cmd.add_argument('--socket', default=None, help="server's Unix socket")
+    client_cmd.add_argument('--port', type=int, default=None, help="server's TCP port")
+    client_cmd.add_argument('--timeout', type=float, default=None,
+                            help="seconds allowed per file (default: the server's)")
+    client_cmd.add_argument('--stats', action='store_true',
+                            help="print the server's statistics as JSON")
+    client_cmd.add_argument('--stop', action='store_true', help="shut the server down")
+
+    lsp_cmd = commands.add_parser('lsp', help="serve the Language Server Protocol on stdio")
+    lsp_cmd.add_argument('--debounce', type=int, default=200, metavar='MS',
+                         help="wait this long after the last edit before reanalyzing "
+                              "(default: 200)")
+    return cli
+
+
+def main(argv=None):
+    """Run the compiler GUI, or a headless command when one is given"""
+    args = build_arg_parser().parse_args(argv)
+
+    if args.command == 'compile':
+        from batch import run_batch
+        from compile_cache import CACHE_ROOT
+        cache_dir = None if args.no_cache else args.cache_dir or CACHE_ROOT
+        failed = run_batch(args.paths, args.out_dir, jobs=args.jobs, suffix=args.suffix,
+                           opt_level=args.opt_level, target=args.target, cache_dir=cache_dir,
+                           cache_size=args.cache_size * 1024 * 1024, profile=args.profile,
+                           trace_memory=args.profile_memory, lexer=args.lexer,
+                           parser=args.parser)
+        return 1 if failed else 0
+    if args.command == 'run':
+        from executor import MAX_STEPS, run_source
+        return run_source(args.path, opt_level=args.opt_level,
+                          max_steps=args.max_steps or MAX_STEPS, backend=args.backend,
+                          lexer=args.lexer, parser=args.parser)
+    if args.command == 'server':
+        from compile_cache import CACHE_ROOT
+        from compile_server import DEFAULT_SOCKET, serve
+        cache_dir = None if args.no_cache else args.cache_dir or CACHE_ROOT
+        serve(args.socket or DEFAULT_SOCKET, args.port,
+              ready=lambda address: print(f"Compile server listening on {address}", flush=True),
+              workers=args.jobs, batch_size=args.batch_size, max_pending=args.max_pending,
+              timeout=args.timeout, cache_dir=cache_dir, cache_size=args.cache_size * 1024 * 1024)
+        return 0
+    if args.command == 'client':
+        import json
+        from compile_server import DEFAULT_SOCKET, CompileClient, run_client
+        path = args.socket or DEFAULT_SOCKET
+        failed = 0
+        if args.paths:
+            failed = run_client(args.paths, args.out_dir, suffix=args.suffix,
+                                opt_level=args.opt_level, target=args.target, path=path,
+                                port=args.port, timeout=args.timeout)
+        if args.stats or args.stop:
+            client = CompileClient(path, args.port)
+            try:
+                if args.stats:
+                    print(json.dumps(client.call('stats')['stats'], indent=1))
+                if args.stop:
+                    client.call('shutdown')
+            finally:
+                client.close()
+        return 1 if failed else 0
+    if args.command == 'lsp':
+        from language_server import serve_stdio
+        return serve_stdio(debounce=args.debounce / 1000)
+
+    # Tk is only imported for the GUI so headless commands start fast
+    import tkinter as tk
+    from gui import CompilerInterface
+
     app_window = tk.Tk()
     compiler_ui = CompilerInterface(app_window)
     app_window.mainloop()
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Building and running executables from the x86-64 target.
+
+The listing is assembled and linked with binutils (as + ld) or, failing
+that, the C compiler driver without its C library. Either way the result
+is a static ELF binary that only needs the Linux kernel.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from executor import ExecutionError, ExecutionResult, StepLimitExceeded
+from x86_generator import (X86Translator, DEFAULT_STEPS, EXIT_OK, EXIT_DIVISION_BY_ZERO,
+                           EXIT_STEP_LIMIT)
+
+
+class ToolchainError(Exception):
+    """No usable assembler/linker, or they rejected the generated source"""
+
+
+def find_toolchain():
+    """
+    Commands turning a .s file into an executable
+
+    Returns:
+        list: Argument-list templates with {src}, {obj} and {exe} fields
+
+    Raises:
+        ToolchainError: When neither as/ld nor cc/gcc/clang is installed
+    """
+    if shutil.which('as') and shutil.which('ld'):
+        return [['as', '-o', '{obj}', '{src}'], ['ld', '-o', '{exe}', '{obj}']]
+    for driver in ('cc', 'gcc', 'clang'):
+        if shutil.which(driver):
+            return [[driver, '-nostdlib', '-static', '-o', '{exe}', '{src}']]
+    raise ToolchainError("No assembler found: install binutils (as, ld) or a C compiler")
+
+
+def build_executable(asm, exe_path):
+    """
+    Assemble and link a listing
+
+    Args:
+        asm: Lines from X86Translator.translate
+        exe_path: Where to write the executable
+
+    Raises:
+        ToolchainError: When the toolchain is missing or fails
+    """
+    commands = find_toolchain()
+    with tempfile.TemporaryDirectory(prefix='mc-native-') as tmp:
+        src = os.path.join(tmp, 'program.s')
+        obj = os.path.join(tmp, 'program.o')
+        with open(src, 'w', encoding='utf-8') as fh:
+            fh.write("\n".join(asm) + "\n")
+        for template in commands:
+            argv = [arg.format(src=src, obj=obj, exe=exe_path) for arg in template]
+            done = subprocess.run(argv, capture_output=True, text=True)
+            if done.returncode:
+                raise ToolchainError(f"{argv[0]} failed:\n{done.stderr.strip()}")
+
+
+class NativeProgram:
+    """A built executable with the run() interface of executor.IRExecutor"""
+
+    def __init__(self, path, max_steps):
+        self.path = path
+        self.max_steps = max_steps
+        self.seconds = 0.0
+
+    def run(self, timeout=None):
+        """
+        Execute the binary and collect what it printed
+
+        Args:
+            timeout: Seconds before the process is killed, or None
+
+        Returns:
+            ExecutionResult: Printed values; steps and variables are not
+                             observable from outside and are left empty
+
+        Raises:
+            StepLimitExceeded: After max_steps loop iterations
+            ExecutionError: On division by zero or any other failure
+        """
+        start = time.perf_counter()
+        done = subprocess.run([self.path], capture_output=True, timeout=timeout)
+        self.seconds = time.perf_counter() - start
+        output = [int(line) for line in done.stdout.split()]
+        if done.returncode == EXIT_STEP_LIMIT:
+            raise StepLimitExceeded(f"Step limit of {self.max_steps} loop iterations reached",
+                                    output, self.max_steps)
+        if done.returncode == EXIT_DIVISION_BY_ZERO:
+            raise ExecutionError("Division by zero", output)
+        if done.returncode != EXIT_OK:
+            raise ExecutionError(f"Program exited with status {done.returncode}", output)
+        return ExecutionResult(output, 0, {})
+
+
+def build_program(ir_code, exe_path, max_steps=DEFAULT_STEPS):
+    """
+    Translate IR with X86Translator and build it
+
+    Args:
+        ir_code: List of Instr
+        exe_path: Where to write the executable
+        max_steps: Loop iterations before the program stops itself
+
+    Returns:
+        NativeProgram
+    """
+    build_executable(X86Translator(max_steps).translate(ir_code), exe_path)
+    return NativeProgram(exe_path, max_steps)
@@ -0,0 +1,1043 @@
+"""IR optimization passes and the pass manager that runs them.
+
+All passes are local to basic blocks unless noted: facts are dropped at
+every referenced label, since control can arrive there from elsewhere.
+The SSA passes work on the whole program in SSA form (ssa.SSAForm), the
+loop passes on the natural loops of the control-flow graph. Passes never
+mutate the instructions they are given; rewritten instructions are fresh
+Instr objects, so the generator's IR stays intact.
+
+    -O0  no optimization
+    -O1  constant folding/propagation, copy propagation, dead code elimination
+    -O2  sparse conditional constant propagation, global value numbering,
+         copy propagation, loop inversion, loop-invariant code motion,
+         strength reduction and dead code elimination, iterated to a fixed
+         point
+"""
+from cfg import ControlFlowGraph, gc_paused
+from dataflow import Liveness
+from ir import (ASSIGN, ADD, SUB, MUL, DIV, MOD, EQ, NE, MARK, JUMP, JUMP_IF_FALSE, OUTPUT, Instr,
+                ARITHMETIC, BINARY, COMPARISON, NEGATED, expression_key, operand_key,
+                read_names, writes, evaluate)
+from ssa import SSAForm
+
+# Lattice value of SCCP for a version that takes more than one value
+VARYING = object()
+
+# The loop passes skip loops with more blocks than this: deep nests would
+# otherwise cost each round time quadratic in the depth, for outer loops
+# that rarely have anything left to gain
+MAX_LOOP_BLOCKS = 256
+
+
+def _is_name(value):
+    return isinstance(value, str)
+
+
+def _jump_targets(ir_code):
+    """Labels referenced by any jump"""
+    targets = set()
+    for instr in ir_code:
+        if instr.op is JUMP:
+            targets.add(instr.src1)
+        elif instr.op is JUMP_IF_FALSE:
+            targets.add(instr.src2)
+    return targets
+
+
+def _substitute(instr, mapping):
+    """
+    Replace operand names found in mapping
+
+    Args:
+        instr: Instruction to rewrite
+        mapping: name -> replacement value
+
+    Returns:
+        Instr: instr itself when nothing changed, otherwise a new instruction
+    """
+    op = instr.op
+    s1 = instr.src1
+    s2 = instr.src2
+    if op in BINARY:
+        n1 = mapping.get(s1, s1) if _is_name(s1) else s1
+        n2 = mapping.get(s2, s2) if _is_name(s2) else s2
+        if n1 is not s1 or n2 is not s2:
+            return Instr(op, n1, n2, instr.dst)
+    elif op is ASSIGN or op is OUTPUT or op is JUMP_IF_FALSE:
+        if _is_name(s1) and s1 in mapping:
+            return Instr(op, mapping[s1], s2, instr.dst)
+    return instr
+
+
+def _may_be_float(ir_code):
+    """
+    Names that may hold a float anywhere in the program
+
+    Flow-insensitive: ints divide and compare to ints, so floats only come
+    from decimal literals and from copies and arithmetic of floats. Names
+    never assigned hold 0.
+
+    Returns:
+        set: The names
+    """
+    floats = set()
+    feeds = {}  # name -> names copied or computed from it
+    worklist = []
+    for instr in ir_code:
+        op = instr.op
+        if op is ASSIGN:
+            operands = (instr.src1,)
+        elif op in ARITHMETIC:
+            operands = (instr.src1, instr.src2)
+        else:
+            continue
+        dst = instr.dst
+        for value in operands:
+            if type(value) is float:
+                if dst not in floats:
+                    floats.add(dst)
+                    worklist.append(dst)
+            elif type(value) is str:
+                feeds.setdefault(value, []).append(dst)
+    while worklist:
+        for dst in feeds.get(worklist.pop(), ()):
+            if dst not in floats:
+                floats.add(dst)
+                worklist.append(dst)
+    return floats
+
+
+def _same(a, b):
+    """Whether two constants are the same value, 1 and 1.0 or 0.0 and -0.0 being different"""
+    return operand_key(a) == operand_key(b)
+
+
+def _block_of(cfg):
+    """Instruction index -> index of the block holding it"""
+    block_of = [None] * len(cfg.ir_code)
+    for block in cfg.blocks:
+        for idx in range(block.start, block.end):
+            block_of[idx] = block.index
+    return block_of
+
+
+def _jump_sources(ir_code):
+    """Label -> indices of the jumps to it"""
+    sources = {}
+    for idx, instr in enumerate(ir_code):
+        if instr.op is JUMP:
+            sources.setdefault(instr.src1, []).append(idx)
+        elif instr.op is JUMP_IF_FALSE:
+            sources.setdefault(instr.src2, []).append(idx)
+    return sources
+
+
+def _preheader(cfg, loop, sources, block_of):
+    """
+    Where code that runs once before a loop goes
+
+    Among the labels starting the header, those entered from outside the
+    loop must all precede those its back edges jump to; code inserted
+    between them runs on entry only.
+
+    Args:
+        cfg: ControlFlowGraph
+        loop: cfg.NaturalLoop
+        sources: Label -> indices of the jumps to it
+        block_of: Instruction index -> block index
+
+    Returns:
+        int: Index to insert before, or None if there is no such place
+    """
+    code = cfg.ir_code
+    header = cfg.blocks[loop.header]
+    body = loop.body
+    if loop.header - 1 in body and code[header.start - 1].op is not JUMP:
+        # The loop falls through into its own header
+        return None
+    position = None
+    for idx in range(header.start, header.end):
+        instr = code[idx]
+        if instr.op is not MARK:
+            break
+        inside = outside = False
+        for src in sources.get(instr.src1, ()):
+            if block_of[src] in body:
+                inside = True
+            else:
+                outside = True
+        if inside:
+            if outside:
+                return None
+            if position is None:
+                position = idx
+        elif outside and position is not None:
+            return None
+    return position
+
+
+def _fresh(base, taken):
+    """A name starting with base that is not in taken, which gets it"""
+    name = base
+    serial = 1
+    while name in taken:
+        serial += 1
+        name = f"{base}.{serial}"
+    taken.add(name)
+    return name
+
+
+class OptimizationPass:
+    """Base class: run() rewrites a whole instruction list"""
+
+    name = 'pass'
+
+    def __init__(self):
+        self.rewritten = 0
+
+    def run(self, ir_code):
+        """
+        Optimize an instruction list
+
+        Args:
+            ir_code: List of Instr
+
+        Returns:
+            list: New instruction list
+        """
+        raise NotImplementedError
+
+
+class ConstantFolding(OptimizationPass):
+    """Propagate known constants, fold constant operations and branches"""
+
+    name = 'constant-folding'
+
+    def run(self, ir_code):
+        targets = _jump_targets(ir_code)
+        consts = {}
+        out = []
+        for instr in ir_code:
+            op = instr.op
+            if op is MARK:
+                if instr.src1 in targets:
+                    consts.clear()
+                out.append(instr)
+                continue
+
+            new = _substitute(instr, consts) if consts else instr
+            if op in BINARY and not _is_name(new.src1) and not _is_name(new.src2):
+                try:
+                    new = Instr(ASSIGN, evaluate(op, new.src1, new.src2), None, new.dst)
+                except ZeroDivisionError:
+                    pass
+            elif op is JUMP_IF_FALSE and not _is_name(new.src1):
+                # Constant condition: either always taken or never
+                if new.src1:
+                    self.rewritten += 1
+                    continue
+                new = Instr(JUMP, new.src2)
+            if new is not instr:
+                self.rewritten += 1
+
+            dst = writes(new)
+            if dst is not None:
+                if new.op is ASSIGN and not _is_name(new.src1):
+                    consts[dst] = new.src1
+                else:
+                    consts.pop(dst, None)
+            out.append(new)
+        return out
+
+
+class CopyPropagation(OptimizationPass):
+    """Replace uses of x after x := y with y while neither is reassigned"""
+
+    name = 'copy-propagation'
+
+    def run(self, ir_code):
+        targets = _jump_targets(ir_code)
+        copies = {}       # dst -> source name
+        copied_from = {}  # source name -> dsts currently copying it
+        out = []
+        for instr in ir_code:
+            op = instr.op
+            if op is MARK:
+                if instr.src1 in targets:
+                    copies.clear()
+                    copied_from.clear()
+                out.append(instr)
+                continue
+
+            new = _substitute(instr, copies) if copies else instr
+            if new is not instr:
+                self.rewritten += 1
+
+            dst = writes(new)
+            if dst is not None:
+                # dst changes: forget copies of it and copies into it
+                for alias in copied_from.pop(dst, ()):
+                    copies.pop(alias, None)
+                src = copies.pop(dst, None)
+                if src is not None:
+                    copied_from[src].discard(dst)
+                if new.op is ASSIGN and _is_name(new.src1) and new.src1 != dst:
+                    copies[dst] = new.src1
+                    copied_from.setdefault(new.src1, set()).add(dst)
+            out.append(new)
+        return out
+
+
+class SparseConditionalConstantPropagation(OptimizationPass):
+    """
+    Global constant propagation and unreachable-code removal over SSA form
+    (Wegman & Zadeck)
+
+    A version's value starts unknown and can only drop, to one constant and
+    then to varying. Blocks are evaluated once an edge into them is found
+    executable, and a phi meets only the values arriving along executable
+    edges, so a branch whose condition turns out constant keeps its other
+    arm from spoiling the constants after the join. Afterwards versions
+    with constant values are replaced by the constant, constant conditions
+    are folded and blocks never reached are removed.
+    """
+
+    name = 'sccp'
+
+    def run(self, ir_code):
+        form = SSAForm(ir_code)
+        blocks = form.cfg.blocks
+        labels = form.cfg.block_of_label
+        code = form.code
+        phis = form.phis
+        count = len(blocks)
+        if not count:
+            return ir_code
+        values = {version: 0 for version in form.base if version not in form.def_block}
+
+        def value(operand):
+            return values.get(operand) if type(operand) is str else operand
+
+        # Version -> (block, phi or instruction index) reading it
+        uses = {}
+        for block in range(count):
+            if form.idom[block] is None:
+                continue
+            for phi in phis[block]:
+                for arg in phi.args:
+                    if arg is not None:
+                        uses.setdefault(arg, []).append((block, phi))
+            for idx, instr in enumerate(code[block]):
+                for name in read_names(instr):
+                    uses.setdefault(name, []).append((block, idx))
+
+        executable = {(None, 0)}
+        visited = [False] * count
+        edges = [(None, 0)]
+        changed = []
+
+        def lower(version, new):
+            if new is None:
+                return
+            old = values.get(version)
+            if old is VARYING or (old is not None and _same(old, new)):
+                return
+            values[version] = new if old is None else VARYING
+            changed.append(version)
+
+        def mark(pred, succ):
+            if (pred, succ) not in executable:
+                executable.add((pred, succ))
+                edges.append((pred, succ))
+
+        def visit_phi(block, phi):
+            preds = form.preds[block]
+            meet = None
+            for slot, arg in enumerate(phi.args):
+                if (preds[slot], block) not in executable:
+                    continue
+                incoming = value(arg)
+                if incoming is None:
+                    continue
+                if incoming is VARYING or (meet is not None and not _same(meet, incoming)):
+                    meet = VARYING
+                    break
+                meet = incoming
+            lower(phi.dst, meet)
+
+        def visit(block, idx):
+            instr = code[block][idx]
+            op = instr.op
+            if op in BINARY:
+                a, b = value(instr.src1), value(instr.src2)
+                if a is None or b is None:
+                    return
+                if a is VARYING or b is VARYING:
+                    lower(instr.dst, VARYING)
+                    return
+                try:
+                    lower(instr.dst, evaluate(op, a, b))
+                except ZeroDivisionError:
+                    lower(instr.dst, VARYING)
+            elif op is ASSIGN:
+                lower(instr.dst, value(instr.src1))
+            elif op is JUMP_IF_FALSE:
+                cond = value(instr.src1)
+                if cond is None:
+                    return
+                if cond is VARYING or not cond:
+                    mark(block, labels[instr.src2])
+                if (cond is VARYING or cond) and block + 1 < count:
+                    mark(block, block + 1)
+            elif op is JUMP:
+                mark(block, labels[instr.src1])
+
+        while edges or changed:
+            while edges:
+                pred, block = edges.pop()
+                for phi in phis[block]:
+                    visit_phi(block, phi)
+                if visited[block]:
+                    continue
+                visited[block] = True
+                instrs = code[block]
+                for idx in range(len(instrs)):
+                    visit(block, idx)
+                if block + 1 < count and (not instrs
+                                          or instrs[-1].op not in (JUMP, JUMP_IF_FALSE)):
+                    mark(block, block + 1)
+            while changed and not edges:
+                for block, item in uses.get(changed.pop(), ()):
+                    if not visited[block]:
+                        continue
+                    if type(item) is int:
+                        visit(block, item)
+                    else:
+                        visit_phi(block, item)
+
+        def substitute(operand):
+            if type(operand) is str:
+                known = values.get(operand)
+                if known is not None and known is not VARYING:
+                    return known
+            return operand
+
+        for block in range(count):
+            if not visited[block]:
+                # Never executed: the instructions go, phis do not matter
+                code[block] = []
+                continue
+            rewritten = []
+            for instr in code[block]:
+                op = instr.op
+                a, b = substitute(instr.src1), substitute(instr.src2)
+                if op in BINARY or op is ASSIGN:
+                    known = substitute(instr.dst)
+                    if known is not instr.dst:
+                        op, a, b = ASSIGN, known, None
+                elif op is JUMP_IF_FALSE and type(a) is not str:
+                    self.rewritten += 1
+                    if not a:
+                        rewritten.append(Instr(JUMP, instr.src2))
+                    continue
+                elif op is not OUTPUT:
+                    rewritten.append(instr)
+                    continue
+                if (op is instr.op and (a is instr.src1 or _same(a, instr.src1))
+                        and (b is instr.src2 or _same(b, instr.src2))):
+                    rewritten.append(instr)
+                else:
+                    self.rewritten += 1
+                    rewritten.append(Instr(op, a, b, instr.dst))
+            code[block] = rewritten
+        return form.to_ir()
+
+
+class GlobalValueNumbering(OptimizationPass):
+    """
+    Dominator-based value numbering over SSA form (Briggs, Cooper & Simpson)
+
+    Walks the dominator tree with a table of the expressions computed on
+    the way down, keyed by the value numbers of their operands. A
+    computation found in the table becomes a copy of the earlier result,
+    a copy takes the value number of its source and a phi whose arguments
+    share one value number takes that one. Uses are rewritten to the
+    version first holding their value when that keeps the form
+    conventional (see ssa): the version must be the current one of its
+    name at the use, and the name must have all its phis (none pruned) or
+    a single assignment, or be assigned in the same block.
+    """
+
+    name = 'gvn'
+
+    def run(self, ir_code):
+        form = SSAForm(ir_code)
+        if not form.cfg.blocks:
+            return ir_code
+        code = form.code
+        phis = form.phis
+        base = form.base
+        def_block = form.def_block
+        global_names = form.global_names - form.pruned
+        assignments = form.assignments
+        number = {}  # version -> value number: the version first holding the value, or a literal
+        table = {}   # expression key -> version first computing it
+        stacks = {}  # name -> versions, innermost last, as during renaming
+
+        def numbered(operand):
+            if type(operand) is not str:
+                return operand
+            known = number.get(operand)
+            if known is not None:
+                return known
+            # Not numbered yet (a loop's back edge) or never assigned (0)
+            return operand if operand in def_block else 0
+
+        def use(operand, block):
+            holder = numbered(operand)
+            if type(holder) is not str or holder == operand:
+                return holder
+            name = base[holder]
+            stack = stacks.get(name)
+            if (stack and stack[-1] == holder
+                    and (name in global_names or assignments.get(name) == 1
+                         or def_block[holder] == block)):
+                return holder
+            return operand
+
+        pending = [(0, False)]
+        while pending:
+            item, leaving = pending.pop()
+            if leaving:
+                names, keys = item
+                for name in names:
+                    stacks[name].pop()
+                for key in keys:
+                    del table[key]
+                continue
+            block = item
+            pushed = []
+            added = []
+            for phi in phis[block]:
+                args = [numbered(arg) for arg in phi.args if arg is not None]
+                if args and all(_same(arg, args[0]) for arg in args):
+                    number[phi.dst] = args[0]
+                else:
+                    key = ('phi', block, tuple(operand_key(arg) for arg in args))
+                    if key in table:
+                        number[phi.dst] = table[key]
+                    else:
+                        number[phi.dst] = table[key] = phi.dst
+                        added.append(key)
+                name = base[phi.dst]
+                stacks.setdefault(name, []).append(phi.dst)
+                pushed.append(name)
+
+            instrs = code[block]
+            for idx, instr in enumerate(instrs):
+                op = instr.op
+                dst = instr.dst
+                if op in BINARY:
+                    new = Instr(op, use(instr.src1, block), use(instr.src2, block), dst)
+                    key = expression_key(Instr(op, numbered(instr.src1), numbered(instr.src2)))
+                    holder = table.get(key)
+                    if holder is None:
+                        number[dst] = table[key] = dst
+                        added.append(key)
+                    else:
+                        number[dst] = holder
+                        copied = use(dst, block)
+                        if copied is not dst:
+                            new = Instr(ASSIGN, copied, None, dst)
+                elif op is ASSIGN:
+                    number[dst] = numbered(instr.src1)
+                    new = Instr(op, use(instr.src1, block), None, dst)
+                elif op is OUTPUT or op is JUMP_IF_FALSE:
+                    new = Instr(op, use(instr.src1, block), instr.src2)
+                else:
+                    continue
+                if new.op is not op or new.src1 != instr.src1 or new.src2 != instr.src2:
+                    self.rewritten += 1
+                    instrs[idx] = new
+                if dst is not None:
+                    name = base[dst]
+                    stacks.setdefault(name, []).append(dst)
+                    pushed.append(name)
+
+            pending.append(((pushed, added), True))
+            pending.extend((child, False) for child in reversed(form.children[block]))
+        return form.to_ir()
+
+
+class LoopInversion(OptimizationPass):
+    """
+    Test a loop's condition at the bottom instead of jumping back to the top
+
+        Lh: H; jif c, Lx; B; jump Lh; Lx:
+    becomes
+        Lh: H; jif c, Lx; Lb: B; H'; jif c', Lb; Lx:
+
+    where H' is H computing the negated condition into c', so each iteration
+    runs one jump instead of two. Only loops leaving from the header alone
+    qualify, and the negation must be exact (see ir.NEGATED).
+    """
+
+    name = 'loop-inversion'
+
+    def run(self, ir_code):
+        cfg = ControlFlowGraph(ir_code)
+        loops = cfg.loops(MAX_LOOP_BLOCKS)
+        if not loops:
+            return ir_code
+        blocks = cfg.blocks
+        floats = _may_be_float(ir_code)
+        reads = {}
+        names = set()
+        for instr in ir_code:
+            for name in read_names(instr):
+                reads[name] = reads.get(name, 0) + 1
+            if instr.dst is not None:
+                names.add(instr.dst)
+        names.update(reads)
+        labels = {instr.src1 for instr in ir_code if instr.op is MARK}
+
+        after = {}    # index -> instructions inserted after it
+        replace = {}  # index -> instructions replacing it
+        for loop in loops:
+            if len(loop.latches) != 1:
+                continue
+            first = loop.header
+            last = loop.latches[0]
+            header = blocks[first]
+            test = ir_code[header.end - 1]
+            back = ir_code[blocks[last].end - 1]
+            if (last <= first or test.op is not JUMP_IF_FALSE or back.op is not JUMP
+                    or cfg.block_of_label.get(test.src2) != last + 1
+                    or first + 1 not in loop.body or last + 1 in loop.body):
+                continue
+            if any(succ not in loop.body for b in loop.body if b != first
+                   for succ in blocks[b].succs):
+                continue
+
+            start = header.start
+            while ir_code[start].op is MARK:
+                start += 1
+            cond = test.src1
+            defining = None
+            for idx in range(start, header.end - 1):
+                if ir_code[idx].dst == cond and ir_code[idx].op is not OUTPUT:
+                    defining = idx
+            if defining is None or reads.get(cond) != 1:
+                continue
+            compare = ir_code[defining]
+            if compare.op not in COMPARISON:
+                continue
+            if compare.op is not EQ and compare.op is not NE and (
+                    type(compare.src1) is float or type(compare.src2) is float
+                    or compare.src1 in floats or compare.src2 in floats):
+                continue
+
+            body_label = _fresh(f"{back.src1}.body", labels)
+            after[header.end - 1] = [Instr(MARK, body_label)]
+            # A name of its own keeps the two tests apart, so folding the
+            # first on entry leaves nothing behind
+            negated = _fresh(f"{cond}.not", names)
+            retest = list(ir_code[start:header.end - 1])
+            retest[defining - start] = Instr(NEGATED[compare.op], compare.src1, compare.src2,
+                                             negated)
+            retest.append(Instr(JUMP_IF_FALSE, negated, body_label))
+            replace[blocks[last].end - 1] = retest
+            self.rewritten += 1
+
+        if not self.rewritten:
+            return ir_code
+        out = []
+        for idx, instr in enumerate(ir_code):
+            if idx in replace:
+                out.extend(replace[idx])
+            else:
+                out.append(instr)
+            if idx in after:
+                out.extend(after[idx])
+        return out
+
+
+class LoopInvariantCodeMotion(OptimizationPass):
+    """
+    Hoist computations whose operands do not change inside a loop in front
+    of it, innermost loops first
+
+    x = a op b moves when a and b are literals, names the loop never
+    assigns or results already hoisted from it; it is the loop's only
+    assignment to x; x is not live on entry to the header, so no earlier
+    value of x is read; and either x is dead after the loop or the
+    instruction runs on every path out of it. Division by a name or by
+    zero stays put, since it may trap on an iteration that never runs.
+    """
+
+    name = 'loop-invariant-code-motion'
+
+    def run(self, ir_code):
+        cfg = ControlFlowGraph(ir_code)
+        loops = cfg.loops(MAX_LOOP_BLOCKS)
+        if not loops:
+            return ir_code
+        blocks = cfg.blocks
+        block_of = _block_of(cfg)
+        sources = _jump_sources(ir_code)
+        liveness = Liveness(cfg).solve()
+        bit = liveness.bit
+        innermost = {}
+        for loop in reversed(loops):
+            for b in loop.body:
+                innermost[b] = loop
+
+        hoisted = {}  # index -> instructions inserted before it
+        moved = set()
+        for loop in loops:
+            at = _preheader(cfg, loop, sources, block_of)
+            if at is None:
+                continue
+            body = loop.body
+            defs = {}
+            for b in body:
+                for idx in range(blocks[b].start, blocks[b].end):
+                    dst = writes(ir_code[idx])
+                    if dst is not None:
+                        defs[dst] = defs.get(dst, 0) + 1
+            exiting = [b for b in body if any(succ not in body for succ in blocks[b].succs)]
+            live_after = 0
+            for b in exiting:
+                for succ in blocks[b].succs:
+                    if succ not in body:
+                        live_after |= liveness.ins[succ]
+            live_on_entry = liveness.ins[loop.header]
+
+            invariant = set()
+            for b in sorted(b for b in body if innermost[b] is loop):
+                for idx in range(blocks[b].start, blocks[b].end):
+                    instr = ir_code[idx]
+                    op = instr.op
+                    if op is not ASSIGN and op not in BINARY:
+                        continue
+                    dst = instr.dst
+                    if defs[dst] != 1:
+                        continue
+                    operands = (instr.src1,) if op is ASSIGN else (instr.src1, instr.src2)
+                    if any(type(value) is str and value in defs and value not in invariant
+                           for value in operands):
+                        continue
+                    if ((op is DIV or op is MOD)
+                            and (type(instr.src2) is str or instr.src2 == 0)):
+                        continue
+                    position = bit.get(dst)
+                    if position is not None:
+                        if live_on_entry >> position & 1:
+                            continue
+                        if live_after >> position & 1 and not all(
+                                cfg.dominates(b, out) for out in exiting):
+                            continue
+                    invariant.add(dst)
+                    hoisted.setdefault(at, []).append(instr)
+                    moved.add(idx)
+
+        if not moved:
+            return ir_code
+        self.rewritten += len(moved)
+        out = []
+        for idx, instr in enumerate(ir_code):
+            if idx in hoisted:
+                out.extend(hoisted[idx])
+            if idx not in moved:
+                out.append(instr)
+        return out
+
+
+class StrengthReduction(OptimizationPass):
+    """
+    Replace multiplications of an induction variable by a constant with a
+    running sum
+
+    A basic induction variable i is an int the loop assigns once, as
+    i = i + k, i = k + i or i = i - k, possibly through a temporary
+    computed just before in the same block. Each t = i * c in the loop
+    then becomes t = s, where s = i * c is set up in front of the loop and
+    s = s + c * k follows the update of i.
+    """
+
+    name = 'strength-reduction'
+
+    def run(self, ir_code):
+        cfg = ControlFlowGraph(ir_code)
+        loops = cfg.loops(MAX_LOOP_BLOCKS)
+        if not loops:
+            return ir_code
+        blocks = cfg.blocks
+        block_of = _block_of(cfg)
+        sources = _jump_sources(ir_code)
+        floats = _may_be_float(ir_code)
+        taken = set()
+        for instr in ir_code:
+            taken.update(read_names(instr))
+            if instr.dst is not None:
+                taken.add(instr.dst)
+
+        before = {}   # index -> instructions inserted before it
+        after = {}    # index -> instructions inserted after it
+        replace = {}  # index -> replacement instruction
+        for loop in loops:
+            at = _preheader(cfg, loop, sources, block_of)
+            if at is None:
+                continue
+            defs = {}
+            products = []
+            for b in sorted(loop.body):
+                for idx in range(blocks[b].start, blocks[b].end):
+                    instr = ir_code[idx]
+                    dst = writes(instr)
+                    if dst is not None:
+                        defs.setdefault(dst, []).append(idx)
+                    if instr.op is MUL and idx not in replace:
+                        products.append(idx)
+
+            reduced = {}  # (induction variable, factor) -> name holding their product
+            for idx in products:
+                instr = ir_code[idx]
+                if type(instr.src1) is str and type(instr.src2) is int:
+                    var, factor = instr.src1, instr.src2
+                elif type(instr.src2) is str and type(instr.src1) is int:
+                    var, factor = instr.src2, instr.src1
+                else:
+                    continue
+                if var in floats:
+                    continue
+                induction = self.induction(ir_code, defs, block_of, var)
+                if induction is None:
+                    continue
+                update, step = induction
+                name = reduced.get((var, factor))
+                if name is None:
+                    name = reduced[(var, factor)] = _fresh(f"{var}.x{factor}", taken)
+                    before.setdefault(at, []).append(Instr(MUL, var, factor, name))
+                    after.setdefault(update, []).append(Instr(ADD, name, factor * step, name))
+                replace[idx] = Instr(ASSIGN, name, None, instr.dst)
+                self.rewritten += 1
+
+        if not replace:
+            return ir_code
+        out = []
+        for idx, instr in enumerate(ir_code):
+            if idx in before:
+                out.extend(before[idx])
+            out.append(replace.get(idx, instr))
+            if idx in after:
+                out.extend(after[idx])
+        return out
+
+    @staticmethod
+    def induction(ir_code, defs, block_of, var):
+        """
+        How a loop steps a basic induction variable
+
+        Args:
+            ir_code: List of Instr
+            defs: Name -> indices of the loop's assignments to it
+            block_of: Instruction index -> block index
+            var: Candidate name
+
+        Returns:
+            tuple: (index of the update, int step), or None if var is not one
+        """
+        sites = defs.get(var)
+        if sites is None or len(sites) != 1:
+            return None
+        update = sites[0]
+        instr = ir_code[update]
+        if instr.op is ASSIGN and type(instr.src1) is str:
+            # i = t after t = i + k, with nothing else assigning t in the loop
+            carried = defs.get(instr.src1)
+            if (carried is None or len(carried) != 1 or carried[0] > update
+                    or block_of[carried[0]] != block_of[update]):
+                return None
+            instr = ir_code[carried[0]]
+        a, b = instr.src1, instr.src2
+        if instr.op is ADD:
+            if a == var and type(b) is int:
+                return update, b
+            if b == var and type(a) is int:
+                return update, a
+        elif instr.op is SUB and a == var and type(b) is int:
+            return update, -b
+        return None
+
+
+class DeadCodeElimination(OptimizationPass):
+    """
+    Remove unreachable instructions, unreferenced labels, jumps to the next
+    instruction and assignments whose result is never read anywhere
+    """
+
+    name = 'dead-code'
+
+    def run(self, ir_code):
+        # Unreachable: everything after an unconditional jump up to the next
+        # referenced label
+        targets = _jump_targets(ir_code)
+        live = []
+        reachable = True
+        for instr in ir_code:
+            if instr.op is MARK and instr.src1 in targets:
+                reachable = True
+            if reachable:
+                live.append(instr)
+            if instr.op is JUMP:
+                reachable = False
+
+        # Jumps whose target follows with only labels in between
+        kept = []
+        for idx, instr in enumerate(live):
+            if instr.op is JUMP or instr.op is JUMP_IF_FALSE:
+                label = instr.src1 if instr.op is JUMP else instr.src2
+                nxt = idx + 1
+                while nxt < len(live) and live[nxt].op is MARK and live[nxt].src1 != label:
+                    nxt += 1
+                if nxt < len(live) and live[nxt].op is MARK:
+                    continue
+            kept.append(instr)
+
+        # Dead stores: a name no instruction reads is never observed; removing
+        # its definitions may in turn leave their operands unread
+        uses = {}
+        defs = {}
+        for idx, instr in enumerate(kept):
+            for name in read_names(instr):
+                uses[name] = uses.get(name, 0) + 1
+            dst = writes(instr)
+            if dst is not None:
+                defs.setdefault(dst, []).append(idx)
+        removed = set()
+        worklist = [name for name in defs if not uses.get(name)]
+        while worklist:
+            name = worklist.pop()
+            for idx in defs.get(name, ()):
+                instr = kept[idx]
+                if idx in removed or not self._removable(instr):
+                    continue
+                removed.add(idx)
+                for operand in read_names(instr):
+                    uses[operand] -= 1
+                    if not uses[operand]:
+                        worklist.append(operand)
+
+        targets = _jump_targets(kept)
+        return [instr for idx, instr in enumerate(kept)
+                if idx not in removed and (instr.op is not MARK or instr.src1 in targets)]
+
+    @staticmethod
+    def _removable(instr):
+        """Division by a possibly-zero value traps, so it must stay"""
+        if instr.op is DIV or instr.op is MOD:
+            divisor = instr.src2
+            return not _is_name(divisor) and divisor != 0
+        return True
+
+
+PIPELINES = {
+    0: [],
+    1: [ConstantFolding, CopyPropagation, DeadCodeElimination],
+    2: [SparseConditionalConstantPropagation, CopyPropagation, GlobalValueNumbering,
+        CopyPropagation, LoopInversion, LoopInvariantCodeMotion, StrengthReduction,
+        DeadCodeElimination],
+}
+
+# -O2 repeats its pipeline until the IR stops changing, at most this often
+MAX_ROUNDS = 4
+
+
+class PassManager:
+    """Runs the pass pipeline for an optimization level and keeps statistics"""
+
+    def __init__(self, level=1):
+        if level not in PIPELINES:
+            raise ValueError(f"Unknown optimization level -O{level}")
+        self.level = level
+        self.stats = {}
+
+    def record(self, opt_pass, before, after):
+        """Accumulate per-pass statistics; a run that grows the code counts as added"""
+        entry = self.stats.setdefault(opt_pass.name, new_stats())
+        entry['runs'] += 1
+        if after > before:
+            entry['added'] += after - before
+        else:
+            entry['removed'] += before - after
+        entry['rewritten'] += opt_pass.rewritten
+
+    def optimize(self, ir_code):
+        """
+        Optimize an instruction list
+
+        Args:
+            ir_code: List of Instr (left unmodified)
+
+        Returns:
+            list: Optimized instruction list
+        """
+        passes = PIPELINES[self.level]
+        rounds = MAX_ROUNDS if self.level >= 2 else 1
+        # The passes allocate an instruction per rewrite and the SSA passes
+        # a version per assignment; see cfg.gc_paused
+        with gc_paused():
+            for _ in range(rounds):
+                changed = False
+                for pass_cls in passes:
+                    opt_pass = pass_cls()
+                    result = opt_pass.run(ir_code)
+                    self.record(opt_pass, len(ir_code), len(result))
+                    changed = changed or opt_pass.rewritten or len(result) != len(ir_code)
+                    ir_code = result
+                if not changed:
+                    break
+        return ir_code
+
+    def report(self):
+        """Per-pass statistics as text lines"""
+        return format_stats(self.stats)
+
+
+def new_stats():
+    """Zeroed statistics of one pass"""
+    return {'runs': 0, 'added': 0, 'removed': 0, 'rewritten': 0}
+
+
+def merge_stats(total, stats):
+    """
+    Add one run's per-pass statistics into a running total
+
+    Args:
+        total: Accumulated stats dict, updated in place
+        stats: PassManager.stats from one compilation
+    """
+    for name, entry in stats.items():
+        into = total.setdefault(name, new_stats())
+        for key, value in entry.items():
+            into[key] += value
+
+
+def format_stats(stats):
+    """
+    Per-pass statistics as text
+
+    Args:
+        stats: name -> {'runs', 'added', 'removed', 'rewritten'}
+
+    Returns:
+        list: Header line plus one line per pass
+    """
+    width = max([len('Pass')] + [len(name) for name in stats])
+    lines = [f"{'Pass':<{width}} {'Runs':>6} {'Added':>7} {'Removed':>9} {'Rewritten':>10}"]
+    for name, entry in stats.items():
+        lines.append(f"{name:<{width}} {entry['runs']:>6} {entry['added']:>7} "
+                     f"{entry['removed']:>9} {entry['rewritten']:>10}")
+    return lines
@@ -1,49 +1,32 @@
 import ply.yacc as yacc
+import table_cache
 from lexer import TokenScanner
 from symbol_table import VariableRegistry
 
+# Module name for the optimized table kept in the table cache
+TABLE_MODULE = 'mc_parsetab'
+
+# Parser engines SyntaxProcessor can run: PLY's LALR parser, or DescentParser
+ENGINES = ('ply', 'descent')
+
 
 class SyntaxProcessor:
     """Parser and semantic analyzer"""
     
     tokens = TokenScanner.tokens
     
-    def __init__(self):
+    def __init__(self, engine='ply'):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown parser engine '{engine}'")
+        self.engine = engine
+        self.descender = None
         self.registry = VariableRegistry()
-        self.ir_instructions = []
-        self.tmp_counter = 0
-        self.lbl_counter = 0
         self.issues = []
         self.ast = []
-        
-    def gen_temp(self):
-        """Generate a temporary variable name"""
-        self.tmp_counter += 1
-        return f"temp{self.tmp_counter}"
-    
-    def gen_label(self):
-        """Generate a label for control flow"""
-        self.lbl_counter += 1
-        return f"Label{self.lbl_counter}"
-    
-    def add_instruction(self, operation, operand1=None, operand2=None, dest=None):
-        """
-        Add an instruction to the intermediate representation
-        
-        Args:
-            operation: Operation type (assign, add, jump, etc.)
-            operand1: First operand
-            operand2: Second operand
-            dest: Destination variable
-            
-        Returns:
-            dest: The destination variable
-        """
-        instr = {'op': operation, 'src1': operand1, 'src2': operand2, 'dst': dest}
-        self.ir_instructions.append(instr)
-        return dest
     
     # Grammar Productions
+    # Expressions are numbers, variable names or ('binop', operator, left,
+    # right); ir_generator.IRGenerator lowers the tree to IR
     def p_start(self, p):
         '''start : stmt_sequence'''
         p[0] = ('program', p[1])
@@ -52,7 +35,12 @@ class SyntaxProcessor:
     def p_stmt_sequence(self, p):
         '''stmt_sequence : stmt_sequence stmt
                         | stmt'''
-        p[0] = p[1] + [p[2]] if len(p) == 3 else [p[1]]
+        # Append in place: rebuilding the list on every reduction is O(N^2)
+        if len(p) == 3:
+            p[1].append(p[2])
+            p[0] = p[1]
+        else:
+            p[0] = [p[1]]
     
     def p_stmt(self, p):
         '''stmt : var_decl
@@ -79,7 +67,6 @@ class SyntaxProcessor:
             else:
                 val = p[4]
                 self.registry.add(name, dtype, val, context='declaration')
-                self.add_instruction('assign', val, None, name)
                 p[0] = ('decl_init', dtype, name, val)
     
     def p_data_type(self, p):
@@ -95,47 +82,23 @@ class SyntaxProcessor:
         if not self.registry.find(name):
             self.issues.append(f"Undefined variable '{name}'")
         
-        self.add_instruction('assign', val, None, name)
         p[0] = ('assign', name, val)
     
     def p_output_stmt(self, p):
         '''output_stmt : PRINT LPAREN expr RPAREN SEMICOLON'''
-        self.add_instruction('output', p[3], None, None)
         p[0] = ('output', p[3])
     
     def p_conditional(self, p):
         '''conditional : IF LPAREN comparison RPAREN code_block
                       | IF LPAREN comparison RPAREN code_block ELSE code_block'''
-        cmp = p[3]
-        lbl_true = self.gen_label()
-        lbl_false = self.gen_label()
-        lbl_end = self.gen_label()
-        
-        self.add_instruction('jump_if_false', cmp, lbl_false, None)
-        self.add_instruction('mark', lbl_true, None, None)
-        
         if len(p) == 6:
-            self.add_instruction('jump', lbl_end, None, None)
-            self.add_instruction('mark', lbl_false, None, None)
+            p[0] = ('if', p[3], p[5])
         else:
-            self.add_instruction('mark', lbl_false, None, None)
-            self.add_instruction('jump', lbl_end, None, None)
-        
-        self.add_instruction('mark', lbl_end, None, None)
-        p[0] = ('if', cmp, p[5])
+            p[0] = ('if', p[3], p[5], p[7])
     
     def p_loop(self, p):
         '''loop : WHILE LPAREN comparison RPAREN code_block'''
-        lbl_start = self.gen_label()
-        lbl_end = self.gen_label()
-        
-        self.add_instruction('mark', lbl_start, None, None)
-        cmp = p[3]
-        self.add_instruction('jump_if_false', cmp, lbl_end, None)
-        self.add_instruction('jump', lbl_start, None, None)
-        self.add_instruction('mark', lbl_end, None, None)
-        
-        p[0] = ('loop', cmp, p[5])
+        p[0] = ('loop', p[3], p[5])
     
     def p_code_block(self, p):
         '''code_block : block_start stmt_sequence block_end'''
@@ -156,9 +119,7 @@ class SyntaxProcessor:
     
     def p_comparison(self, p):
         '''comparison : expr rel_op expr'''
-        tmp = self.gen_temp()
-        self.add_instruction(p[2], p[1], p[3], tmp)
-        p[0] = tmp
+        p[0] = ('binop', p[2], p[1], p[3])
     
     def p_rel_op(self, p):
         '''rel_op : LESS
@@ -172,9 +133,7 @@ class SyntaxProcessor:
     def p_expr_add(self, p):
         '''expr : expr PLUS term
                | expr MINUS term'''
-        tmp = self.gen_temp()
-        self.add_instruction(p[2], p[1], p[3], tmp)
-        p[0] = tmp
+        p[0] = ('binop', p[2], p[1], p[3])
     
     def p_expr_term(self, p):
         '''expr : term'''
@@ -184,9 +143,7 @@ class SyntaxProcessor:
         '''term : term MULTIPLY base
                | term DIVIDE base
                | term MOD base'''
-        tmp = self.gen_temp()
-        self.add_instruction(p[2], p[1], p[3], tmp)
-        p[0] = tmp
+        p[0] = ('binop', p[2], p[1], p[3])
     
     def p_term_base(self, p):
         '''term : base'''
@@ -214,27 +171,288 @@ class SyntaxProcessor:
         else:
             self.issues.append("Unexpected end of input")
     
-    def initialize(self):
-        """Initialize the parser"""
-        self.processor = yacc.yacc(module=self)
+    def initialize(self, fast=False):
+        """
+        Initialize the parser
+
+        Args:
+            fast: Load prebuilt LALR tables from the table cache without
+                  revalidating the grammar, building them only when it changed
+        """
+        # The descent engine still needs PLY's tables: invalid programs are
+        # reparsed with them so syntax errors recover exactly as before
+        if self.engine == 'descent':
+            self.descender = DescentParser(self)
+        if not fast:
+            self.processor = yacc.yacc(module=self)
+            return
+
+        tab_dir = table_cache.table_dir('yacc', table_cache.grammar_hash(self, 'p_'))
+        parsetab = table_cache.load_table(tab_dir, TABLE_MODULE)
+        if parsetab is not None:
+            self.processor = yacc.yacc(module=self, optimize=True, debug=False, tabmodule=parsetab,
+                                       errorlog=yacc.NullLogger())
+        else:
+            self.processor = table_cache.build_table(
+                tab_dir, lambda out: yacc.yacc(module=self, optimize=True, debug=False,
+                                               tabmodule=TABLE_MODULE, outputdir=out,
+                                               errorlog=yacc.NullLogger()))
     
-    def process(self, code):
+    def process(self, code=None, tokenfunc=None, lexer=None):
         """
-        Parse source code and generate IR
+        Parse source code, checking declarations and uses
         
         Args:
-            code: Source code string
+            code: Source code string, lexed implicitly by PLY
+            tokenfunc: Token source from TokenScanner.feed; when given the
+                       already-scanned stream is parsed and code is ignored
+            lexer: The TokenScanner's scanner, handed to PLY with tokenfunc;
+                   without it PLY falls back to the last PLY lexer built,
+                   which a regex-engine-only process never builds
             
         Returns:
-            Abstract syntax tree
+            Abstract syntax tree; every tree completed, more than one when
+            error recovery restarted the parse, is also in self.ast
         """
-        self.ir_instructions = []
-        self.tmp_counter = 0
-        self.lbl_counter = 0
+        self.reset()
+        
+        if tokenfunc is None:
+            return self.processor.parse(code)
+        if self.descender is not None:
+            seen = []
+            try:
+                return self.descender.parse(tokenfunc, seen)
+            except DescentFailed:
+                # Start over on PLY, replaying the tokens already read
+                self.reset()
+                replay = iter(seen)
+                rest = tokenfunc
+                tokenfunc = lambda: next(replay, None) or rest()
+        return self.processor.parse(lexer=lexer, tokenfunc=tokenfunc)
+    
+    def reset(self):
+        """Forget the previous parse: issues, AST and scopes"""
         self.issues = []
         self.ast = []
         
         # Ensure symbol table is at global scope
         self.registry.clear()
-        
-        return self.processor.parse(code)
+
+
+class DescentFailed(Exception):
+    """Raised by DescentParser at the first syntax error"""
+
+
+class DescentParser:
+    """
+    Parser engine: hand-written recursive descent over SyntaxProcessor's
+    grammar, with Pratt binding powers for expressions
+
+    PLY runs every reduction through its generic LR loop and a p_* call
+    with a YaccProduction. Here statements are read by one loop that keeps
+    the open if, else, while and blocks on an explicit stack, and
+    expressions by a Pratt loop that keeps pending operators and open
+    parentheses on a list, so nesting is limited by memory rather than by
+    Python's recursion limit. Semantic actions run in the order PLY reduces
+    (operands before their operator, a block's statements before its if or
+    while), and statements go through the p_* methods themselves with a
+    plain list for p, so the AST, issues and symbols are the same. A
+    syntax error raises DescentFailed, and SyntaxProcessor.process reparses
+    with PLY, whose error recovery decides what an invalid program
+    produces.
+    """
+
+    # Binding power of each arithmetic operator; 0 marks an open parenthesis
+    BINDING = {'PLUS': 1, 'MINUS': 1, 'MULTIPLY': 2, 'DIVIDE': 2, 'MOD': 2}
+
+    # Comparisons bind loosest of all and do not chain
+    RELATIONS = frozenset(('LESS', 'LESS_EQ', 'GREATER', 'GREATER_EQ', 'EQUAL_TO', 'NOT_EQUAL'))
+
+    def __init__(self, owner):
+        # SyntaxProcessor whose actions, registry and AST the parse uses
+        self.owner = owner
+        self.source = None
+        self.seen = None
+        self.tok = None
+        self.kind = None
+
+    def advance(self):
+        """
+        Consume the lookahead token
+
+        Returns:
+            TokenRecord: The token consumed
+        """
+        tok = self.tok
+        self.tok = nxt = self.source()
+        if nxt is None:
+            self.kind = None
+        else:
+            self.seen.append(nxt)
+            self.kind = nxt.type
+        return tok
+
+    def expect(self, kind):
+        """Consume a token of the given type, or fail the parse"""
+        if self.kind != kind:
+            raise DescentFailed(kind)
+        return self.advance()
+
+    def parse(self, tokenfunc, seen):
+        """
+        Parse a token stream
+
+        Args:
+            tokenfunc: Returns the next token, or None at end of input
+            seen: List receiving every token read, for a PLY reparse
+
+        Returns:
+            ('program', statements), as PLY's parse returns it
+
+        Raises:
+            DescentFailed: At the first syntax error
+        """
+        owner = self.owner
+        self.source = tokenfunc
+        self.seen = seen
+        self.advance()
+        stmts = []
+        # Open constructs: (construct, payload, statements around it)
+        stack = []
+        while True:
+            kind = self.kind
+            if kind == 'RBRACE':
+                if not stack or not stmts:
+                    raise DescentFailed(kind)
+                self.advance()
+                owner.p_block_end([None, '}'])
+                block = ('block', stmts)
+                construct, payload, stmts = stack.pop()
+                if construct == 'if':
+                    if self.kind == 'ELSE':
+                        self.advance()
+                        self.open_block()
+                        stack.append(('else', (payload, block), stmts))
+                        stmts = []
+                        continue
+                    p = [None, 'if', '(', payload, ')', block]
+                    owner.p_conditional(p)
+                elif construct == 'else':
+                    p = [None, 'if', '(', payload[0], ')', payload[1], 'else', block]
+                    owner.p_conditional(p)
+                elif construct == 'while':
+                    p = [None, 'while', '(', payload, ')', block]
+                    owner.p_loop(p)
+                else:
+                    p = [block]
+                stmts.append(p[0])
+            elif kind == 'IDENTIFIER':
+                name = self.advance().value
+                self.expect('EQUALS')
+                p = [None, name, '=', self.expr()]
+                self.expect('SEMICOLON')
+                owner.p_var_assign(p)
+                stmts.append(p[0])
+            elif kind == 'INT' or kind == 'FLOAT':
+                p = [None, self.advance().value, self.expect('IDENTIFIER').value]
+                if self.kind == 'EQUALS':
+                    self.advance()
+                    p += ['=', self.expr()]
+                self.expect('SEMICOLON')
+                p.append(';')
+                owner.p_var_decl(p)
+                stmts.append(p[0])
+            elif kind == 'PRINT':
+                self.advance()
+                self.expect('LPAREN')
+                p = [None, 'print', '(', self.expr()]
+                self.expect('RPAREN')
+                self.expect('SEMICOLON')
+                owner.p_output_stmt(p)
+                stmts.append(p[0])
+            elif kind == 'IF' or kind == 'WHILE':
+                self.advance()
+                self.expect('LPAREN')
+                cmp = self.comparison()
+                self.expect('RPAREN')
+                self.open_block()
+                stack.append((kind.lower(), cmp, stmts))
+                stmts = []
+            elif kind == 'LBRACE':
+                self.open_block()
+                stack.append(('block', None, stmts))
+                stmts = []
+            elif kind is None and not stack and stmts:
+                break
+            else:
+                raise DescentFailed(kind)
+
+        program = ('program', stmts)
+        owner.ast.append(program)
+        return program
+
+    def open_block(self):
+        """Consume a block's opening brace and enter its scope"""
+        self.expect('LBRACE')
+        self.owner.p_block_start([None, '{'])
+
+    def comparison(self):
+        """
+        Read expr rel_op expr
+
+        Returns:
+            tuple: ('binop', operator, left, right)
+        """
+        left = self.expr()
+        if self.kind not in self.RELATIONS:
+            raise DescentFailed(self.kind)
+        symbol = self.advance().value
+        return ('binop', symbol, left, self.expr())
+
+    def expr(self):
+        """
+        Read an arithmetic expression, ending at the first token that
+        cannot continue it
+
+        Returns:
+            Expression tree, as the p_* actions build it
+        """
+        owner = self.owner
+        binding = self.BINDING
+        operands = []
+        # (binding power, operator symbol) not yet emitted
+        pending = []
+        depth = 0
+        while True:
+            while self.kind == 'LPAREN':
+                self.advance()
+                pending.append((0, None))
+                depth += 1
+            kind = self.kind
+            if kind == 'IDENTIFIER':
+                name = self.tok.value
+                if not owner.registry.find(name):
+                    owner.issues.append(f"Undefined variable '{name}'")
+            elif kind != 'INTEGER' and kind != 'DECIMAL':
+                raise DescentFailed(kind)
+            operands.append(self.advance().value)
+
+            power = binding.get(self.kind)
+            while power is None:
+                if not depth:
+                    self.reduce(operands, pending, 1)
+                    return operands[0]
+                self.expect('RPAREN')
+                self.reduce(operands, pending, 1)
+                pending.pop()
+                depth -= 1
+                power = binding.get(self.kind)
+            self.reduce(operands, pending, power)
+            pending.append((power, self.advance().value))
+
+    @staticmethod
+    def reduce(operands, pending, power):
+        """Apply the pending operators binding at least power, last first"""
+        while pending and pending[-1][0] >= power:
+            right = operands.pop()
+            operands[-1] = ('binop', pending.pop()[1], operands[-1], right)
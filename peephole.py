@@ -0,0 +1,496 @@
+"""Peephole optimization of the generated pseudo-assembly.
+
+The optimizer slides over the listing and, at each line, tries the rules of
+RULES registered for that line's mnemonic (or for labels). A rule looks at
+a short window starting there and either returns a replacement for it or
+declines. Passes repeat until a whole pass makes no rewrite. Rules that
+delete a register write first check, with a small liveness analysis over
+the assembly, that the value is never read.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+Insn = namedtuple('Insn', 'mnemonic operands')
+
+JUMP = 'JMP'
+LABEL = ':'  # RULES key for rules that start at a label
+# Conditional jump -> jump on the opposite condition
+INVERSE_JUMP = {'JZ': 'JNZ', 'JNZ': 'JZ', 'JE': 'JNE', 'JNE': 'JE',
+                'JL': 'JGE', 'JGE': 'JL', 'JG': 'JLE', 'JLE': 'JG'}
+# SETcc -> conditional jump taken when the SETcc would have stored 0
+SET_FALSE_JUMP = {'SETL': 'JGE', 'SETLE': 'JG', 'SETG': 'JLE', 'SETGE': 'JL',
+                  'SETE': 'JNE', 'SETNE': 'JE'}
+JUMPS = frozenset(INVERSE_JUMP) | {JUMP}
+FLAGS = 'FLAGS'
+# Return value and frame registers: their writes are never deleted
+PRESERVED = frozenset({'EAX', 'SP', 'BP'})
+MAX_PASSES = 8
+
+# Listings repeat the same few thousand lines, so parsing is memoized
+LINE_CACHE = 1 << 16
+
+
+@lru_cache(maxsize=LINE_CACHE)
+def parse_line(line):
+    """
+    Split an assembly line
+
+    Args:
+        line: One line of AssemblyTranslator output
+
+    Returns:
+        str for a label (its name), Insn for an instruction, None otherwise
+    """
+    if line.startswith('    '):
+        mnemonic, _, rest = line.strip().partition(' ')
+        operands = tuple(op.strip() for op in rest.split(',')) if rest else ()
+        return Insn(mnemonic, operands)
+    if line.endswith(':') and not line.startswith(';'):
+        return line[:-1]
+    return None
+
+
+def is_register(operand):
+    """Registers are bare upper-case names; immediates are numbers, memory is [..]"""
+    return operand.isalpha() and operand.isupper()
+
+
+def operand_registers(operand):
+    """Registers an operand reads: itself, or the base of a memory operand"""
+    if is_register(operand):
+        return {operand}
+    if operand.startswith('['):
+        return {''.join(ch for ch in operand if ch.isalpha())}
+    return set()
+
+
+def uses_defs(insn):
+    """
+    Registers an instruction reads and writes
+
+    Condition flags are tracked as the pseudo-register FLAGS.
+
+    Returns:
+        tuple: (uses, defs) sets
+    """
+    mnemonic, ops = insn
+    regs = set()
+    for op in ops:
+        regs |= operand_registers(op)
+    if mnemonic == 'MOV':
+        dst, src = ops
+        if is_register(dst):
+            return operand_registers(src), {dst}
+        return regs, set()
+    if mnemonic == 'CMP':
+        return regs, {FLAGS}
+    if mnemonic in SET_FALSE_JUMP:
+        return {FLAGS}, regs
+    if mnemonic in INVERSE_JUMP:
+        return {FLAGS}, set()
+    if mnemonic == 'CALL':
+        target = ops[0]
+        arg = target[len('print_'):] if target.startswith('print_') else ''
+        return ({arg} if is_register(arg) else set()), set()
+    if mnemonic == 'RET':
+        return {'EAX', 'SP'}, set()
+    if mnemonic in ('JMP', 'PUSH'):
+        return regs, set()
+    if mnemonic == 'POP':
+        return set(), regs
+    if len(ops) == 3 and is_register(ops[0]):
+        # Three-address arithmetic: dst, a, b
+        uses = set()
+        for op in ops[1:]:
+            uses |= operand_registers(op)
+        return uses, {ops[0], FLAGS}
+    if len(ops) == 2 and is_register(ops[0]):
+        # Two-address arithmetic such as SUB SP, 16
+        return regs, {ops[0], FLAGS}
+    return regs, set()
+
+
+REGISTER_BITS = {}
+
+
+def register_mask(regs):
+    """Bitmask of a set of register names (bits are numbered on first sight)"""
+    value = 0
+    for reg in regs:
+        bit = REGISTER_BITS.get(reg)
+        if bit is None:
+            bit = REGISTER_BITS[reg] = len(REGISTER_BITS)
+        value |= 1 << bit
+    return value
+
+
+def deletable_write(insn):
+    """
+    The register written by an instruction that can go if its result is dead
+
+    Returns:
+        str: A register or FLAGS, None when the instruction must stay
+    """
+    if insn.mnemonic == 'CMP':
+        return FLAGS
+    if insn.mnemonic == 'MOV' or insn.mnemonic in SET_FALSE_JUMP:
+        written = insn.operands[0]
+        if is_register(written) and written not in PRESERVED:
+            return written
+    return None
+
+
+@lru_cache(maxsize=LINE_CACHE)
+def line_effects(line):
+    """
+    Register masks of one line; (0, 0, False) for labels and directives
+
+    Returns:
+        tuple: (uses, defs, deletable) where deletable tells whether
+               dead_write removes the line when defs are dead
+    """
+    insn = parse_line(line)
+    if not isinstance(insn, Insn):
+        return 0, 0, False
+    uses, defs = uses_defs(insn)
+    return register_mask(uses), register_mask(defs), deletable_write(insn) is not None
+
+
+class AsmLiveness:
+    """Registers live after each assembly line, as bitmasks"""
+
+    def __init__(self, lines, parsed):
+        self.lines = lines
+        count = len(parsed)
+        starts = [0]
+        for idx, insn in enumerate(parsed):
+            if insn.__class__ is str:
+                if idx and starts[-1] != idx:
+                    starts.append(idx)
+            elif insn is not None and (insn.mnemonic in JUMPS or insn.mnemonic == 'RET') \
+                    and idx + 1 < count:
+                starts.append(idx + 1)
+        nblocks = len(starts)
+        ends = starts[1:] + [count]
+        self.block_start = starts
+        self.block_end = ends
+        self.block_of_line = block_of_line = [0] * count
+        block_of_label = {}
+        for b in range(nblocks):
+            for idx in range(starts[b], ends[b]):
+                block_of_line[idx] = b
+            idx = starts[b]
+            while idx < ends[b] and parsed[idx].__class__ is str:
+                block_of_label[parsed[idx]] = b
+                idx += 1
+
+        gen = []
+        kill = []
+        succs = []
+        for b in range(nblocks):
+            used = 0
+            defined = 0
+            last = None
+            for idx in range(ends[b] - 1, starts[b] - 1, -1):
+                u, d, _ = line_effects(lines[idx])
+                used = (used & ~d) | u
+                defined |= d
+                if last is None and isinstance(parsed[idx], Insn):
+                    last = parsed[idx]
+            gen.append(used)
+            kill.append(defined)
+            out = []
+            if last is not None and last.mnemonic == JUMP:
+                if last.operands[0] in block_of_label:
+                    out.append(block_of_label[last.operands[0]])
+            elif last is None or last.mnemonic != 'RET':
+                if b + 1 < nblocks:
+                    out.append(b + 1)
+                if last is not None and last.mnemonic in INVERSE_JUMP \
+                        and last.operands[0] in block_of_label:
+                    out.append(block_of_label[last.operands[0]])
+            succs.append(out)
+
+        # Blocks are mostly laid out forward, so a reverse sweep converges fast
+        live_in = [0] * nblocks
+        live_out = [0] * nblocks
+        changed = True
+        while changed:
+            changed = False
+            for b in range(nblocks - 1, -1, -1):
+                out = 0
+                for succ in succs[b]:
+                    out |= live_in[succ]
+                live_out[b] = out
+                new_in = gen[b] | (out & ~kill[b])
+                if new_in != live_in[b]:
+                    live_in[b] = new_in
+                    changed = True
+        self.live_out = live_out
+        self.block_lines = {}
+
+    def live_after(self, idx):
+        """Mask of the registers whose values may be read after line idx"""
+        b = self.block_of_line[idx]
+        start = self.block_start[b]
+        lines = self.block_lines.get(b)
+        if lines is None:
+            # One backward sweep per block, on first query. A deletable line
+            # whose result is dead reads nothing: dead_write removes it in
+            # the same pass, so chains of dead writes go at once
+            lines = [0] * (self.block_end[b] - start)
+            live = self.live_out[b]
+            for pos in range(self.block_end[b] - 1, start - 1, -1):
+                lines[pos - start] = live
+                u, d, deletable = line_effects(self.lines[pos])
+                if deletable and not live & d:
+                    continue
+                live = (live & ~d) | u
+            self.block_lines[b] = lines
+        return lines[idx - start]
+
+
+class PeepholeContext:
+    """Whole-listing facts rules consult, rebuilt at the start of each pass"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.parsed = parsed = [parse_line(line) for line in lines]
+        self.references = {}
+        self.exported = set()
+        # Label -> first instruction after it (skipping further labels)
+        self.after_label = {}
+        pending = []
+        for line, insn in zip(lines, parsed):
+            if insn.__class__ is str:
+                pending.append(insn)
+                continue
+            for label in pending:
+                self.after_label[label] = insn
+            pending = []
+            if insn is None:
+                if line.startswith('global '):
+                    self.exported.add(line.split()[1])
+            elif insn.mnemonic in JUMPS:
+                label = insn.operands[0]
+                self.references[label] = self.references.get(label, 0) + 1
+        self._liveness = None
+
+    def insn(self, idx):
+        """Instruction at idx, or None for labels, directives and the end"""
+        if idx < len(self.parsed):
+            insn = self.parsed[idx]
+            if insn.__class__ is Insn:
+                return insn
+        return None
+
+    def labels_following(self, idx):
+        """Labels on the lines directly after idx"""
+        found = set()
+        idx += 1
+        while idx < len(self.parsed) and self.parsed[idx].__class__ is str:
+            found.add(self.parsed[idx])
+            idx += 1
+        return found
+
+    def is_live_after(self, reg, idx):
+        """Whether reg's value may be read after line idx"""
+        if self._liveness is None:
+            self._liveness = AsmLiveness(self.lines, self.parsed)
+        bit = REGISTER_BITS.get(reg)
+        return bit is not None and bool(self._liveness.live_after(idx) >> bit & 1)
+
+    def final_target(self, label):
+        """Follow labels whose first instruction is an unconditional jump"""
+        seen = {label}
+        while True:
+            insn = self.after_label.get(label)
+            if insn is None or insn.mnemonic != JUMP:
+                return label
+            nxt = insn.operands[0]
+            if nxt in seen:
+                return label
+            seen.add(nxt)
+            label = nxt
+
+
+# Each rule: (ctx, idx) -> (lines consumed, replacement lines) or None
+
+def unreachable(ctx, idx):
+    """Instructions after an unconditional JMP or RET and before the next label"""
+    end = idx + 1
+    while ctx.insn(end) is not None:
+        end += 1
+    if end > idx + 1:
+        return end - idx, [ctx.lines[idx]]
+    return None
+
+
+def jump_to_next(ctx, idx):
+    """JMP/Jcc L directly followed by L:"""
+    if ctx.parsed[idx].operands[0] in ctx.labels_following(idx):
+        return 1, []
+    return None
+
+
+def self_move(ctx, idx):
+    """MOV r, r"""
+    dst, src = ctx.parsed[idx].operands
+    if dst == src:
+        return 1, []
+    return None
+
+
+def compare_branch(ctx, idx):
+    """SETcc r; CMP r, 0; JZ L  ->  SETcc r; J!cc L (the flags still hold)"""
+    setcc = ctx.parsed[idx]
+    cmp = ctx.insn(idx + 1)
+    jz = ctx.insn(idx + 2)
+    if (cmp is not None and jz is not None and cmp.mnemonic == 'CMP'
+            and cmp.operands == (setcc.operands[0], '0') and jz.mnemonic == 'JZ'):
+        return 3, [ctx.lines[idx], f"    {SET_FALSE_JUMP[setcc.mnemonic]} {jz.operands[0]}"]
+    return None
+
+
+def branch_over_jump(ctx, idx):
+    """Jcc L; JMP M; L:  ->  J!cc M; L:"""
+    jcc = ctx.parsed[idx]
+    jmp = ctx.insn(idx + 1)
+    if jmp is not None and jmp.mnemonic == JUMP and jcc.operands[0] in ctx.labels_following(idx + 1):
+        return 2, [f"    {INVERSE_JUMP[jcc.mnemonic]} {jmp.operands[0]}"]
+    return None
+
+
+def thread_jump(ctx, idx):
+    """Jump to a label whose first instruction is JMP M: jump to M directly"""
+    insn = ctx.parsed[idx]
+    target = ctx.final_target(insn.operands[0])
+    if target != insn.operands[0]:
+        return 1, [f"    {insn.mnemonic} {target}"]
+    return None
+
+
+def reload_after_store(ctx, idx):
+    """MOV [m], r; MOV r2, [m]  ->  MOV [m], r; MOV r2, r"""
+    mem, src = ctx.parsed[idx].operands
+    load = ctx.insn(idx + 1)
+    if (load is not None and load.mnemonic == 'MOV' and mem.startswith('[')
+            and load.operands[1] == mem and is_register(src)):
+        dst = load.operands[0]
+        return 2, [ctx.lines[idx]] + ([] if dst == src else [f"    MOV {dst}, {src}"])
+    return None
+
+
+def dead_write(ctx, idx):
+    """MOV r, x, SETcc r or CMP whose results are never read"""
+    written = deletable_write(ctx.parsed[idx])
+    if written is not None and not ctx.is_live_after(written, idx):
+        return 1, []
+    return None
+
+
+def unused_label(ctx, idx):
+    """A label no jump refers to"""
+    label = ctx.parsed[idx]
+    if label not in ctx.references and label not in ctx.exported:
+        return 1, []
+    return None
+
+
+# (name, mnemonics the window starts with, rule), tried in this order
+RULES = [
+    ('unreachable', {JUMP, 'RET'}, unreachable),
+    ('jump-to-next', JUMPS, jump_to_next),
+    ('self-move', {'MOV'}, self_move),
+    ('compare-branch', set(SET_FALSE_JUMP), compare_branch),
+    ('branch-over-jump', set(INVERSE_JUMP), branch_over_jump),
+    ('thread-jump', JUMPS, thread_jump),
+    ('reload-after-store', {'MOV'}, reload_after_store),
+    ('dead-write', {'MOV', 'CMP'} | set(SET_FALSE_JUMP), dead_write),
+    ('unused-label', {LABEL}, unused_label),
+]
+
+
+class PeepholeOptimizer:
+    """Applies RULES to an assembly listing until nothing changes"""
+
+    def __init__(self, rules=RULES):
+        self.stats = {name: 0 for name, _, _ in rules}
+        self.dispatch = {}
+        for name, starts, rule in rules:
+            for key in starts:
+                self.dispatch.setdefault(key, []).append((name, rule))
+
+    def optimize(self, asm):
+        """
+        Optimize an assembly listing
+
+        Args:
+            asm: List of lines from AssemblyTranslator.translate
+
+        Returns:
+            list: Optimized lines
+        """
+        lines = list(asm)
+        for _ in range(MAX_PASSES):
+            lines, hits = self.run_pass(lines)
+            if not hits:
+                break
+        return lines
+
+    def run_pass(self, lines):
+        """
+        One left-to-right sweep
+
+        Returns:
+            tuple: (new lines, number of rewrites)
+        """
+        ctx = PeepholeContext(lines)
+        parsed = ctx.parsed
+        dispatch = self.dispatch
+        no_rules = ()
+        out = []
+        hits = 0
+        idx = 0
+        count = len(lines)
+        while idx < count:
+            insn = parsed[idx]
+            if insn is None:
+                candidates = no_rules
+            elif insn.__class__ is str:
+                candidates = dispatch.get(LABEL, no_rules)
+            else:
+                candidates = dispatch.get(insn.mnemonic, no_rules)
+            for name, rule in candidates:
+                match = rule(ctx, idx)
+                if match is not None:
+                    consumed, replacement = match
+                    out.extend(replacement)
+                    idx += consumed
+                    self.stats[name] += 1
+                    hits += 1
+                    break
+            else:
+                out.append(lines[idx])
+                idx += 1
+        return out, hits
+
+    def report(self):
+        """Per-rule hit counts as text lines"""
+        return format_hits(self.stats)
+
+
+def format_hits(stats):
+    """
+    Per-rule hit counts as text
+
+    Args:
+        stats: rule name -> hits
+
+    Returns:
+        list: Header line plus one line per rule
+    """
+    lines = [f"{'Peephole rule':<20} {'Hits':>6}"]
+    for name, hits in stats.items():
+        lines.append(f"{name:<20} {hits:>6}")
+    return lines
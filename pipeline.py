@@ -0,0 +1,213 @@
+from compile_cache import cache_key
+from ir_generator import IRGenerator
+from lexer import TokenScanner
+from parser import SyntaxProcessor
+from code_generator import AssemblyTranslator
+from optimizer import PassManager
+from peephole import PeepholeOptimizer
+from profiler import untimed
+from python_generator import PythonTranslator
+from x86_generator import X86Translator
+
+# Tokens between cancellation checks and progress reports
+WATCH_INTERVAL = 2048
+
+# Code generation targets: name -> translator class
+TARGETS = {'asm': AssemblyTranslator, 'python': PythonTranslator, 'x86': X86Translator}
+
+
+class CompilationCancelled(Exception):
+    """Raised inside CompilerPipeline.compile when its cancel event is set"""
+
+
+def _watch(records, phase, total, position, cancel, progress):
+    """
+    Pass records through, periodically checking cancel and reporting progress
+
+    Args:
+        records: Iterable being consumed by a compiler phase
+        phase: Phase name given to progress
+        total: Value of position at completion
+        position: Callable (index, record) -> progress so far
+        cancel: Event-like object with is_set(), or None
+        progress: Callable (phase, fraction), or None
+    """
+    for idx, rec in enumerate(records):
+        if not idx % WATCH_INTERVAL:
+            if cancel is not None and cancel.is_set():
+                raise CompilationCancelled(phase)
+            if progress is not None:
+                progress(phase, position(idx, rec) / total if total else 1.0)
+        yield rec
+
+
+class CompilationResult:
+    """Outputs of one run through the compilation pipeline"""
+
+    def __init__(self, tokens, lex_issues, ast, symbols, ir_code, asm, parse_issues,
+                 opt_stats=None, codegen_stats=None, peephole_stats=None, codegen_issues=None):
+        self.tokens = tokens
+        self.lex_issues = lex_issues
+        self.ast = ast
+        self.symbols = symbols
+        self.ir_code = ir_code
+        self.asm = asm
+        self.parse_issues = parse_issues
+        self.opt_stats = opt_stats or {}
+        self.codegen_stats = codegen_stats or {}
+        self.peephole_stats = peephole_stats or {}
+        self.codegen_issues = codegen_issues or []
+        # Set when the result was loaded from a CompileCache
+        self.cached = False
+        # PhaseProfiler.report of the compile, when the pipeline has a profiler
+        self.profile = None
+
+    @property
+    def issues(self):
+        """All lexical, syntax, semantic and code generation issues in reporting order"""
+        return self.lex_issues + self.parse_issues + self.codegen_issues
+
+
+class CompilerPipeline:
+    """Owns one warm scanner/processor/translator set and runs source through it"""
+
+    def __init__(self, opt_level=0, target='asm', cache=None, profiler=None, lexer='ply',
+                 parser='ply'):
+        # lexer, parser: TokenScanner and SyntaxProcessor engines; each pair
+        # produces the same results
+        self.scanner = TokenScanner(lexer)
+        self.processor = SyntaxProcessor(parser)
+        self.generator = IRGenerator()
+        self.translator = TARGETS[target]()
+        self.target = target
+        self.opt_level = opt_level
+        # compile_cache.CompileCache shared by every compile, or None
+        self.cache = cache
+        # profiler.PhaseProfiler recording every compile, or None
+        self.profiler = profiler
+
+    def initialize(self, fast=True):
+        """
+        Build the lexer and parser tables
+
+        Args:
+            fast: Use the cached optimized PLY tables (see table_cache)
+        """
+        self.scanner.initialize(fast=fast)
+        self.processor.initialize(fast=fast)
+
+    def compile(self, src, cancel=None, progress=None):
+        """
+        Run lexical analysis, parsing and code generation over a source
+
+        With a cache, a source compiled before under the same compiler
+        version, opt_level and target skips every phase.
+
+        Args:
+            src: Source code string
+            cancel: Optional event; once set, compilation stops with
+                    CompilationCancelled at the next check
+            progress: Optional callable (phase, fraction) for 'lex', 'parse'
+                      and 'codegen'
+
+        Returns:
+            CompilationResult: Tokens, symbols, IR and target code (in
+                               asm; both optimized when opt_level > 0)
+                               and issues
+        """
+        profiler = self.profiler
+        if profiler is None:
+            return self.cached_compile(src, cancel, progress, untimed)
+        profiler.reset()
+        try:
+            result = self.cached_compile(src, cancel, progress, profiler.phase)
+        finally:
+            report = profiler.report()
+        result.profile = report
+        return result
+
+    def cached_compile(self, src, cancel, progress, phase):
+        """compile() body; phase is PhaseProfiler.phase or profiler.untimed"""
+        if self.cache is None:
+            return self.run_phases(src, cancel, progress, phase)
+        with phase('cache') as rec:
+            key = cache_key(src, self.opt_level, self.target)
+            fields = self.cache.get(key)
+            if rec is not None:
+                rec['counts']['hits' if fields is not None else 'misses'] = 1
+        if fields is not None:
+            if progress is not None:
+                progress('codegen', 1.0)
+            result = CompilationResult(**fields)
+            result.cached = True
+            return result
+        result = self.run_phases(src, cancel, progress, phase)
+        with phase('cache'):
+            fields = dict(vars(result))
+            del fields['cached'], fields['profile']
+            self.cache.put(key, fields)
+        return result
+
+    def run_phases(self, src, cancel=None, progress=None, phase=untimed):
+        """Compile without consulting the cache; arguments as for compile"""
+        profiler = self.profiler
+        with phase('lex'):
+            if cancel is None and progress is None:
+                tokens, lex_errs = self.scanner.scan(src)
+                feed = tokens
+            else:
+                tokens = list(_watch(self.scanner.stream(src), 'lex', len(src),
+                                     lambda idx, tok: tok.lexpos, cancel, progress))
+                lex_errs = self.scanner.issues
+                feed = _watch(tokens, 'parse', len(tokens), lambda idx, tok: idx, cancel,
+                              progress)
+
+        with phase('parse'):
+            if profiler is None:
+                ast = self.processor.process(tokenfunc=self.scanner.feed(feed),
+                                             lexer=self.scanner.scanner)
+            else:
+                with profiler.instrument_parser(self.processor):
+                    ast = self.processor.process(tokenfunc=self.scanner.feed(feed),
+                                                 lexer=self.scanner.scanner)
+        with phase('ir'):
+            ir_code = self.generator.generate(self.processor.ast)
+        opt_stats = None
+        if self.opt_level:
+            with phase('optimize'):
+                optimizer = PassManager(self.opt_level)
+                ir_code = optimizer.optimize(ir_code)
+                opt_stats = optimizer.stats
+
+        if cancel is not None and cancel.is_set():
+            raise CompilationCancelled('codegen')
+        if progress is not None:
+            progress('codegen', 0.0)
+        codegen_issues = []
+        with phase('codegen'):
+            try:
+                asm = self.translator.translate(ir_code)
+            except ValueError as err:
+                # The target cannot represent something the language allows
+                asm = []
+                codegen_issues.append(f"Code generation error: {err}")
+            peephole_stats = None
+            if self.opt_level and self.target == 'asm':
+                peephole = PeepholeOptimizer()
+                asm = peephole.optimize(asm)
+                peephole_stats = peephole.stats
+
+        symbols = self.processor.registry.all_entries()
+        if profiler is not None:
+            profiler.count('lex', 'tokens', len(tokens))
+            profiler.count('lex', 'issues', len(lex_errs))
+            profiler.count('parse', 'issues', len(self.processor.issues))
+            profiler.count('semantic', 'symbols', len(symbols))
+            profiler.count('ir', 'ir_ops', len(self.generator.ir_instructions))
+            if self.opt_level:
+                profiler.count('optimize', 'ir_ops', len(ir_code))
+            profiler.count('codegen', 'asm_lines', len(asm))
+
+        return CompilationResult(tokens, lex_errs, ast, symbols,
+                                 ir_code, asm, self.processor.issues, opt_stats,
+                                 dict(self.translator.stats), peephole_stats, codegen_issues)
@@ -0,0 +1,222 @@
+"""Per-phase instrumentation of the compiler pipeline.
+
+A PhaseProfiler given to CompilerPipeline records, for every compile, the
+wall time, allocations (with tracemalloc, when trace_memory is set) and
+counts of each phase:
+
+    cache     compilation cache lookup and store
+    lex       tokens, lexical issues
+    parse     LALR reductions
+    semantic  declarations, lookups, scopes and symbols of VariableRegistry
+    ir        three-address instructions generated from the AST
+    optimize  IR passes (opt_level > 0)
+    codegen   target code generation, plus the peephole pass at -O1/-O2
+
+Semantic analysis runs inside the parser's actions, so its time comes
+from wrappers around VariableRegistry and is subtracted from parse; its
+allocations stay in parse. The wrappers are installed only while a
+profiled compile runs: a pipeline without a profiler runs no extra code
+beyond one no-op context manager per phase.
+"""
+import contextlib
+import time
+import tracemalloc
+
+PHASES = ('cache', 'lex', 'parse', 'semantic', 'ir', 'optimize', 'codegen')
+
+# Timed by wrappers inside parse; their allocations are counted there
+NESTED_PHASES = ('semantic',)
+
+# VariableRegistry methods timed as semantic analysis, with the count each adds to
+SEMANTIC_METHODS = {'add': 'declarations', 'find': 'lookups', 'push_scope': 'scopes',
+                    'pop_scope': None, 'is_declared_in_current_scope': 'lookups'}
+
+# Shared by every unprofiled phase
+UNTIMED = contextlib.nullcontext()
+
+
+def untimed(name):
+    """Stand-in for PhaseProfiler.phase when profiling is off"""
+    return UNTIMED
+
+
+class PhaseProfiler:
+    """Wall time, allocations and counts of each compiler phase"""
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = {}
+        self.started_tracing = False
+
+    def record(self, name):
+        """Accumulator of one phase, created on first use"""
+        found = self.phases.get(name)
+        if found is None:
+            found = self.phases[name] = {'seconds': 0.0, 'alloc_bytes': 0, 'peak_bytes': 0,
+                                         'counts': {}}
+        return found
+
+    def reset(self):
+        """Forget the previous compile and start tracing allocations if asked to"""
+        self.phases = {}
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed code as part of a phase
+
+        Args:
+            name: One of PHASES
+        """
+        rec = self.record(name)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec['seconds'] += time.perf_counter() - start
+            # Another pipeline's profiler may have stopped tracing meanwhile
+            if tracing and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                rec['alloc_bytes'] += current - before
+                rec['peak_bytes'] = max(rec['peak_bytes'], peak - before)
+
+    def count(self, name, key, amount=1):
+        """Add to one of a phase's counters"""
+        counts = self.record(name)['counts']
+        counts[key] = counts.get(key, 0) + amount
+
+    def timed(self, name, fn, key=None):
+        """
+        Wrap a callable so its time and calls are charged to a phase
+
+        Args:
+            name: Phase the time goes to
+            fn: Callable to wrap
+            key: Counter incremented per call, or None
+
+        Returns:
+            function: The wrapper
+        """
+        rec = self.record(name)
+        counts = rec['counts']
+        clock = time.perf_counter
+        if key is not None:
+            counts.setdefault(key, 0)
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                rec['seconds'] += clock() - start
+                if key is not None:
+                    counts[key] += 1
+        return wrapper
+
+    @contextlib.contextmanager
+    def instrument_parser(self, processor):
+        """
+        Count reductions and time semantic analysis
+
+        Only PLY reduces through the productions: the descent engine's
+        count is that of the sources it hands back to PLY.
+
+        Args:
+            processor: Initialized SyntaxProcessor; its parse actions and
+                       registry are wrapped until the block exits
+        """
+        registry = processor.registry
+        productions = processor.processor.productions
+        originals = [prod.callable for prod in productions]
+        counts = self.record('parse')['counts']
+        counts.setdefault('reductions', 0)
+
+        def counting(action):
+            def reduce(p):
+                counts['reductions'] += 1
+                return action(p)
+            return reduce
+
+        for prod in productions:
+            if prod.callable is not None:
+                prod.callable = counting(prod.callable)
+        for method, key in SEMANTIC_METHODS.items():
+            setattr(registry, method, self.timed('semantic', getattr(registry, method), key))
+        try:
+            yield
+        finally:
+            for prod, action in zip(productions, originals):
+                prod.callable = action
+            for method in SEMANTIC_METHODS:
+                delattr(registry, method)
+
+    def report(self):
+        """
+        Finish the compile and summarize it
+
+        Returns:
+            dict: {'phases': {name: {'seconds', 'alloc_bytes', 'peak_bytes',
+                   'counts'}}, 'total_seconds', 'trace_memory'}, phases in
+                   PHASES order; times are exclusive
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        phases = {name: self.phases[name] for name in PHASES if name in self.phases}
+        if 'parse' in phases:
+            nested = sum(phases[name]['seconds'] for name in NESTED_PHASES if name in phases)
+            phases['parse']['seconds'] = max(0.0, phases['parse']['seconds'] - nested)
+        return {'phases': phases,
+                'total_seconds': sum(rec['seconds'] for rec in phases.values()),
+                'trace_memory': self.trace_memory}
+
+
+def merge_profiles(total, report):
+    """
+    Add one compile's report into a running total
+
+    Args:
+        total: dict in report form, updated in place (may start empty)
+        report: PhaseProfiler.report output
+    """
+    phases = total.setdefault('phases', {})
+    for name, rec in report['phases'].items():
+        into = phases.setdefault(name, {'seconds': 0.0, 'alloc_bytes': 0, 'peak_bytes': 0,
+                                        'counts': {}})
+        into['seconds'] += rec['seconds']
+        into['alloc_bytes'] += rec['alloc_bytes']
+        into['peak_bytes'] = max(into['peak_bytes'], rec['peak_bytes'])
+        for key, value in rec['counts'].items():
+            into['counts'][key] = into['counts'].get(key, 0) + value
+    total['phases'] = {name: phases[name] for name in PHASES if name in phases}
+    total['total_seconds'] = total.get('total_seconds', 0.0) + report['total_seconds']
+    total['trace_memory'] = report['trace_memory']
+
+
+def format_profile(report):
+    """
+    Render a report as a table, one row per phase
+
+    Returns:
+        list: Lines
+    """
+    total = report['total_seconds'] or 1.0
+    lines = [f"{'phase':<10} {'ms':>10} {'share':>7} {'alloc KiB':>10} {'peak KiB':>10}  counts",
+             "-" * 80]
+    for name, rec in report['phases'].items():
+        counts = ", ".join(f"{key} {value}" for key, value in rec['counts'].items())
+        if report['trace_memory'] and name not in NESTED_PHASES:
+            memory = f"{rec['alloc_bytes'] / 1024:>10.1f} {rec['peak_bytes'] / 1024:>10.1f}"
+        else:
+            memory = f"{'-':>10} {'-':>10}"
+        lines.append(f"{name:<10} {rec['seconds'] * 1000:>10.2f} {rec['seconds'] / total:>7.1%} "
+                     f"{memory}  {counts}")
+    lines.append(f"{'total':<10} {report['total_seconds'] * 1000:>10.2f}")
+    return lines
@@ -0,0 +1,499 @@
+"""Python code generation target.
+
+PythonTranslator lowers a whole IR program to the source of one Python
+function. Names become locals, loops become `for` statements and
+jump_if_false becomes `if`/`else`, so CPython runs the program at its own
+speed instead of dispatching per IR instruction.
+
+Structure is recovered from the control-flow graph: a back edge (to a
+block dominating its source) marks a loop header, the blocks that reach it
+form the loop body, and the merge point of a conditional branch is the
+immediate post-dominator of its block. Inside a loop, reaching the header
+is `continue` and reaching the loop's single exit is `break`. Anything the
+source language cannot produce (irreducible flow, a loop left for two
+different places, deep nesting CPython rejects) falls back to one
+loop dispatching on a block number, which is slower but handles every
+graph.
+
+Every loop is `for _ in _ticks:` over one shared itertools.repeat of the
+step budget, the analogue of the IR executor's max_steps: an iteration
+costs a single C-level FOR_ITER, and a loop whose ticks run out reaches
+its `else:` clause, which stops the program.
+"""
+from functools import lru_cache
+from itertools import repeat
+from operator import length_hint
+
+from cfg import ControlFlowGraph, depth_first_postorder, immediate_dominators
+from executor import MAX_STEPS, ExecutionError, ExecutionResult, StepLimitExceeded
+from ir import (ASSIGN, ADD, SUB, MUL, DIV, MOD, LT, LE, GT, GE, EQ, NE, MARK, JUMP, JUMP_IF_FALSE,
+                OUTPUT, COMPARISON, divide, modulo, read_names)
+
+
+FUNCTION = '_program'
+PARAMETERS = ('_out', '_div', '_mod', '_exhausted', '_ticks')
+INDENT = '    '
+
+# Compiled functions kept, keyed by generated source
+CODE_CACHE_SIZE = 32
+
+# Structured output emitting more than this many blocks per CFG block
+# (branches that never merge are emitted once per path) is abandoned
+MAX_DUPLICATION = 4
+
+
+class Unstructured(Exception):
+    """The CFG has no if/while form; PythonTranslator falls back to dispatch"""
+
+
+class Loop:
+    """A natural loop: header block, body block set and single exit (or None)"""
+
+    __slots__ = ('header', 'body', 'exit')
+
+    def __init__(self, header, body, exit_block):
+        self.header = header
+        self.body = body
+        self.exit = exit_block
+
+
+class PythonTranslator:
+    """Converts IR to the source of a Python function"""
+
+    TESTS = {LT: '{} < {}', LE: '{} <= {}', GT: '{} > {}', GE: '{} >= {}',
+             EQ: '{} == {}', NE: '{} != {}'}
+    EXPRESSIONS = {
+        ADD: '{} + {}', SUB: '{} - {}', MUL: '{} * {}',
+        DIV: '_div({}, {})', MOD: '_mod({}, {})',
+        **{op: f"1 if {test} else 0" for op, test in TESTS.items()},
+    }
+
+    def __init__(self):
+        self.py_output = []
+        self.names = {}
+        self.stats = {}
+
+    def translate(self, ir_code):
+        """
+        Convert IR to Python source
+
+        Args:
+            ir_code: List of Instr
+
+        Returns:
+            list: Source lines of a function taking PARAMETERS and returning
+                  locals() when the program ends
+        """
+        self.names = {}
+        self.stats = {'blocks': 0, 'loops': 0, 'structured': True}
+        self.ir_code = ir_code
+        self.cfg = ControlFlowGraph(ir_code)
+        self.end = len(self.cfg.blocks)
+        self.succs = [self.successors(block) for block in self.cfg.blocks]
+        self.stats['blocks'] = self.end
+        self.fused = self.fusible_tests()
+
+        try:
+            body = self.structured()
+        except (Unstructured, RecursionError):
+            body = self.dispatch()
+            self.stats['structured'] = False
+        self.py_output = self.prologue() + body
+        return self.py_output
+
+    def name(self, var):
+        """Python local standing for an IR name"""
+        found = self.names.get(var)
+        if found is None:
+            found = f"v_{var}" if var.isidentifier() else f"v{len(self.names)}"
+            self.names[var] = found
+        return found
+
+    def value(self, operand):
+        """Python expression for an IR operand"""
+        if isinstance(operand, str):
+            return self.name(operand)
+        text = repr(operand)
+        return text if text[-1].isdigit() else f"float('{text}')"
+
+    def successors(self, block):
+        """
+        Successors with falling off the end of the program as self.end
+
+        Returns:
+            list: [next] or, for jump_if_false, [taken-when-true, taken-when-false]
+        """
+        last = self.ir_code[block.end - 1]
+        fallthrough = block.index + 1
+        if last.op is JUMP:
+            return [self.label_block(last.src1)]
+        if last.op is JUMP_IF_FALSE:
+            target = self.label_block(last.src2)
+            return [fallthrough] if target == fallthrough else [fallthrough, target]
+        return [fallthrough]
+
+    def label_block(self, label):
+        if label not in self.cfg.block_of_label:
+            raise ValueError(f"Jump to undefined label {label!r}")
+        return self.cfg.block_of_label[label]
+
+    def fusible_tests(self):
+        """
+        Comparisons to test directly in the branch after them
+
+        A comparison whose result is read only by the jump_if_false right
+        after it needs no 0/1 temporary: `if a < b:` replaces
+        `t = 1 if a < b else 0` followed by `if t:`.
+
+        Returns:
+            set: Indices of such comparisons
+        """
+        code = self.ir_code
+        reads = {}
+        for instr in code:
+            for name in read_names(instr):
+                reads[name] = reads.get(name, 0) + 1
+        fused = set()
+        for idx in range(1, len(code)):
+            instr = code[idx]
+            test = code[idx - 1]
+            if (instr.op is JUMP_IF_FALSE and test.op in COMPARISON
+                    and instr.src1 == test.dst and reads[test.dst] == 1):
+                fused.add(idx - 1)
+        return fused
+
+    def condition(self, block):
+        """Python test for the jump_if_false ending a block"""
+        if block.end - 2 in self.fused:
+            test = self.ir_code[block.end - 2]
+            return self.TESTS[test.op].format(self.value(test.src1), self.value(test.src2))
+        return self.value(self.ir_code[block.end - 1].src1)
+
+    def binary(self, instr):
+        """Python expression for a binary instruction"""
+        op = instr.op
+        a = self.value(instr.src1)
+        divisor = instr.src2
+        if not isinstance(instr.src1, str) or isinstance(divisor, str) or not divisor:
+            return self.EXPRESSIONS[op].format(a, self.value(divisor))
+        # A name by a non-zero constant: C's truncating semantics inline (a
+        # float -0.0 dividend leaves a remainder of 0.0 rather than -0.0)
+        if op is MOD:
+            k = self.value(abs(divisor))
+            return f"{a} % {k} if {a} >= 0 else -(-{a} % {k})"
+        if op is DIV and type(divisor) is int and divisor > 0:
+            k = self.value(divisor)
+            return (f"({a} // {k} if {a} >= 0 else -(-{a} // {k})) "
+                    f"if {a}.__class__ is int else {a} / {k}")
+        return self.EXPRESSIONS[op].format(a, self.value(divisor))
+
+    def statements(self, block):
+        """Python statements for a block, leaving out its labels and final jump"""
+        lines = []
+        fused = self.fused
+        for idx in range(block.start, block.end):
+            instr = self.ir_code[idx]
+            op = instr.op
+            if idx in fused:
+                continue
+            if op is ASSIGN:
+                lines.append(f"{self.name(instr.dst)} = {self.value(instr.src1)}")
+            elif op is OUTPUT:
+                lines.append(f"_out({self.value(instr.src1)})")
+            elif op is MARK or op is JUMP or op is JUMP_IF_FALSE:
+                continue
+            else:
+                lines.append(f"{self.name(instr.dst)} = {self.binary(instr)}")
+        return lines
+
+    def prologue(self):
+        """Function header and zero-initialisation of every name"""
+        lines = [f"def {FUNCTION}({', '.join(PARAMETERS)}):"]
+        for local in self.names.values():
+            lines.append(f"{INDENT}{local} = 0")
+        return lines
+
+    @staticmethod
+    def out_of_ticks(indent):
+        """else: clause of a loop, run only when the step budget is spent"""
+        return [f"{indent}else:", f"{indent}{INDENT}_exhausted()"]
+
+    # Structured lowering
+
+    def structured(self):
+        """
+        Lower to nested if/while statements
+
+        Raises:
+            Unstructured: When the CFG is irreducible or a loop has two exits
+        """
+        count = self.end
+        succs = self.succs + [[]]
+        preds = [[] for _ in range(count + 1)]
+        for block, targets in enumerate(self.succs):
+            for target in targets:
+                preds[target].append(block)
+        self.idom = immediate_dominators(0, succs, preds) if count else []
+        # Post-dominators: the same on reversed edges, from the end
+        self.ipdom = immediate_dominators(count, preds, succs)
+        self.loops = self.find_loops(succs, preds)
+        self.stats['loops'] = len(self.loops)
+        self.emitted = 0
+        lines = []
+        if count:
+            self.sequence(lines, 0, None, None, INDENT)
+        else:
+            lines.append(f"{INDENT}return locals()")
+        return lines
+
+    def dominates(self, a, b):
+        """Whether block a dominates block b"""
+        while b != a:
+            parent = self.idom[b]
+            if parent == b or parent is None:
+                return False
+            b = parent
+        return True
+
+    def find_loops(self, succs, preds):
+        """
+        Natural loops by header
+
+        Returns:
+            dict: header block -> Loop
+        """
+        order = depth_first_postorder(0, succs)
+        order.reverse()
+        position = {block: idx for idx, block in enumerate(order)}
+        latches = {}
+        for block in order:
+            for succ in succs[block]:
+                if position[succ] > position[block]:
+                    continue
+                if not self.dominates(succ, block):
+                    raise Unstructured(f"irreducible edge B{block} -> B{succ}")
+                latches.setdefault(succ, []).append(block)
+
+        loops = {}
+        for header, sources in latches.items():
+            body = {header}
+            stack = [latch for latch in sources if latch != header]
+            body.update(stack)
+            while stack:
+                for pred in preds[stack.pop()]:
+                    if pred not in body:
+                        body.add(pred)
+                        stack.append(pred)
+            exits = {succ for block in body for succ in succs[block] if succ not in body}
+            if len(exits) > 1:
+                raise Unstructured(f"loop at B{header} has {len(exits)} exits")
+            loops[header] = Loop(header, body, exits.pop() if exits else None)
+        return loops
+
+    def sequence(self, lines, block, stop, loop, indent):
+        """
+        Emit the code reached from block until stop
+
+        Args:
+            lines: Output list
+            block: First block, self.end for the end of the program, or
+                   None when control never gets here
+            stop: Block where an enclosing construct continues, or None
+            loop: Innermost enclosing Loop, or None
+            indent: Indentation of the emitted statements
+        """
+        while block is not None and block != stop:
+            if loop is not None:
+                if block == loop.header:
+                    lines.append(f"{indent}continue")
+                    return
+                if block == loop.exit:
+                    lines.append(f"{indent}break")
+                    return
+                if block not in loop.body:
+                    raise Unstructured(f"B{block} leaves the loop at B{loop.header}")
+            if block == self.end:
+                lines.append(f"{indent}return locals()")
+                return
+            self.emitted += 1
+            if self.emitted > MAX_DUPLICATION * self.end:
+                raise Unstructured("branches do not merge")
+            inner = self.loops.get(block)
+            if inner is not None:
+                self.emit_loop(lines, inner, indent)
+                block = inner.exit
+            else:
+                block = self.emit_block(lines, block, loop, indent)
+
+    def emit_block(self, lines, block, loop, indent):
+        """
+        Emit a block and, when it ends in a branch, both arms
+
+        Returns:
+            Block where control continues, or None when every path has
+            already left through continue, break or return
+        """
+        lines.extend(indent + line for line in self.statements(self.cfg.blocks[block]))
+        targets = self.succs[block]
+        if len(targets) == 1:
+            return targets[0]
+
+        merge = self.ipdom[block]
+        if loop is not None and merge not in loop.body and merge != loop.exit:
+            # Every path from here continues or breaks before merging
+            merge = None
+        cond = self.condition(self.cfg.blocks[block])
+        then_lines = []
+        self.sequence(then_lines, targets[0], merge, loop, indent + INDENT)
+        else_lines = []
+        self.sequence(else_lines, targets[1], merge, loop, indent + INDENT)
+        if then_lines:
+            lines.append(f"{indent}if {cond}:")
+            lines.extend(then_lines)
+            if else_lines:
+                lines.append(f"{indent}else:")
+                lines.extend(else_lines)
+        elif else_lines:
+            lines.append(f"{indent}if not {cond}:")
+            lines.extend(else_lines)
+        return merge
+
+    def emit_loop(self, lines, loop, indent):
+        """Emit a loop, testing a header that only tests as the first statement"""
+        header = self.cfg.blocks[loop.header]
+        targets = self.succs[loop.header]
+        body_indent = indent + INDENT
+        lines.append(f"{indent}for _ in _ticks:")
+        if len(targets) == 2 and loop.exit in targets and not self.statements(header):
+            cond = self.condition(header)
+            if targets[1] == loop.exit:
+                lines.append(f"{body_indent}if not {cond}:")
+                start = targets[0]
+            else:
+                lines.append(f"{body_indent}if {cond}:")
+                start = targets[1]
+            lines.append(f"{body_indent}{INDENT}break")
+            self.sequence(lines, start, None, loop, body_indent)
+        else:
+            after = self.emit_block(lines, loop.header, loop, body_indent)
+            self.sequence(lines, after, None, loop, body_indent)
+        if lines[-1] == f"{body_indent}continue":
+            lines.pop()  # the end of the body continues anyway
+        lines.extend(self.out_of_ticks(indent))
+
+    # Fallback lowering
+
+    def dispatch(self):
+        """Lower to one loop switching on the current block number"""
+        if not self.cfg.blocks:
+            return [f"{INDENT}return locals()"]
+        lines = [f"{INDENT}_block = 0", f"{INDENT}for _ in _ticks:"]
+        self.dispatch_range(lines, 0, self.end, INDENT * 2)
+        lines.extend(self.out_of_ticks(INDENT))
+        return lines
+
+    def dispatch_range(self, lines, low, high, indent):
+        """
+        Emit blocks low..high-1 behind a binary search on _block
+
+        A flat if/elif chain would cost a comparison per block on every
+        transfer, and CPython's parser nests elif, so long chains overflow it.
+        """
+        if high - low > 1:
+            middle = (low + high) // 2
+            lines.append(f"{indent}if _block < {middle}:")
+            self.dispatch_range(lines, low, middle, indent + INDENT)
+            lines.append(f"{indent}else:")
+            self.dispatch_range(lines, middle, high, indent + INDENT)
+            return
+        lines.extend(indent + line for line in self.statements(self.cfg.blocks[low]))
+        targets = self.succs[low]
+        if len(targets) == 1:
+            lines.append(self.transfer(indent, targets[0]))
+        else:
+            lines.append(f"{indent}if {self.condition(self.cfg.blocks[low])}:")
+            lines.append(self.transfer(indent + INDENT, targets[0]))
+            lines.append(f"{indent}else:")
+            lines.append(self.transfer(indent + INDENT, targets[1]))
+
+    def transfer(self, indent, target):
+        if target == self.end:
+            return f"{indent}return locals()"
+        return f"{indent}_block = {target}"
+
+    def build(self, ir_code):
+        """
+        Translate and compile IR into a runnable program
+
+        Args:
+            ir_code: List of Instr
+
+        Returns:
+            PythonProgram
+        """
+        source = "\n".join(self.translate(ir_code)) + "\n"
+        try:
+            function = compile_source(source)
+        except (SyntaxError, RecursionError, MemoryError):
+            # Nesting beyond what CPython's compiler accepts
+            if not self.stats['structured']:
+                raise
+            body = self.dispatch()
+            self.py_output = self.prologue() + body
+            self.stats['structured'] = False
+            source = "\n".join(self.py_output) + "\n"
+            function = compile_source(source)
+        return PythonProgram(function, dict(self.names))
+
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def compile_source(source):
+    """
+    Compile generated source once and return its function
+
+    Args:
+        source: Text from PythonTranslator.translate
+
+    Returns:
+        function: The generated FUNCTION
+    """
+    namespace = {}
+    exec(compile(source, '<mini-compiler>', 'exec'), namespace)
+    return namespace[FUNCTION]
+
+
+class PythonProgram:
+    """A compiled program with the run() interface of executor.IRExecutor"""
+
+    def __init__(self, function, names):
+        self.function = function
+        self.names = names
+
+    def run(self, max_steps=MAX_STEPS):
+        """
+        Execute the program
+
+        Args:
+            max_steps: Upper bound on loop iterations
+
+        Returns:
+            ExecutionResult: Printed values, loop iterations and the final
+                             value of every name
+
+        Raises:
+            StepLimitExceeded: After max_steps loop iterations
+            ExecutionError: On division or modulo by zero
+        """
+        output = []
+        ticks = repeat(None, max_steps)
+
+        def exhausted():
+            raise StepLimitExceeded(f"Step limit of {max_steps} loop iterations reached",
+                                    list(output), max_steps)
+
+        try:
+            final = self.function(output.append, divide, modulo, exhausted, ticks)
+        except ZeroDivisionError:
+            raise ExecutionError("Division by zero", list(output)) from None
+        variables = {var: final[local] for var, local in self.names.items()}
+        return ExecutionResult(output, max_steps - length_hint(ticks), variables)
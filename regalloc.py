@@ -0,0 +1,199 @@
+"""Linear-scan register allocation over the three-address IR.
+
+Every name (user variable or temporary) gets one live interval: the hull of
+the instruction positions at which it is defined, read or live according to
+dataflow.Liveness. Intervals are scanned in order of their start. A register
+is freed the moment its interval ends, so later values reuse it. When all
+registers are taken, the interval that ends furthest away goes to a stack
+slot (Poletto & Sarkar). A spilled name stays in its slot for the whole
+program; it is reloaded into a scratch register before every read and
+stored back after every write.
+
+Each instruction has two positions: 2*i where it reads its operands and
+2*i + 1 where it writes its result. A value whose last read is at
+instruction i therefore does not conflict with the result of i, which can
+take over its register.
+"""
+import bisect
+
+from cfg import ControlFlowGraph, gc_paused
+from dataflow import Liveness
+from ir import ASSIGN, read_names, writes
+
+
+# Spilled operands of one instruction are reloaded into these
+SCRATCH_COUNT = 2
+
+
+class LiveInterval:
+    """Positions from a name's first definition or live-in to its last use"""
+
+    __slots__ = ('name', 'start', 'end', 'reg', 'slot', 'hint')
+
+    def __init__(self, name, start, end):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.reg = None
+        self.slot = None
+        self.hint = None
+
+    def __repr__(self):
+        where = self.reg if self.reg is not None else f"slot {self.slot}"
+        return f"LiveInterval({self.name!r}, {self.start}, {self.end}, {where})"
+
+
+def build_intervals(ir_code, cfg=None):
+    """
+    Compute one live interval per name
+
+    Args:
+        ir_code: List of Instr
+        cfg: ControlFlowGraph of ir_code, built when omitted
+
+    Returns:
+        list: LiveInterval objects ordered by start position
+    """
+    cfg = cfg or ControlFlowGraph(ir_code)
+    liveness = Liveness(cfg).solve()
+    bounds = {}
+
+    def touch(name, pos):
+        found = bounds.get(name)
+        if found is None:
+            bounds[name] = [pos, pos]
+        elif pos < found[0]:
+            found[0] = pos
+        elif pos > found[1]:
+            found[1] = pos
+
+    with gc_paused():
+        for idx, instr in enumerate(ir_code):
+            for name in read_names(instr):
+                touch(name, 2 * idx)
+            dst = writes(instr)
+            if dst is not None:
+                touch(dst, 2 * idx + 1)
+        # Only the ends of the hull matter, so a name is decoded at the first
+        # and the last block boundary it is live at, not at each one in
+        # between (quadratic for a counter live through deep loop nests)
+        boundaries = []
+        for block in cfg.blocks:
+            boundaries.append((liveness.ins[block.index], 2 * block.start))
+            boundaries.append((liveness.outs[block.index], 2 * block.end - 1))
+        for scan in (boundaries, reversed(boundaries)):
+            done = 0
+            for bits, pos in scan:
+                fresh = bits & ~done
+                if fresh:
+                    done |= fresh
+                    for name in liveness.facts(fresh):
+                        touch(name, pos)
+
+        intervals = [LiveInterval(name, start, end) for name, (start, end) in bounds.items()]
+        by_name = {interval.name: interval for interval in intervals}
+        # x := y where y dies here: giving x the register of y removes the move
+        for interval in intervals:
+            if interval.start % 2:
+                instr = ir_code[interval.start // 2]
+                if instr.op is ASSIGN and isinstance(instr.src1, str):
+                    source = by_name.get(instr.src1)
+                    if source is not None and source.end == interval.start - 1:
+                        interval.hint = source
+    intervals.sort(key=lambda interval: interval.start)
+    return intervals
+
+
+class LinearScanAllocator:
+    """Assigns each live interval a register or a stack slot"""
+
+    def __init__(self, registers, scratch=None):
+        self.registers = list(registers)
+        # Reload registers outside self.registers, if the caller has them
+        self.fixed_scratch = list(scratch) if scratch is not None else None
+        self.scratch = []
+        self.intervals = []
+        self.location = {}
+        self.slots = 0
+
+    def allocate(self, ir_code, cfg=None):
+        """
+        Allocate every name in ir_code
+
+        All registers are tried first. If anything has to be spilled, the
+        scan is redone with SCRATCH_COUNT registers held back for reloads,
+        unless scratch registers were given to the constructor.
+
+        Args:
+            ir_code: List of Instr
+            cfg: ControlFlowGraph of ir_code, built when omitted
+
+        Returns:
+            dict: name -> LiveInterval carrying its reg or slot
+        """
+        self.intervals = build_intervals(ir_code, cfg)
+        if self.fixed_scratch is not None:
+            self.scratch = self.fixed_scratch
+            self.scan(self.registers)
+            self.location = {interval.name: interval for interval in self.intervals}
+            return self.location
+        self.scratch = []
+        if self.scan(self.registers) and len(self.registers) > SCRATCH_COUNT:
+            self.scratch = self.registers[-SCRATCH_COUNT:]
+            self.scan(self.registers[:-SCRATCH_COUNT])
+        self.location = {interval.name: interval for interval in self.intervals}
+        return self.location
+
+    def scan(self, registers):
+        """
+        One linear-scan pass
+
+        Args:
+            registers: Registers available to intervals
+
+        Returns:
+            int: Number of spilled intervals
+        """
+        rank = {reg: idx for idx, reg in enumerate(registers)}
+        free = sorted(rank.values())  # lowest-numbered register first
+        active = []  # (end, order, interval), sorted by end
+        self.slots = 0
+        for order, interval in enumerate(self.intervals):
+            interval.reg = None
+            interval.slot = None
+            while active and active[0][0] < interval.start:
+                bisect.insort(free, rank[active.pop(0)[2].reg])
+
+            hint = interval.hint
+            if hint is not None and hint.reg is not None and rank[hint.reg] in free:
+                free.remove(rank[hint.reg])
+                interval.reg = hint.reg
+            elif free:
+                interval.reg = registers[free.pop(0)]
+            else:
+                furthest = active[-1][2]
+                if furthest.end > interval.end:
+                    # Hand the register over; the longer interval goes to memory
+                    interval.reg = furthest.reg
+                    furthest.reg = None
+                    furthest.slot = self.slots
+                    active.pop()
+                else:
+                    interval.slot = self.slots
+                self.slots += 1
+                if interval.reg is None:
+                    continue
+            bisect.insort(active, (interval.end, order, interval))
+        return self.slots
+
+    def stats(self):
+        """
+        Allocation summary
+
+        Returns:
+            dict: intervals, registers used and spilled intervals (one
+                  stack slot each)
+        """
+        used = {interval.reg for interval in self.intervals if interval.reg is not None}
+        return {'intervals': len(self.intervals), 'registers': len(used) + len(self.scratch),
+                'spilled': self.slots}
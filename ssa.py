@@ -0,0 +1,270 @@
+"""Static single assignment form over the three-address IR.
+
+SSAForm gives every assignment to a name a version of its own (x#1, x#2,
+...) and joins the versions reaching a block from different predecessors
+with phi functions (Cytron et al.):
+
+    1. dominator tree              cfg.immediate_dominators
+    2. dominance frontiers         Cooper, Harvey & Kennedy: walk up from
+                                   each predecessor of a join to its idom
+    3. phi insertion               at the iterated dominance frontier of
+                                   the blocks assigning a name
+    4. renaming                    preorder walk of the dominator tree with
+                                   a stack of versions per name
+
+Phis are only placed for names some block reads before assigning them,
+and only at joins where the name is live (pruned SSA): a loop counter
+reset before its loop needs no phi at the headers of the loops around it,
+which in deep loop nests would be most of the phis. Version 0 of a name, x#0, stands for its value before any
+assignment, which is 0. Each step is linear in the size of the program
+plus the frontiers, so large generated programs convert quickly.
+
+to_ir() destroys the form again. Every phi joins versions of a single
+name, and the passes working on the form never make two versions of one
+name live at the same time (the form stays conventional), so renaming the
+versions back to their name and dropping the phis yields an equivalent
+program without inserting copies.
+"""
+from cfg import ControlFlowGraph, gc_paused
+from dataflow import Liveness, upward_exposed
+from ir import ASSIGN, JUMP_IF_FALSE, OUTPUT, Instr, BINARY
+
+
+class Phi:
+    """dst = phi(args): args[j] is the version arriving from SSAForm.preds[block][j]"""
+
+    __slots__ = ('dst', 'args')
+
+    def __init__(self, dst, args):
+        self.dst = dst
+        self.args = args
+
+    def __repr__(self):
+        return f"Phi({self.dst!r}, {self.args!r})"
+
+
+class SSAForm:
+    """A program in SSA form: the phis and renamed instructions of each block"""
+
+    def __init__(self, ir_code):
+        """
+        Convert an instruction list (left unmodified)
+
+        Args:
+            ir_code: List of Instr
+        """
+        with gc_paused():
+            self.build(ir_code)
+
+    def build(self, ir_code):
+        """Run the four steps of the conversion"""
+        self.cfg = ControlFlowGraph(ir_code)
+        blocks = self.cfg.blocks
+        # Dominator tree: idom per block (None when unreachable) and children
+        self.idom = self.cfg.dominators()
+        # Predecessors of each block. The program's start, None, is one more
+        # of the entry block, which a loop at the very top also jumps back to
+        self.preds = [block.preds for block in blocks]
+        if blocks:
+            self.preds[0] = blocks[0].preds + [None]
+        self.children = [[] for _ in blocks]
+        self.frontiers = [[] for _ in blocks]
+        self.phis = [[] for _ in blocks]
+        # Per block its instructions with names replaced by versions; blocks
+        # the entry cannot reach keep their original instructions
+        self.code = [ir_code[block.start:block.end] for block in blocks]
+        # Version -> the name it is a version of
+        self.base = {}
+        # Version -> block assigning it
+        self.def_block = {}
+        # Names some block reads before assigning, the ones given phis
+        self.global_names = set()
+        # Global names left without a phi at some join where they were dead
+        self.pruned = set()
+        # Name -> number of instructions assigning it
+        self.assignments = {}
+        self.build_tree()
+        self.build_frontiers()
+        self.place_phis()
+        self.rename()
+
+    def build_tree(self):
+        """Fill in the dominator tree's children lists"""
+        for block, parent in enumerate(self.idom):
+            if parent is not None and parent != block:
+                self.children[parent].append(block)
+
+    def build_frontiers(self):
+        """
+        Dominance frontier of every block
+
+        A join's frontier members are the blocks from each predecessor up to,
+        but excluding, the join's immediate dominator. A walk stops early at
+        a block an earlier predecessor's walk already reached.
+        """
+        idom = self.idom
+        frontiers = self.frontiers
+        reached = [None] * len(idom)
+        for index, preds in enumerate(self.preds):
+            if len(preds) < 2 or idom[index] is None:
+                continue
+            # Above the entry is only the program's start
+            stop = idom[index] if index else None
+            for runner in preds:
+                if runner is None or idom[runner] is None:
+                    continue
+                while runner != stop and reached[runner] != index:
+                    reached[runner] = index
+                    frontiers[runner].append(index)
+                    runner = idom[runner]
+
+    def place_phis(self):
+        """
+        Insert an empty phi for each name at its iterated dominance frontier,
+        where the name is live
+        """
+        uses, defs = upward_exposed(self.cfg)
+        liveness = Liveness(self.cfg).solve()
+        live_in = liveness.ins
+        bit = liveness.bit
+        pruned = self.pruned
+        idom = self.idom
+        global_names = self.global_names
+        for used in uses:
+            global_names.update(used)
+        sites = {}
+        for index, defined in enumerate(defs):
+            if idom[index] is None:
+                continue
+            for name in defined:
+                if name in global_names:
+                    sites.setdefault(name, []).append(index)
+
+        frontiers = self.frontiers
+        phis = self.phis
+        preds = [len(block_preds) for block_preds in self.preds]
+        has_phi = [None] * len(idom)
+        queued = [None] * len(idom)
+        for name, worklist in sites.items():
+            mask = 1 << bit[name]
+            for index in worklist:
+                queued[index] = name
+            while worklist:
+                for join in frontiers[worklist.pop()]:
+                    if has_phi[join] == name:
+                        continue
+                    has_phi[join] = name
+                    if not live_in[join] & mask:
+                        pruned.add(name)
+                        continue
+                    args = [None] * preds[join]
+                    if not join:
+                        args[-1] = self.initial(name)
+                    phis[join].append(Phi(name, args))
+                    if queued[join] != name:
+                        queued[join] = name
+                        worklist.append(join)
+
+    def initial(self, name):
+        """Version 0 of a name, its value before any assignment"""
+        version = f"{name}#0"
+        if version not in self.base:
+            self.base[version] = name
+        return version
+
+    def rename(self):
+        """Replace names by versions, walking the dominator tree in preorder"""
+        blocks = self.cfg.blocks
+        code = self.code
+        phis = self.phis
+        children = self.children
+        base = self.base
+        def_block = self.def_block
+        assignments = self.assignments
+        initial = self.initial
+        stacks = {}
+        counters = {}
+
+        def current(value):
+            if type(value) is not str:
+                return value
+            stack = stacks.get(value)
+            return stack[-1] if stack else initial(value)
+
+        def define(name, block):
+            number = counters.get(name, 0) + 1
+            counters[name] = number
+            version = f"{name}#{number}"
+            base[version] = name
+            def_block[version] = block
+            stacks.setdefault(name, []).append(version)
+            return version
+
+        if not blocks:
+            return
+        # (block, False) to enter a block, (names, True) to pop what it pushed
+        pending = [(0, False)]
+        while pending:
+            item, leaving = pending.pop()
+            if leaving:
+                for name in item:
+                    stacks[name].pop()
+                continue
+            block = item
+            pushed = []
+            for phi in phis[block]:
+                pushed.append(phi.dst)
+                phi.dst = define(phi.dst, block)
+
+            renamed = []
+            for instr in code[block]:
+                op = instr.op
+                if op in BINARY:
+                    dst = instr.dst
+                    assignments[dst] = assignments.get(dst, 0) + 1
+                    instr = Instr(op, current(instr.src1), current(instr.src2), define(dst, block))
+                    pushed.append(dst)
+                elif op is ASSIGN:
+                    dst = instr.dst
+                    assignments[dst] = assignments.get(dst, 0) + 1
+                    instr = Instr(op, current(instr.src1), None, define(dst, block))
+                    pushed.append(dst)
+                elif op is OUTPUT or op is JUMP_IF_FALSE:
+                    if type(instr.src1) is str:
+                        instr = Instr(op, current(instr.src1), instr.src2)
+                renamed.append(instr)
+            code[block] = renamed
+
+            for succ in blocks[block].succs:
+                if phis[succ]:
+                    slot = self.preds[succ].index(block)
+                    for phi in phis[succ]:
+                        # Its dst is still the name until the walk reaches succ
+                        phi.args[slot] = current(base.get(phi.dst, phi.dst))
+
+            pending.append((pushed, True))
+            pending.extend((child, False) for child in reversed(children[block]))
+
+    def to_ir(self):
+        """
+        The program as an instruction list again, versions renamed back to
+        their names and phis dropped
+
+        Returns:
+            list: New instruction list
+        """
+        base = self.base
+
+        def name(value):
+            return base.get(value, value) if type(value) is str else value
+
+        out = []
+        for instrs in self.code:
+            for instr in instrs:
+                op = instr.op
+                if op in BINARY or op is ASSIGN:
+                    instr = Instr(op, name(instr.src1), name(instr.src2), name(instr.dst))
+                elif op is OUTPUT or op is JUMP_IF_FALSE:
+                    instr = Instr(op, name(instr.src1), instr.src2)
+                out.append(instr)
+        return out
@@ -5,7 +5,31 @@ class VariableRegistry:
         self.scope_stack = [{}]  # Stack of scope dictionaries
         self.scope_names = ['global']  # Track scope names for debugging
         self.current_scope_id = 0
+        # Identifier -> small int, assigned on first declaration
+        self.symbol_ids = {}
+        # Per symbol ID, its visible declarations, innermost last
+        self.shadow_stacks = []
+        # Every declaration in source order, including closed scopes
+        self.history = []
+        # (name, level, entries) of every popped scope, in closing order
+        self.closed_scopes = []
+    
+    def symbol_id(self, identifier):
+        """
+        Get the interned ID of an identifier, allocating one on first sight
         
+        Args:
+            identifier: Variable name
+        
+        Returns:
+            int: Index into self.shadow_stacks
+        """
+        sid = self.symbol_ids.get(identifier)
+        if sid is None:
+            sid = self.symbol_ids[identifier] = len(self.shadow_stacks)
+            self.shadow_stacks.append([])
+        return sid
+    
     def add(self, identifier, var_type, initial_val=None, context='declaration'):
         """
         Add a new variable to the current scope
@@ -17,7 +41,7 @@ class VariableRegistry:
             context: Context of variable (declaration, assignment, etc.)
         """
         current_scope = self.scope_stack[-1]
-        current_scope[identifier] = {
+        entry = {
             'id': identifier,
             'dtype': var_type,
             'val': initial_val,
@@ -25,22 +49,30 @@ class VariableRegistry:
             'scope': self.scope_names[-1],
             'scope_level': len(self.scope_stack) - 1
         }
+        existing = current_scope.get(identifier)
+        if existing is not None:
+            # Redeclared in the same scope: the new declaration replaces it
+            existing.update(entry)
+            return
+        current_scope[identifier] = entry
+        self.shadow_stacks[self.symbol_id(identifier)].append(entry)
+        self.history.append(entry)
     
     def find(self, identifier):
         """
-        Look up a variable in the symbol table (searches from current scope up to global)
+        Look up a variable in the symbol table (innermost visible declaration)
         
         Args:
             identifier: Variable name to find
-            
+        
         Returns:
             dict: Variable information or None if not found
         """
-        # Search from current scope up to global scope
-        for scope in reversed(self.scope_stack):
-            if identifier in scope:
-                return scope[identifier]
-        return None
+        sid = self.symbol_ids.get(identifier)
+        if sid is None:
+            return None
+        stack = self.shadow_stacks[sid]
+        return stack[-1] if stack else None
     
     def find_in_current_scope(self, identifier):
         """
@@ -48,7 +80,7 @@ class VariableRegistry:
         
         Args:
             identifier: Variable name to find
-            
+        
         Returns:
             dict: Variable information or None if not found in current scope
         """
@@ -62,30 +94,25 @@ class VariableRegistry:
         Args:
             identifier: Variable name to update
             new_value: New value to assign
-            
+        
         Returns:
             bool: True if variable was found and updated, False otherwise
         """
-        # Search from current scope up to global scope
-        for scope in reversed(self.scope_stack):
-            if identifier in scope:
-                scope[identifier]['val'] = new_value
-                # Keep original context (declaration)
-                return True
-        return False
+        entry = self.find(identifier)
+        if entry is None:
+            return False
+        entry['val'] = new_value
+        # Keep original context (declaration)
+        return True
     
     def all_entries(self):
         """
-        Get all entries in all scopes
+        Get every declaration made so far, including those of closed scopes
         
         Returns:
-            list: All variable entries with scope information
+            list: All variable entries with scope information, in source order
         """
-        all_vars = []
-        for i, scope in enumerate(self.scope_stack):
-            for var_info in scope.values():
-                all_vars.append(var_info)
-        return all_vars
+        return list(self.history)
     
     def current_scope_entries(self):
         """
@@ -104,8 +131,8 @@ class VariableRegistry:
         Args:
             scope_name: Optional name for the scope (for debugging)
         """
+        self.current_scope_id += 1
         if scope_name is None:
-            self.current_scope_id += 1
             scope_name = f"scope_{self.current_scope_id}"
         
         self.scope_stack.append({})
@@ -113,14 +140,20 @@ class VariableRegistry:
     
     def pop_scope(self):
         """
-        Pop the current scope from the stack
+        Pop the current scope from the stack, archiving it in closed_scopes
         
         Returns:
             dict: The popped scope or None if only global scope remains
         """
         if len(self.scope_stack) > 1:
             popped_scope = self.scope_stack.pop()
-            self.scope_names.pop()
+            scope_name = self.scope_names.pop()
+            symbol_ids = self.symbol_ids
+            shadow_stacks = self.shadow_stacks
+            for identifier in popped_scope:
+                shadow_stacks[symbol_ids[identifier]].pop()
+            self.closed_scopes.append((scope_name, len(self.scope_stack),
+                                       tuple(popped_scope.values())))
             return popped_scope
         return None
     
@@ -148,14 +181,18 @@ class VariableRegistry:
         
         Args:
             identifier: Variable name to check
-            
+        
         Returns:
             bool: True if variable exists in current scope
         """
         return identifier in self.scope_stack[-1]
     
     def clear(self):
-        """Clear all scopes and reset to global scope only"""
+        """Clear all scopes and history and reset to global scope only"""
         self.scope_stack = [{}]
         self.scope_names = ['global']
         self.current_scope_id = 0
+        self.symbol_ids = {}
+        self.shadow_stacks = []
+        self.history = []
+        self.closed_scopes = []
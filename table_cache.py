@@ -0,0 +1,95 @@
+"""Versioned on-disk cache for PLY's generated lexer and parser tables.
+
+Tables live under __plycache__/ply-<version>/<kind>-<grammar hash>/, so a
+grammar edit or a PLY upgrade simply lands in a fresh directory and stale
+tables are never loaded. Set MINICOMPILER_TABLE_CACHE to relocate the cache.
+"""
+import hashlib
+import importlib.util
+import os
+import shutil
+import tempfile
+
+import ply
+
+CACHE_ROOT = os.environ.get('MINICOMPILER_TABLE_CACHE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '__plycache__')
+
+
+def grammar_hash(spec, prefix):
+    """
+    Hash every rule a PLY module would reflect on
+
+    Args:
+        spec: Lexer or parser object holding the rules
+        prefix: Rule prefix, 't_' for lexers or 'p_' for parsers
+
+    Returns:
+        str: Hex digest that changes whenever a rule, token or precedence changes
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(list(spec.tokens)).encode())
+    digest.update(repr(getattr(spec, 'precedence', ())).encode())
+    for name in sorted(dir(spec)):
+        if not name.startswith(prefix):
+            continue
+        rule = getattr(spec, name)
+        text = rule if isinstance(rule, str) else (rule.__doc__ or '')
+        digest.update(f"{name}\0{text}\0".encode())
+    return digest.hexdigest()[:16]
+
+
+def table_dir(kind, digest):
+    """Directory holding the tables for one grammar version"""
+    return os.path.join(CACHE_ROOT, f"ply-{ply.__version__}", f"{kind}-{digest}")
+
+
+def load_table(directory, name):
+    """
+    Import a generated table module from the cache
+
+    Args:
+        directory: Cache directory from table_dir
+        name: Table module name (lextab or parsetab)
+
+    Returns:
+        module: The loaded table, or None when it has not been built yet
+    """
+    path = os.path.join(directory, name + '.py')
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location(f"_{name}_{os.path.basename(directory)}", path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        return None
+    return module
+
+
+def build_table(directory, build):
+    """
+    Generate tables into a scratch directory, then publish it atomically
+
+    Concurrent builders (e.g. batch workers) may race; the first rename wins
+    and the others discard their copy.
+
+    Args:
+        directory: Final cache directory from table_dir
+        build: Callable taking the scratch directory and returning the built object
+
+    Returns:
+        The object returned by build
+    """
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix='.build-', dir=parent)
+    try:
+        result = build(scratch)
+        try:
+            os.rename(scratch, directory)
+        except OSError:
+            pass
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return result
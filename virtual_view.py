@@ -0,0 +1,124 @@
+import tkinter as tk
+from tkinter import ttk, font as tkfont
+
+
+class VirtualListView(ttk.Frame):
+    """
+    Read-only text view that formats only the rows currently on screen
+
+    Rows come from an indexable sequence (token records, IR instructions,
+    assembly lines) plus a formatter, so showing a million-row result costs
+    the same as showing forty. Nothing is formatted until the view is mapped,
+    which for a notebook page means until its tab is first selected.
+    """
+
+    def __init__(self, parent, width=60, height=30, font=('Consolas', 9)):
+        super().__init__(parent)
+        self.header = []
+        self.rows = []
+        self.row_fn = None
+        self.top = 0
+
+        self.text = tk.Text(self, width=width, height=height, font=font, wrap=tk.NONE)
+        self.vbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.hbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.text.configure(xscrollcommand=self.hbar.set, state=tk.DISABLED)
+        self.line_height = max(1, tkfont.Font(font=font).metrics('linespace'))
+
+        self.text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.vbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.hbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.text.bind('<Configure>', lambda event: self.render())
+        self.text.bind('<Map>', lambda event: self.render())
+        # Disabled text widgets do not take focus on click by default
+        self.text.bind('<Button-1>', lambda event: self.text.focus_set(), add='+')
+        self.text.bind('<MouseWheel>', self.on_wheel)
+        self.text.bind('<Button-4>', lambda event: self.scroll_rows(-3))
+        self.text.bind('<Button-5>', lambda event: self.scroll_rows(3))
+        for key, step in (('<Up>', -1), ('<Down>', 1)):
+            self.text.bind(key, lambda event, step=step: self.scroll_rows(step))
+        self.text.bind('<Prior>', lambda event: self.scroll_rows(-self.visible_rows()))
+        self.text.bind('<Next>', lambda event: self.scroll_rows(self.visible_rows()))
+        self.text.bind('<Control-Home>', lambda event: self.scroll_to(0))
+        self.text.bind('<Control-End>', lambda event: self.scroll_to(self.total_rows()))
+
+    def set_rows(self, header, rows, row_fn):
+        """
+        Replace the content
+
+        Args:
+            header: Fixed lines shown above the first row
+            rows: Indexable sequence of row items
+            row_fn: Callable (index, item) -> str formatting one row
+        """
+        self.header = list(header)
+        self.rows = rows
+        self.row_fn = row_fn
+        self.top = 0
+        self.render()
+
+    def clear(self):
+        """Remove all content"""
+        self.set_rows([], [], None)
+
+    def total_rows(self):
+        """Header lines plus data rows"""
+        return len(self.header) + len(self.rows)
+
+    def visible_rows(self):
+        """Rows that fit in the text widget at its current height"""
+        return max(1, self.text.winfo_height() // self.line_height)
+
+    def line(self, index):
+        """Format the line at a global row index"""
+        if index < len(self.header):
+            return self.header[index]
+        index -= len(self.header)
+        return self.row_fn(index, self.rows[index])
+
+    def render(self):
+        """Format and insert only the rows in the visible window"""
+        if not self.text.winfo_ismapped():
+            return
+        total = self.total_rows()
+        count = self.visible_rows()
+        self.top = max(0, min(self.top, total - count))
+        end = min(total, self.top + count)
+
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', "\n".join(self.line(i) for i in range(self.top, end)))
+        self.text.configure(state=tk.DISABLED)
+
+        if total:
+            self.vbar.set(self.top / total, end / total)
+        else:
+            self.vbar.set(0.0, 1.0)
+
+    def scroll_to(self, row):
+        """Make row the first visible row"""
+        self.top = row
+        self.render()
+        return 'break'
+
+    def scroll_rows(self, delta):
+        """Scroll by delta rows"""
+        return self.scroll_to(self.top + delta)
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if args[0] == tk.MOVETO:
+            self.scroll_to(int(float(args[1]) * self.total_rows()))
+        elif args[0] == tk.SCROLL:
+            step = self.visible_rows() if args[2] == tk.PAGES else 1
+            self.scroll_rows(int(args[1]) * step)
+
+    def on_wheel(self, event):
+        """Windows/macOS wheel events report multiples of 120 per notch"""
+        if not event.delta:
+            return 'break'
+        notches = event.delta // 120 if abs(event.delta) >= 120 else (1 if event.delta > 0 else -1)
+        return self.scroll_rows(-3 * notches)
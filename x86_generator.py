@@ -0,0 +1,295 @@
+"""x86-64 code generation target.
+
+X86Translator emits GNU as source (Intel syntax) for Linux x86-64 that
+assembles and links, with no C library, into a static ELF executable:
+
+    as -o prog.o prog.s && ld -o prog prog.o
+
+Names get the callee-saved registers RBX and R12-R15 from the linear-scan
+allocator, so calls into the runtime never clobber them; the rest live in
+8-byte stack slots below RBP. RAX, RCX and RDX are scratch: IDIV needs
+RAX:RDX, and SETcc writes AL, which MOVZX widens. Values are 64-bit two's
+complement integers, so unlike the IR executor results wrap on overflow.
+
+A small runtime at the end of every listing formats print() values into an
+output buffer and flushes it with write(2). The process exit status reports
+how a run ended (see EXIT_STATUS); loop headers spend one unit of a step
+budget fixed at translation time, so non-terminating programs stop too.
+"""
+from ir import (ASSIGN, ADD, SUB, MUL, DIV, MOD, LT, LE, GT, GE, EQ, NE, MARK, JUMP, JUMP_IF_FALSE,
+                OUTPUT, ARITHMETIC, COMPARISON)
+from regalloc import LinearScanAllocator
+
+
+DEFAULT_STEPS = 10_000_000
+
+EXIT_OK = 0
+EXIT_DIVISION_BY_ZERO = 2
+EXIT_STEP_LIMIT = 3
+EXIT_STATUS = {EXIT_OK: 'ok', EXIT_DIVISION_BY_ZERO: 'division by zero',
+               EXIT_STEP_LIMIT: 'step limit'}
+
+# Bytes buffered before output is flushed
+OUTPUT_BUFFER = 65536
+
+INT32 = range(-2 ** 31, 2 ** 31)
+
+RUNTIME = f"""
+# ---- runtime -------------------------------------------------------------
+# mc_print: append the signed decimal of RDI and a newline to the buffer.
+# Clobbers RAX, RCX, RDX, RSI, RDI, R8-R11 only.
+mc_print:
+    lea r8, [rip + mc_digits + 20]
+    mov byte ptr [r8], 10
+    mov r9, r8
+    mov rax, rdi
+    test rax, rax
+    jns 1f
+    neg rax
+1:
+    mov ecx, 10
+2:
+    xor edx, edx
+    div rcx
+    add dl, 48
+    dec r9
+    mov byte ptr [r9], dl
+    test rax, rax
+    jnz 2b
+    test rdi, rdi
+    jns 3f
+    dec r9
+    mov byte ptr [r9], 45
+3:
+    lea r10, [r8 + 1]
+    sub r10, r9
+    mov rax, qword ptr [rip + mc_used]
+    add rax, r10
+    cmp rax, {OUTPUT_BUFFER}
+    jbe 4f
+    call mc_flush
+4:
+    lea rdi, [rip + mc_buffer]
+    add rdi, qword ptr [rip + mc_used]
+    mov rsi, r9
+    mov rcx, r10
+    rep movsb
+    add qword ptr [rip + mc_used], r10
+    ret
+
+# mc_flush: write(1, mc_buffer, mc_used), retrying short writes
+mc_flush:
+    lea rsi, [rip + mc_buffer]
+    mov rdx, qword ptr [rip + mc_used]
+1:
+    test rdx, rdx
+    jz 2f
+    mov edi, 1
+    mov eax, 1
+    syscall
+    test rax, rax
+    jle 2f
+    add rsi, rax
+    sub rdx, rax
+    jmp 1b
+2:
+    mov qword ptr [rip + mc_used], 0
+    ret
+
+# mc_exit: flush, then exit with status EDI
+mc_exit:
+    push rdi
+    call mc_flush
+    pop rdi
+    mov eax, 60
+    syscall
+
+mc_division_by_zero:
+    mov edi, {EXIT_DIVISION_BY_ZERO}
+    jmp mc_exit
+
+mc_out_of_steps:
+    mov edi, {EXIT_STEP_LIMIT}
+    jmp mc_exit
+
+    .section .bss
+mc_buffer:
+    .skip {OUTPUT_BUFFER}
+mc_digits:
+    .skip 24
+mc_used:
+    .skip 8
+"""
+
+
+class X86Translator:
+    """Converts IR to x86-64 GNU assembler source"""
+
+    REGISTERS = ['rbx', 'r12', 'r13', 'r14', 'r15']
+    SCRATCH = ['rax', 'rcx']
+    ARITH_MNEMONICS = {ADD: 'add', SUB: 'sub', MUL: 'imul'}
+    SET_MNEMONICS = {LT: 'setl', LE: 'setle', GT: 'setg', GE: 'setge',
+                     EQ: 'sete', NE: 'setne'}
+
+    def __init__(self, max_steps=DEFAULT_STEPS):
+        self.asm_output = []
+        self.allocator = LinearScanAllocator(self.REGISTERS, scratch=self.SCRATCH)
+        self.location = {}
+        self.max_steps = max_steps
+        self.stats = {}
+
+    def home(self, var):
+        """Register or stack slot holding a name"""
+        interval = self.location[var]
+        if interval.reg is not None:
+            return interval.reg
+        return f"qword ptr [rbp - {8 * (interval.slot + 1)}]"
+
+    def operand(self, value):
+        """
+        Register, memory operand or 32-bit immediate for an IR operand
+
+        Raises:
+            ValueError: For literals this target cannot represent
+        """
+        if isinstance(value, str):
+            return self.home(value)
+        if type(value) is not int or not -2 ** 63 <= value < 2 ** 63:
+            raise ValueError(f"The x86 target only supports 64-bit integers, not {value!r}")
+        if value in INT32:
+            return str(value)
+        # Wider immediates only exist for MOV r64, imm64
+        self.asm_output.append(f"    mov rcx, {value}")
+        return 'rcx'
+
+    def load(self, reg, value):
+        """Emit reg := value"""
+        src = self.operand(value)
+        if src != reg:
+            self.asm_output.append(f"    mov {reg}, {src}")
+
+    def store(self, var, reg):
+        """Emit var := reg"""
+        dst = self.home(var)
+        if dst != reg:
+            self.asm_output.append(f"    mov {dst}, {reg}")
+
+    def translate(self, ir_code):
+        """
+        Translate intermediate representation to x86-64 assembly
+
+        Args:
+            ir_code: List of IR instructions
+
+        Returns:
+            list: Assembly source lines, runtime included
+        """
+        self.asm_output = []
+        self.location = self.allocator.allocate(ir_code)
+        self.stats = self.allocator.stats()
+        emit = self.asm_output.append
+
+        # Loop headers: labels some later jump goes back to
+        seen = set()
+        headers = set()
+        for instr in ir_code:
+            if instr.op is MARK:
+                seen.add(instr.src1)
+            elif instr.op is JUMP and instr.src1 in seen:
+                headers.add(instr.src1)
+            elif instr.op is JUMP_IF_FALSE and instr.src2 in seen:
+                headers.add(instr.src2)
+
+        emit("# Generated x86-64 assembly (GNU as, Intel syntax)")
+        emit("    .intel_syntax noprefix")
+        emit("    .section .data")
+        emit("mc_budget:")
+        emit(f"    .quad {self.max_steps}")
+        emit("    .section .text")
+        emit("    .globl _start")
+        emit("_start:")
+        emit("    mov rbp, rsp")
+        if self.stats['spilled']:
+            emit(f"    sub rsp, {8 * self.stats['spilled']}")
+
+        for instr in ir_code:
+            op = instr.op
+            if op is ASSIGN:
+                dst = self.home(instr.dst)
+                src = self.operand(instr.src1)
+                if src == dst:
+                    continue
+                if dst.startswith('qword') and src.startswith('qword'):
+                    emit(f"    mov rax, {src}")
+                    src = 'rax'
+                emit(f"    mov {dst}, {src}")
+            elif op in ARITHMETIC:
+                self.arithmetic(instr)
+            elif op in COMPARISON:
+                self.load('rax', instr.src1)
+                emit(f"    cmp rax, {self.operand(instr.src2)}")
+                emit(f"    {self.SET_MNEMONICS[op]} al")
+                emit("    movzx eax, al")
+                self.store(instr.dst, 'rax')
+            elif op is MARK:
+                emit(f".L{instr.src1}:")
+                if instr.src1 in headers:
+                    emit("    sub qword ptr [rip + mc_budget], 1")
+                    emit("    jc mc_out_of_steps")
+            elif op is JUMP:
+                emit(f"    jmp .L{instr.src1}")
+            elif op is JUMP_IF_FALSE:
+                cond = self.operand(instr.src1)
+                if cond.startswith('r'):
+                    emit(f"    test {cond}, {cond}")
+                elif cond.startswith('qword'):
+                    emit(f"    cmp {cond}, 0")
+                else:
+                    # Constant condition
+                    if int(cond) == 0:
+                        emit(f"    jmp .L{instr.src2}")
+                    continue
+                emit(f"    je .L{instr.src2}")
+            elif op is OUTPUT:
+                self.load('rdi', instr.src1)
+                emit("    call mc_print")
+
+        emit(f"    mov edi, {EXIT_OK}")
+        emit("    jmp mc_exit")
+        self.asm_output.extend(RUNTIME.strip('\n').split('\n'))
+        return self.asm_output
+
+    def arithmetic(self, instr):
+        """Emit dst := src1 op src2"""
+        emit = self.asm_output.append
+        op = instr.op
+        if op is DIV or op is MOD:
+            # IDIV divides RDX:RAX; the divisor must be a register or memory
+            self.load('rax', instr.src1)
+            self.load('rcx', instr.src2)
+            emit("    test rcx, rcx")
+            emit("    jz mc_division_by_zero")
+            emit("    cqo")
+            emit("    idiv rcx")
+            self.store(instr.dst, 'rax' if op is DIV else 'rdx')
+            return
+
+        mnemonic = self.ARITH_MNEMONICS[op]
+        dst = self.home(instr.dst)
+        if dst.startswith('r') and self.operand_is_not(instr.src2, dst):
+            # Two-address form directly in the destination register
+            self.load(dst, instr.src1)
+            target = dst
+        else:
+            self.load('rax', instr.src1)
+            target = 'rax'
+        src = self.operand(instr.src2)
+        if op is MUL and src.lstrip('-').isdigit():
+            emit(f"    imul {target}, {target}, {src}")
+        else:
+            emit(f"    {mnemonic} {target}, {src}")
+        self.store(instr.dst, target)
+
+    def operand_is_not(self, value, reg):
+        """Whether loading into reg first leaves value intact"""
+        return not isinstance(value, str) or self.home(value) != reg